@@ -0,0 +1,17 @@
+"""
+Animal Crossing New Horizons Island Queue Discord Bot
+Author: Marshall Jankovsky
+github.com/marshalltj/island-queue-bot
+
+Version: 2.0.0
+
+bench contains benchmarks for the bot's modules. Run them from the repository root, e.g. python -m bench.storeBenchmark
+"""
+
+import os
+import sys
+
+#the bot's modules import each other by their flat names, so put the bot directory on the path
+BOT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "bot")
+if BOT_DIR not in sys.path:
+    sys.path.insert(0, BOT_DIR)
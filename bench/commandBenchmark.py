@@ -0,0 +1,198 @@
+"""
+Animal Crossing New Horizons Island Queue Discord Bot
+Author: Marshall Jankovsky
+github.com/marshalltj/island-queue-bot
+
+Version: 2.0.0
+
+commandBenchmark.py drives the real command handlers through a fake Discord layer at scale and reports per-command latency,
+throughput and peak memory.
+
+Usage: python -m bench.commandBenchmark [--guilds 5000] [--islands 2000] [--visitors 100000] [--latency 0]
+                                        [--save results.json] [--baseline results.json] [--tolerance 1.5]
+
+With --baseline the run fails if any command's p99 latency is more than <tolerance> times the baseline's.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+
+from bench.fakes import LATENCY, FakeChannel, FakeContext, FakeGuild, FakeUser, addGuilds, loadBot
+
+#Class that collects the latency of every call to one command
+#Members: <name : str> <latencies : [float]> <elapsed : float> <handled : int> items handled, if a call handles more than one
+class CommandStats:
+    def __init__(self, name):
+        self.name = name
+        self.latencies = []
+        self.elapsed = 0.0
+        self.handled = None
+
+    #Awaits <coroutine> and records how long it took
+    async def time(self, coroutine):
+        startTime = time.perf_counter()
+        await coroutine
+        self.latencies.append(time.perf_counter() - startTime)
+
+    #Parameters: <fraction : float> 0-1
+    #Returns: the latency at <fraction> through the sorted latencies, in milliseconds
+    def percentile(self, fraction):
+        if len(self.latencies) == 0:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000
+
+    def summary(self):
+        return {
+            "calls": len(self.latencies),
+            "p50": self.percentile(0.50),
+            "p99": self.percentile(0.99),
+            "throughput": (self.handled or len(self.latencies)) / self.elapsed if self.elapsed > 0 else 0.0
+        }
+
+#Runs <calls>, a list of coroutines for one command, <concurrency> at a time and records them in a CommandStats
+#Returns: the CommandStats
+async def measure(name, calls, concurrency):
+    stats = CommandStats(name)
+    pending = iter(calls)
+
+    async def worker():
+        for coroutine in pending:
+            await stats.time(coroutine)
+
+    startTime = time.perf_counter()
+    await asyncio.gather(*[worker() for i in range(concurrency)])
+    stats.elapsed = time.perf_counter() - startTime
+    return stats
+
+#Waits for the background work handlers leave behind (expiry messages, prefetched DM channels) to finish
+async def drain():
+    while True:
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task() and not task.done()]
+        if len(tasks) == 0:
+            return
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+async def run(bot, options):
+    results = []
+    guilds = [FakeGuild(i + 1) for i in range(options.guilds)]
+    channels = {guild.id: FakeChannel(guild.id) for guild in guilds}
+    addGuilds(bot, guilds)
+
+    #island owners, each in a random guild
+    owners = []
+    for i in range(options.islands):
+        guild = random.choice(guilds)
+        owners.append((FakeUser(10**9 + i), guild))
+
+    results.append(await measure("create", [
+        bot.createIsland.callback(FakeContext(owner, guild, channels[guild.id]), random.randint(90, 600)) for owner, guild in owners
+    ], options.concurrency))
+
+    results.append(await measure("open", [
+        bot.openQueue.callback(FakeContext(owner), "DODO1", random.randint(1, 7)) for owner, guild in owners
+    ], options.concurrency))
+
+    islands = [bot.getIslandByOwner(owner) for owner, guild in owners]
+    visitors = []
+    for i in range(options.visitors):
+        island = random.choice(islands)
+        visitors.append((FakeUser(i + 1), island))
+
+    results.append(await measure("join", [
+        bot.joinQueue.callback(FakeContext(user, island.guild, channels[island.guild.id]), island.islandId, random.randint(0, 3)) for user, island in visitors
+    ], options.concurrency))
+
+    listCalls = [bot.listInfo.callback(FakeContext(user), island.islandId, 1) for user, island in random.sample(visitors, min(len(visitors), 10000))]
+    listCalls += [bot.listInfo.callback(FakeContext(user, island.guild, channels[island.guild.id]), "all", 1) for user, island in random.sample(visitors, min(len(visitors), 2000))]
+    random.shuffle(listCalls)
+    results.append(await measure("list", listCalls, options.concurrency))
+
+    results.append(await measure("update", [
+        bot.updateQueue.callback(FakeContext(owner), random.choice(["size", "price"]), str(random.randint(1, 7))) for owner, guild in owners
+    ], options.concurrency))
+
+    #time everyone on an island out at once and run the expiry cycle clean() would run, throughput is deadlines per second
+    for server in bot.REGISTRY:
+        server.timeout = 0
+    for island in islands:
+        for visitor in island.visitors.admitted:
+            bot.scheduleVisitor(island, visitor)
+    stats = CommandStats("clean")
+    stats.handled = sum(len(island.visitors.admitted) for island in islands)
+    startTime = time.perf_counter()
+    await stats.time(bot.SCHEDULER.runDue(bot.expiryGuild, bot.EXPIRY_CONCURRENCY))
+    await drain()
+    stats.elapsed = time.perf_counter() - startTime
+    results.append(stats)
+    for server in bot.REGISTRY:
+        server.timeout = 30
+
+    random.shuffle(visitors)
+    results.append(await measure("leave", [
+        bot.leaveQueue.callback(FakeContext(user), island.islandId) for user, island in visitors
+    ], options.concurrency))
+    await drain()
+
+    return results
+
+#Parameters: <summaries : {str : dict}> <baseline : {str : dict}> <tolerance : float>
+#Returns: a list of commands whose p99 latency regressed
+def regressions(summaries, baseline, tolerance):
+    slower = []
+    for name, summary in summaries.items():
+        old = baseline.get("commands", {}).get(name)
+        if old != None and old["p99"] > 0 and summary["p99"] > old["p99"] * tolerance:
+            slower.append(f"{name} p99 went from {old['p99']:.3f}ms to {summary['p99']:.3f}ms")
+    return slower
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the island queue bot's command handlers without Discord.")
+    parser.add_argument("--guilds", type=int, default=5000)
+    parser.add_argument("--islands", type=int, default=2000)
+    parser.add_argument("--visitors", type=int, default=100000)
+    parser.add_argument("--concurrency", type=int, default=50, help="commands in flight at once")
+    parser.add_argument("--latency", type=float, default=0.0, help="max simulated seconds per Discord call")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="fail if p99 latencies regressed against this JSON file")
+    parser.add_argument("--tolerance", type=float, default=1.5)
+    options = parser.parse_args()
+    for path in ("save", "baseline"): #loadBot() changes the working directory
+        if getattr(options, path):
+            setattr(options, path, os.path.abspath(getattr(options, path)))
+
+    random.seed(options.seed)
+    LATENCY.high = options.latency
+
+    with tempfile.TemporaryDirectory() as directory:
+        bot = loadBot(directory)
+        startTime = time.perf_counter()
+        results = asyncio.get_event_loop().run_until_complete(run(bot, options))
+        elapsed = time.perf_counter() - startTime
+
+    summaries = {stats.name: stats.summary() for stats in results}
+    peakMemory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 #kilobytes on Linux
+
+    print(f"{options.guilds} guilds, {options.islands} islands, {options.visitors} visitors in {elapsed:.1f} seconds, peak memory {peakMemory:.0f} MB")
+    print(f"{'command':>8} {'calls':>8} {'p50 ms':>9} {'p99 ms':>9} {'per second':>11}")
+    for name, summary in summaries.items():
+        print(f"{name:>8} {summary['calls']:>8} {summary['p50']:>9.3f} {summary['p99']:>9.3f} {summary['throughput']:>11,.0f}")
+
+    if options.save:
+        with open(options.save, "w") as resultsFile:
+            json.dump({"options": vars(options), "peakMemoryMB": peakMemory, "commands": summaries}, resultsFile, indent=2)
+
+    if options.baseline:
+        with open(options.baseline) as baselineFile:
+            slower = regressions(summaries, json.load(baselineFile), options.tolerance)
+        for line in slower:
+            print(f"REGRESSION: {line}")
+        sys.exit(1 if len(slower) > 0 else 0)
@@ -0,0 +1,208 @@
+"""
+Animal Crossing New Horizons Island Queue Discord Bot
+Author: Marshall Jankovsky
+github.com/marshalltj/island-queue-bot
+
+Version: 2.0.0
+
+fakes.py contains stand-ins for the discord.py objects the command handlers use, so bench scripts can drive the real handlers
+without connecting to Discord, and loadBot() to import bot.py against a scratch directory.
+"""
+
+import asyncio
+import os
+import random
+
+import bench
+
+#Class that simulates network time for every send. Each send sleeps a random time between <low> and <high> seconds.
+#Members: <low : float> <high : float> <sends : int>
+class Latency:
+    def __init__(self, low=0.0, high=0.0):
+        self.low = low
+        self.high = high
+        self.sends = 0
+
+    async def wait(self):
+        self.sends += 1
+        if self.high > 0:
+            await asyncio.sleep(random.uniform(self.low, self.high))
+        else:
+            await asyncio.sleep(0)
+
+LATENCY = Latency()
+
+#Class standing in for a discord.Message
+#Members: <channel : FakeChannel> <content : str>
+class FakeMessage:
+    def __init__(self, channel, content):
+        self.channel = channel
+        self.content = content
+
+    async def edit(self, content=None):
+        await LATENCY.wait()
+        self.content = content
+
+    async def pin(self):
+        await LATENCY.wait()
+
+    async def unpin(self):
+        await LATENCY.wait()
+
+#Class standing in for a discord.TextChannel or discord.DMChannel, keeps everything sent to it
+#Members: <id : int> <messages : [str]>
+class FakeChannel:
+    def __init__(self, id):
+        self.id = id
+        self.messages = []
+
+    async def send(self, content):
+        await LATENCY.wait()
+        self.messages.append(content)
+        return FakeMessage(self, content)
+
+#Class standing in for a discord.User. Every FakeUser is registered with CLIENT so the bot can look it up by id.
+#Members: <id : int> <name : str> <display_name : str> <dm : FakeChannel>
+class FakeUser:
+    def __init__(self, id, name=None):
+        self.id = id
+        self.name = name or f"user{id}"
+        self.display_name = self.name
+        self.dm = FakeChannel(id)
+        CLIENT.users[id] = self
+
+    def __str__(self):
+        return self.name
+
+    async def create_dm(self):
+        await LATENCY.wait()
+        return self.dm
+
+#Class standing in for the discord.Client user cache
+#Members: <users : {int : FakeUser}>
+class FakeClient:
+    def __init__(self):
+        self.users = {}
+
+    def get_user(self, userId):
+        return self.users.get(userId)
+
+    async def fetch_user(self, userId):
+        await LATENCY.wait()
+        return self.users.get(userId)
+
+CLIENT = FakeClient()
+
+#Class standing in for discord.Permissions
+#Members: <administrator : bool>
+class FakePermissions:
+    def __init__(self, administrator):
+        self.administrator = administrator
+
+#Class standing in for a discord.Role
+#Members: <permissions : FakePermissions>
+class FakeRole:
+    def __init__(self, administrator=False):
+        self.permissions = FakePermissions(administrator)
+
+#Class standing in for a discord.Member
+#Members: <id : int> <roles : [FakeRole]>
+class FakeMember:
+    def __init__(self, user, admin=False):
+        self.id = user.id
+        self.roles = [FakeRole(admin)]
+
+#Class standing in for a discord.Guild. Members are created on demand, only ids in <admins> get the administrator role.
+#Members: <id : int> <name : str> <admins : set(int)>
+class FakeGuild:
+    def __init__(self, id, name=None, admins=()):
+        self.id = id
+        self.name = name or f"guild{id}"
+        self.admins = set(admins)
+
+    def __str__(self):
+        return self.name
+
+    def get_member(self, userId):
+        return FakeMember(FakeUser(userId), userId in self.admins)
+
+#Class standing in for the discord.Message that invoked a command
+#Members: <author : FakeUser> <channel : FakeChannel>
+class FakeCommandMessage:
+    def __init__(self, author, channel):
+        self.author = author
+        self.channel = channel
+
+#Class standing in for a discord.ext.commands.Context. Commands sent in a DM have no guild and reply to the author's DM channel.
+#Members: <author : FakeUser> <guild : FakeGuild> <channel : FakeChannel> <message : FakeCommandMessage>
+class FakeContext:
+    def __init__(self, author, guild=None, channel=None):
+        self.author = author
+        self.guild = guild
+        self.channel = channel if channel != None else author.dm
+        self.message = FakeCommandMessage(author, self.channel)
+
+    async def send(self, content):
+        return await self.channel.send(content)
+
+#Imports bot.py with its journal and logs in <directory> and no rate limits or reply merging, so only the handlers are measured.
+#Parameters: <directory : str> a scratch directory
+#Returns: the bot module
+def loadBot(directory):
+    #every path bot.py uses is set below, this only keeps anything relative to the working directory inside the scratch directory
+    os.makedirs(os.path.join(directory, "run"), exist_ok=True)
+    os.chdir(os.path.join(directory, "run"))
+
+    #set every option bot.py reads so the placeholders in bot/.env are never used
+    os.environ.update({
+        "DISCORD_TOKEN": "bench",
+        "DB_HOST": "localhost",
+        "DB_USER": "bench",
+        "DB_PW": "bench",
+        "DB_NAME": "bench",
+        "DB_POOL_SIZE": "1",
+        "ISLAND_ID_WIDTH": "6",
+        "ISLAND_ID_PREFIX": "",
+        "ISLAND_ID_START": "1",
+        "ISLAND_ID_STOP": "1000000",
+        "JOURNAL_DIR": os.path.join(directory, "journal"),
+        "JOURNAL_SNAPSHOT_INTERVAL": "300",
+        "DM_CONCURRENCY": "100",
+        "DM_CACHE_SIZE": "1000000",
+        "CHANNEL_COALESCE_WINDOW": "0",
+        "EXPIRY_CONCURRENCY": "10",
+        "BOARD_INTERVAL": "5",
+        "CLUSTER_ID": "0",
+        "CLUSTER_COUNT": "1",
+        "CLUSTER_PORT": "7070",
+        "CLUSTER_SECRET": "",
+        "SHARD_COUNT": "",
+        "SHARD_IDS": "",
+        "METRICS_HOST": "127.0.0.1",
+        "METRICS_PORT": "0",
+        "QUEUE_STORE": "",
+        "NAME_CACHE_SIZE": "1000000",
+        "RATE_LIMIT_SCALE": "0",
+        "HISTORY_DB": os.path.join(directory, "history.db"),
+        "PRICE_DIR": os.path.join(directory, "prices"),
+        "LOG_DIR": os.path.join(directory, "logs"),
+        "LOG_MAX_BYTES": str(10 * 1024 * 1024),
+        "LOG_ROTATE_HOURS": "24",
+        "LOG_BACKUPS": "2",
+        "LOG_QUEUE_SIZE": "10000"
+    })
+
+    import bot
+    from dispatcher import Dispatcher
+
+    bot.USERS.client = CLIENT
+    bot.DISPATCHER = Dispatcher(100, globalRate=1e9, routeRate=1e9, routeBurst=1e9, cacheSize=1000000, resolveUser=bot.USERS.resolve)
+    bot.JOURNAL.load()
+    bot.QUEUES_RESTORED.set()
+    return bot
+
+#Adds a Server for every guild in <guilds> to the bot's registry, as on_ready would after reading them from the database
+#Parameters: <bot : module> <guilds : [FakeGuild]>
+def addGuilds(bot, guilds):
+    for guild in guilds:
+        bot.REGISTRY.addServer(bot.Server(guild))
@@ -0,0 +1,155 @@
+"""
+Animal Crossing New Horizons Island Queue Discord Bot
+Author: Marshall Jankovsky
+github.com/marshalltj/island-queue-bot
+
+Version: 2.0.0
+
+lockStress.py runs the real join, leave, dodo, remove, update and close handlers concurrently against many islands, with random
+Discord latency and visitor timeouts firing underneath them, then checks every queue is still consistent.
+
+Usage: python -m bench.lockStress [islands] [visitors per island] [seed]
+"""
+
+import asyncio
+import random
+import sys
+import tempfile
+import time
+
+from bench.fakes import LATENCY, FakeChannel, FakeContext, FakeGuild, FakeUser, addGuilds, loadBot
+
+#A visitor joins, asks for the Dodo code a few times, and usually leaves
+async def visitorSession(bot, guild, channel, user, islandId):
+    await asyncio.sleep(random.uniform(0, 0.02))
+    await bot.joinQueue.callback(FakeContext(user, guild, channel), islandId, random.randint(0, 3))
+    for i in range(random.randint(0, 2)):
+        await asyncio.sleep(random.uniform(0, 0.01))
+        await bot.sendDodoCode.callback(FakeContext(user), islandId)
+    await asyncio.sleep(random.uniform(0, 0.03))
+    if random.random() < 0.8:
+        await bot.leaveQueue.callback(FakeContext(user), islandId)
+
+#The owner removes people, resizes the queue and changes the price while visitors come and go, and sometimes closes the island
+async def ownerSession(bot, owner, rounds, closes):
+    for i in range(rounds):
+        await asyncio.sleep(random.uniform(0, 0.01))
+        choice = random.random()
+        if choice < 0.5:
+            await bot.removeUser.callback(FakeContext(owner), 1)
+        elif choice < 0.85:
+            await bot.updateQueue.callback(FakeContext(owner), "size", str(random.randint(1, 7)))
+        else:
+            await bot.updateQueue.callback(FakeContext(owner), "price", str(random.randint(90, 600)))
+
+    if closes:
+        await bot.closeQueue.callback(FakeContext(owner))
+
+#Checks the live queues against each other, the scheduler, the DMs sent and the journal
+#Returns: a list of problems found
+def check(bot, visitors):
+    from journal import Journal
+
+    problems = []
+    scheduled = {}
+    for key in bot.SCHEDULER.entries:
+        if key[0] == "visitor":
+            scheduled.setdefault(key[1], set()).add(key[2])
+
+    replayed = Journal(bot.JOURNAL_DIR)
+    state = replayed.load()
+    replayed.close()
+
+    for island in bot.REGISTRY.islands.values():
+        islandId = island.islandId
+        members = [visitor.userId for visitor in island.visitors]
+        admitted = {visitor.userId for visitor in island.visitors.admitted}
+
+        if len(members) != len(set(members)) or len(members) != len(island.visitors.members):
+            problems.append(f"{islandId}: queue holds duplicate or untracked visitors")
+        if len(admitted) != min(island.queueSize, len(members)):
+            problems.append(f"{islandId}: {len(admitted)} admitted with a queue size of {island.queueSize} and {len(members)} in line")
+        if scheduled.pop(islandId, set()) != admitted:
+            problems.append(f"{islandId}: visitor timeouts don't match the admitted visitors")
+
+        for userId in admitted:
+            if not any("it's your turn" in message and islandId in message for message in visitors[userId].dm.messages):
+                problems.append(f"{islandId}: admitted visitor {userId} was never sent the Dodo code")
+
+        record = state.pop(islandId, None)
+        if record == None or set(record["visitors"]) != {str(userId) for userId in members} or record["queueSize"] != island.queueSize:
+            problems.append(f"{islandId}: journal replay doesn't match the live queue")
+
+    for islandId in scheduled:
+        problems.append(f"{islandId}: timeouts left behind for a closed island")
+    for islandId in state:
+        problems.append(f"{islandId}: journal still has a closed island")
+    return problems
+
+#Opens <numIslands> islands with <numVisitors> visitor sessions each plus an owner session, runs them all at once and checks the queues
+#Parameters: <bot : module> from loadBot <numIslands : int> <numVisitors : int>
+#Returns: a tuple of (exceptions the handlers raised, consistency problems, number of sessions, seconds they took)
+async def stress(bot, numIslands, numVisitors):
+    guilds = [FakeGuild(i + 1) for i in range(max(1, numIslands // 10))]
+    addGuilds(bot, guilds)
+    for server in bot.REGISTRY:
+        server.timeout = 0.0005 #minutes, so visitor timeouts fire while the handlers run
+
+    owners = {}
+    visitors = {}
+    sessions = []
+    for i in range(numIslands):
+        guild = guilds[i % len(guilds)]
+        channel = FakeChannel(guild.id)
+        owner = FakeUser(10**9 + i)
+        owners[owner.id] = owner
+
+        await bot.createIsland.callback(FakeContext(owner, guild, channel))
+        await bot.openQueue.callback(FakeContext(owner), "DODO1", random.randint(1, 4))
+        islandId = bot.getIslandByOwner(owner).islandId
+
+        sessions.append(ownerSession(bot, owner, numVisitors // 4, random.random() < 0.1))
+        for j in range(numVisitors):
+            user = FakeUser(i * numVisitors + j + 1)
+            visitors[user.id] = user
+            sessions.append(visitorSession(bot, guild, channel, user, islandId))
+
+    expiry = asyncio.ensure_future(bot.SCHEDULER.run(bot.expiryGuild, bot.EXPIRY_CONCURRENCY))
+    startTime = time.perf_counter()
+    results = await asyncio.gather(*sessions, return_exceptions=True)
+    elapsed = time.perf_counter() - startTime
+
+    #stop new timeouts from firing and let the expiries already running finish before checking
+    for server in bot.REGISTRY:
+        server.timeout = 30
+    for island in bot.REGISTRY.islands.values():
+        for visitor in island.visitors.admitted:
+            bot.scheduleVisitor(island, visitor)
+    await asyncio.sleep(0.5)
+    expiry.cancel()
+    await bot.JOURNAL.flush()
+
+    errors = [result for result in results if isinstance(result, BaseException)]
+    return errors, check(bot, visitors), len(sessions), elapsed
+
+async def run(bot, numIslands, numVisitors):
+    errors, problems, sessions, elapsed = await stress(bot, numIslands, numVisitors)
+    for error in errors[:5]:
+        print(f"handler raised {error!r}")
+    for problem in problems[:20]:
+        print(problem)
+
+    print(f"{sessions} sessions over {numIslands} islands in {elapsed:.2f} seconds, {LATENCY.sends} sends.")
+    print(f"{len(errors)} handler errors, {len(problems)} consistency problems, {len(bot.REGISTRY.islands)} islands still open.")
+    return len(errors) == 0 and len(problems) == 0
+
+if __name__ == "__main__":
+    numIslands = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    numVisitors = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+    random.seed(int(sys.argv[3]) if len(sys.argv) > 3 else 1)
+
+    LATENCY.high = 0.005
+    with tempfile.TemporaryDirectory() as directory:
+        bot = loadBot(directory)
+        ok = asyncio.get_event_loop().run_until_complete(run(bot, numIslands, numVisitors))
+    sys.exit(0 if ok else 1)
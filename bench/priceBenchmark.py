@@ -0,0 +1,66 @@
+"""
+Animal Crossing New Horizons Island Queue Discord Bot
+Author: Marshall Jankovsky
+github.com/marshalltj/island-queue-bot
+
+Version: 2.0.0
+
+priceBenchmark.py measures how long the prices command's analysis takes over a large price log: the first analysis of a guild,
+a cached one, and one after the guild gets a new price. Also times appending prices one at a time as the commands do.
+
+Usage: python -m bench.priceBenchmark [prices] [guilds]
+"""
+
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import bench
+from prices import PriceLog
+
+#Parameters: <fn : function> <repeat : int>
+#Returns: the fastest of <repeat> runs of <fn> in milliseconds
+def best(fn, repeat=5):
+    times = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return min(times)
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    guilds = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+
+    rng = np.random.default_rng(1)
+    now = time.time()
+    with tempfile.TemporaryDirectory() as directory:
+        log = PriceLog(directory)
+        log.extend(rng.integers(0, guilds, count), now - rng.uniform(0, 365 * 86400, count), rng.integers(20, 660, count))
+
+        start = time.perf_counter()
+        for i in range(1000):
+            log.record(0, 100 + i, now)
+        record = (time.perf_counter() - start) * 1000 / 1000
+
+        def fresh():
+            log.cache.clear()
+            log.analyze(0)
+
+        def afterPrice():
+            log.record(0, 500, now)
+            log.analyze(0)
+
+        def remapped():
+            log._mapped = None
+            fresh()
+
+        print(f"{log.rows:,} prices over {guilds} guilds, {log.rows // guilds:,} in the guild analyzed:")
+        print(f"{'record':>22}: {record:8.3f} ms")
+        print(f"{'analyze (mapping files)':>22}: {best(remapped):8.3f} ms")
+        print(f"{'analyze':>22}: {best(fresh):8.3f} ms")
+        print(f"{'analyze after a price':>22}: {best(afterPrice):8.3f} ms")
+        print(f"{'analyze (cached)':>22}: {best(lambda: log.analyze(0)) * 1000:8.3f} us")
+        log.close()
@@ -0,0 +1,82 @@
+"""
+Animal Crossing New Horizons Island Queue Discord Bot
+Author: Marshall Jankovsky
+github.com/marshalltj/island-queue-bot
+
+Version: 2.0.0
+
+storeBenchmark.py compares join/leave throughput of the queue store backends: the in-process store, the SQLite store with one
+transaction per change, and the SQLite store written in the batches BackgroundStore uses.
+
+Usage: python -m bench.storeBenchmark [visitors per island] [islands]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+import bench
+from queueStore import MemoryQueueStore, SqliteQueueStore
+
+BATCH_SIZE = 500 #BackgroundStore's default batch size
+
+#Fills <islands> islands with <visitors> users each, looks up every position, then has everyone leave in random order.
+#Joins and leaves are applied one at a time, or <batchSize> at a time with applyRecords() if it's given.
+#Parameters: <store : QueueStore> <visitors : int> <islands : int> <batchSize : int>
+#Returns: a dict of operations per second for each phase
+def run(store, visitors, islands, batchSize=None):
+    islandIds = [f"{i:04d}" for i in range(islands)]
+    for islandId in islandIds:
+        store.createIsland(islandId, 1, 1, None, time.time())
+        store.openIsland(islandId, "ABCDE", 3)
+
+    results = {}
+    users = list(range(visitors))
+
+    def apply(records):
+        if batchSize == None:
+            for op, islandId, fields in records:
+                if op == "join":
+                    store.enqueue(islandId, fields["user"], fields["trips"], fields["at"])
+                else:
+                    store.dequeue(islandId, fields["user"])
+        else:
+            for i in range(0, len(records), batchSize):
+                store.applyRecords(records[i:i + batchSize])
+
+    joins = [("join", islandId, {"user": user, "trips": 1, "at": time.time()}) for islandId in islandIds for user in users]
+    start = time.perf_counter()
+    apply(joins)
+    results["join"] = len(joins) / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for islandId in islandIds:
+        for user in users:
+            store.position(islandId, user)
+    results["position"] = visitors * islands / (time.perf_counter() - start)
+
+    random.shuffle(users)
+    leaves = [("leave", islandId, {"user": user}) for islandId in islandIds for user in users]
+    start = time.perf_counter()
+    apply(leaves)
+    results["leave"] = len(leaves) / (time.perf_counter() - start)
+
+    return results
+
+if __name__ == "__main__":
+    visitors = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    islands = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    with tempfile.TemporaryDirectory() as directory:
+        backends = (
+            ("memory", MemoryQueueStore(), None),
+            ("sqlite", SqliteQueueStore(os.path.join(directory, "single.db")), None),
+            ("batched", SqliteQueueStore(os.path.join(directory, "batched.db")), BATCH_SIZE)
+        )
+        print(f"{visitors} visitors on each of {islands} islands, operations per second:")
+        for name, store, batchSize in backends:
+            results = run(store, visitors, islands, batchSize)
+            store.close()
+            print(f"{name:>8}: " + "  ".join(f"{phase} {rate:>10,.0f}" for phase, rate in results.items()))
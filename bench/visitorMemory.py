@@ -0,0 +1,80 @@
+"""
+Animal Crossing New Horizons Island Queue Discord Bot
+Author: Marshall Jankovsky
+github.com/marshalltj/island-queue-bot
+
+Version: 2.0.0
+
+visitorMemory.py measures how much memory queued visitors take with the old dict-backed Visitor that held a discord.User and the
+__slots__ Visitor that only holds ids, including the name cache the bot keeps for rendering.
+
+Usage: python -m bench.visitorMemory [visitors]
+"""
+
+import random
+import sys
+import time
+import tracemalloc
+
+import bench
+from users import UserDirectory
+from visitor import Visitor
+
+#Class with the same attributes as a discord.User in discord.py 1.x, which the old Visitor kept alive for every queued user
+class LegacyUser:
+    __slots__ = ("name", "id", "discriminator", "avatar", "bot", "system", "_public_flags", "_state", "__weakref__")
+
+    def __init__(self, id, state):
+        self.name = f"visitor{id}"
+        self.id = id
+        self.discriminator = f"{id % 10000:04d}"
+        self.avatar = f"{random.getrandbits(128):032x}"
+        self.bot = False
+        self.system = False
+        self._public_flags = 0
+        self._state = state
+
+#The Visitor as it was before it was changed to hold ids
+class LegacyVisitor:
+    def __init__(self, user, trips):
+        self.user = user
+        if trips == 0:
+            self.trips = "?"
+        else:
+            self.trips = trips
+        self.timestamp = time.monotonic()
+
+#Parameters: <build : function> returning the objects to measure
+#Returns: a tuple of (the objects, bytes allocated while building them)
+def measure(build):
+    tracemalloc.start()
+    startSize = tracemalloc.get_traced_memory()[0]
+    objects = build()
+    size = tracemalloc.get_traced_memory()[0] - startSize
+    tracemalloc.stop()
+    return objects, size
+
+if __name__ == "__main__":
+    numVisitors = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    random.seed(1)
+    userIds = [random.getrandbits(62) for i in range(numVisitors)] #discord ids are 64 bit snowflakes
+    trips = [random.randint(0, 3) for i in range(numVisitors)]
+    state = object()
+
+    legacy, legacySize = measure(lambda: [LegacyVisitor(LegacyUser(userIds[i], state), trips[i]) for i in range(numVisitors)])
+    del legacy
+
+    compact, compactSize = measure(lambda: [Visitor(userIds[i], trips[i]) for i in range(numVisitors)])
+
+    def rememberAll():
+        directory = UserDirectory(numVisitors)
+        for i in range(numVisitors):
+            directory.remember(LegacyUser(userIds[i], state))
+        return directory
+    directory, namesSize = measure(rememberAll)
+
+    print(f"{numVisitors} visitors")
+    print(f"{'':<26} {'MB':>8} {'bytes each':>11}")
+    for label, size in (("old Visitor + discord.User", legacySize), ("slotted Visitor", compactSize), ("name cache", namesSize), ("slotted + name cache", compactSize + namesSize)):
+        print(f"{label:<26} {size / 2**20:>8.1f} {size / numVisitors:>11.0f}")
+    print(f"slotted Visitors use {legacySize / compactSize:.1f}x less memory, {legacySize / (compactSize + namesSize):.1f}x with a full name cache")
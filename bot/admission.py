@@ -0,0 +1,102 @@
+"""
+Animal Crossing New Horizons Island Queue Discord Bot
+Author: Marshall Jankovsky
+github.com/marshalltj/island-queue-bot
+
+Version: 2.0.0
+
+admission.py contains a class AdmissionControl that rate limits commands per user and per guild before any command runs, so one
+user spamming join/leave/list or a raid flooding create can't use up the lookups and Discord quota every other guild shares.
+"""
+
+import collections
+import time
+
+from discord.ext import commands
+from dispatcher import TokenBucket
+
+#(tokens a second, burst) for each user and for each guild, by command
+LIMITS = {
+    "create": ((1 / 60, 2), (1 / 5, 5)),
+    "join": ((1 / 5, 3), (5, 30)),
+    "leave": ((1 / 5, 3), (5, 30)),
+    "dodo": ((1 / 5, 3), (5, 30)),
+    "list": ((1 / 5, 3), (2, 10))
+}
+DEFAULT_LIMIT = ((1 / 2, 5), (5, 30)) #every other command
+
+#CheckFailure raised for a command that was rate limited, the user has already been told if they needed to be
+#Members: <retryAfter : float> <scope : str> "user" or "guild"
+class RateLimited(commands.CheckFailure):
+    def __init__(self, retryAfter, scope):
+        super().__init__(f"rate limited per {scope} for {retryAfter:.1f} seconds")
+        self.retryAfter = retryAfter
+        self.scope = scope
+
+#Class that keeps a TokenBucket for every (user, command) and (guild, command) pair. A command runs only if both have a token.
+#Buckets are kept least recently used first and full ones are dropped once there are more than <maxBuckets>.
+#Members: <limits : {str : ((float, float), (float, float))}> <scale : float> <maxBuckets : int> <buckets : OrderedDict(tuple : TokenBucket)>
+#<notified : {(int, str) : float}> <rejected : int>
+class AdmissionControl:
+    #<scale> multiplies every rate and burst, 0 turns rate limiting off
+    def __init__(self, limits=LIMITS, scale=1.0, maxBuckets=100000):
+        self.limits = limits
+        self.scale = scale
+        self.maxBuckets = maxBuckets
+        self.buckets = collections.OrderedDict()
+        self.notified = {} #(user id, command) -> time.monotonic() until which the user has already been told to wait
+        self.rejected = 0
+
+    #Takes a token for <command> from <userId>'s and <guildId>'s buckets if both have one
+    #Parameters: <command : str> <userId : int> <guildId : int> None for DMs
+    #Returns: a tuple of (0 if the command may run or seconds until it may, None or the scope that rejected it)
+    def admit(self, command, userId, guildId):
+        if self.scale <= 0:
+            return 0, None
+
+        userLimit, guildLimit = self.limits.get(command, DEFAULT_LIMIT)
+        userBucket = self._bucket(("user", userId, command), userLimit)
+        wait = userBucket.peek()
+        if wait > 0:
+            self.rejected += 1
+            return wait, "user"
+
+        guildBucket = None
+        if guildId != None:
+            guildBucket = self._bucket(("guild", guildId, command), guildLimit)
+            wait = guildBucket.peek()
+            if wait > 0:
+                self.rejected += 1
+                return wait, "guild"
+
+        userBucket.reserve()
+        if guildBucket != None:
+            guildBucket.reserve()
+        return 0, None
+
+    #Only the first rejection of a user's <command> in each cooldown window gets a reply
+    #Parameters: <userId : int> <command : str> <wait : float> seconds until the command is allowed again
+    #Returns: True if the user should be told to wait
+    def shouldNotify(self, userId, command, wait):
+        now = time.monotonic()
+        key = (userId, command)
+        if self.notified.get(key, 0) > now:
+            return False
+
+        if len(self.notified) >= self.maxBuckets:
+            self.notified = {key: until for key, until in self.notified.items() if until > now}
+        self.notified[key] = now + wait
+        return True
+
+    def _bucket(self, key, limit):
+        bucket = self.buckets.get(key)
+        if bucket == None:
+            rate, burst = limit
+            bucket = TokenBucket(rate * self.scale, max(1, burst * self.scale))
+            self.buckets[key] = bucket
+
+            while len(self.buckets) > self.maxBuckets and self.buckets[next(iter(self.buckets))].isIdle():
+                self.buckets.popitem(last=False)
+        else:
+            self.buckets.move_to_end(key)
+        return bucket
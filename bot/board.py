@@ -0,0 +1,131 @@
+"""
+Animal Crossing New Horizons Island Queue Discord Bot
+Author: Marshall Jankovsky
+github.com/marshalltj/island-queue-bot
+
+Version: 2.0.0
+
+board.py contains a class QueueBoards that keeps one pinned, live-updating queue message per open island for servers that opt in.
+"""
+
+import asyncio
+import logging
+
+import discord
+import listing
+
+#Class that tracks the board message for one island
+#Members: <island : Island> <message : discord.Message> <version : int>
+class Board:
+    def __init__(self, island, message):
+        self.island = island
+        self.message = message
+        self.version = island.version #island version the message currently shows
+
+#Class that edits each island's board message when its queue changes.
+#Rather than editing on every change, boards are checked every <interval> seconds and only edited if the island's version moved,
+#so a burst of joins costs at most one edit per board per interval.
+#Members: <interval : float> <nameOf : function> <boards : {str : Board}> <edits : int>
+class QueueBoards:
+    #<nameOf> returns the name to show for a user id, see users.py
+    def __init__(self, interval=5.0, nameOf=str):
+        self.interval = interval
+        self.nameOf = nameOf
+        self.boards = {}
+        self.edits = 0
+
+    def __len__(self):
+        return len(self.boards)
+
+    #Parameters: <island : Island>
+    #Returns: the text of the board for <island>
+    def render(self, island):
+        return "Live queue, updated automatically:\n" + listing.renderIslandPages(island, self.nameOf)[0]
+
+    #Posts and pins a board for <island> in <channel>
+    #Parameters: <island : Island> <channel : discord.TextChannel>
+    #Returns: the new Board, or None if none was posted
+    async def open(self, island, channel):
+        if channel == None or island.islandId in self.boards:
+            return None
+
+        try:
+            message = await channel.send(self.render(island))
+        except discord.HTTPException:
+            logging.error("Could not post the queue board for island %s in %s.", island.islandId, channel, extra={"island": island.islandId})
+            return None
+
+        try:
+            await message.pin()
+        except discord.HTTPException: #missing Manage Messages, the board still works unpinned
+            logging.info("Could not pin the queue board for island %s in %s.", island.islandId, channel, extra={"island": island.islandId})
+
+        board = Board(island, message)
+        self.boards[island.islandId] = board
+        return board
+
+    #Parameters: <islandId : str>
+    #Returns: [channel id, message id] of the board for <islandId> as kept in the journal, or None if it has no board
+    def location(self, islandId):
+        board = self.boards.get(islandId)
+        if board == None:
+            return None
+        return [board.message.channel.id, board.message.id]
+
+    #Picks up the board message posted for an island before a restart. If the island couldn't be restored, the message is marked closed
+    #instead so it doesn't keep showing a queue nobody is serving.
+    #Parameters: <islandId : str> <channel : discord.TextChannel> <messageId : int> <island : Island> None if it wasn't restored
+    async def reattach(self, islandId, channel, messageId, island=None):
+        if channel == None:
+            return
+
+        try:
+            message = await channel.fetch_message(messageId)
+        except discord.NotFound: #deleted while the bot was down
+            return
+        except discord.HTTPException:
+            logging.error("Could not find the queue board for island %s in %s.", islandId, channel, extra={"island": islandId})
+            return
+
+        if island == None:
+            await self._closeMessage(islandId, message)
+            return
+
+        board = Board(island, message)
+        board.version = None #the message shows the queue from before the restart, edit it on the next refresh
+        self.boards[islandId] = board
+
+    #Stops updating the board for a closed <island> and marks it closed in the background
+    #Parameters: <island : Island>
+    def discard(self, island):
+        board = self.boards.pop(island.islandId, None)
+        if board != None:
+            asyncio.ensure_future(self._closeMessage(island.islandId, board.message))
+
+    async def _closeMessage(self, islandId, message):
+        try:
+            await message.edit(content=f"The queue for island {islandId} has closed.")
+            await message.unpin()
+        except discord.HTTPException:
+            pass
+
+    #Edits every board whose island changed since its last edit
+    async def refresh(self):
+        for islandId, board in list(self.boards.items()):
+            if board.version == board.island.version:
+                continue
+
+            board.version = board.island.version
+            try:
+                await board.message.edit(content=self.render(board.island))
+                self.edits += 1
+            except discord.NotFound: #someone deleted the board, stop tracking it
+                self.boards.pop(islandId, None)
+            except discord.HTTPException:
+                logging.error("Could not update the queue board for island %s.", islandId, extra={"island": islandId})
+
+    #Runs forever, refreshing boards every <interval> seconds
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.refresh()
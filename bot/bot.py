@@ -9,18 +9,39 @@ bot.py is a discord.ext.commands.Bot implementation for setup, connections and c
 """
 
 import os
+import sys
 import discord
 import helpMessages
-import random
+import listing
 import asyncio
 import logging
-import mysql.connector
+import time
+import math
 
 from discord.ext import commands
-from datetime import datetime
 from dotenv import load_dotenv
 from island import Island
 from server import Server
+from database import Database
+from configWriter import ConfigWriter
+from registry import Registry
+from idAllocator import IdAllocator, IdPoolExhausted
+from scheduler import ExpiryScheduler
+from journal import Journal, snapshotIsland, fromWallClock, toWallClock
+from visitor import Visitor
+from dispatcher import Dispatcher
+from users import UserDirectory
+from estimator import formatWait
+from history import HistoryStore
+from prices import PriceLog, DAYS, MIN_PRICE, MAX_PRICE
+from admission import AdmissionControl, RateLimited
+import coalescer
+from coalescer import ChannelCoalescer
+from board import QueueBoards
+from cluster import ClusterRouter, clusterForIsland
+from queueStore import BackgroundStore, MemoryQueueStore, SqliteQueueStore
+from metrics import METRICS
+from logPipeline import setupLogging
 
 #---Env/Constants setup---#
 load_dotenv()
@@ -29,66 +50,184 @@ DB_HOST = os.getenv('DB_HOST') #database host
 DB_USER = os.getenv('DB_USER') #database user
 DB_PW = os.getenv('DB_PW') #database password
 DB_NAME = os.getenv('DB_NAME') #database name
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5)) #max number of pooled database connections
+ISLAND_ID_WIDTH = int(os.getenv('ISLAND_ID_WIDTH', 4)) #number of digits in an island ID
+ISLAND_ID_PREFIX = os.getenv('ISLAND_ID_PREFIX', "") #prefix for island IDs, lets several bot processes share a namespace without colliding
+ISLAND_ID_START = os.getenv('ISLAND_ID_START') #optional first number (inclusive) this process hands out
+ISLAND_ID_STOP = os.getenv('ISLAND_ID_STOP') #optional last number (exclusive) this process hands out
+JOURNAL_DIR = os.getenv('JOURNAL_DIR', "../journal") #directory for the queue journal and its snapshots
+HISTORY_DB = os.getenv('HISTORY_DB', "../history.db") #SQLite file for the visit history, empty turns it off
+PRICE_DIR = os.getenv('PRICE_DIR', "../prices") #directory for the turnip price log, empty turns it off
+JOURNAL_SNAPSHOT_INTERVAL = int(os.getenv('JOURNAL_SNAPSHOT_INTERVAL', 300)) #seconds between journal compactions
+JOURNAL_FSYNC = os.getenv('JOURNAL_FSYNC', "1") != "0" #0 skips syncing journal writes, faster on slow disks but a power loss can drop recent changes
+DM_CONCURRENCY = int(os.getenv('DM_CONCURRENCY', 10)) #max DMs being sent at once
+DM_CACHE_SIZE = int(os.getenv('DM_CACHE_SIZE', 5000)) #number of DM channels kept open
+RATE_LIMIT_SCALE = float(os.getenv('RATE_LIMIT_SCALE', 1)) #multiplies the per user and per guild command rates in admission.py, 0 turns rate limiting off
+NAME_CACHE_SIZE = int(os.getenv('NAME_CACHE_SIZE', 100000)) #names of recent users kept for rendering queues when discord's cache doesn't have them
+CHANNEL_COALESCE_WINDOW = float(os.getenv('CHANNEL_COALESCE_WINDOW', 2)) #seconds channel replies are buffered during a burst, 0 to disable
+EXPIRY_CONCURRENCY = int(os.getenv('EXPIRY_CONCURRENCY', 10)) #max guilds having their expired visitors and islands handled at once
+BOARD_INTERVAL = float(os.getenv('BOARD_INTERVAL', 5)) #seconds between live queue board edits
+QUEUE_STORE = os.getenv('QUEUE_STORE') #optional SQLite file to keep queue state in, can be shared by the processes on one host, kept in memory without it
+LOG_DIR = os.getenv('LOG_DIR', "../logs") #directory for bot.log and its rotated, gzipped copies
+LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', 10 * 1024 * 1024)) #size bot.log is rotated at
+LOG_ROTATE_HOURS = float(os.getenv('LOG_ROTATE_HOURS', 24)) #age bot.log is rotated at
+LOG_BACKUPS = int(os.getenv('LOG_BACKUPS', 14)) #rotated log files kept
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', 10000)) #log records waiting to be written before new ones are dropped
+METRICS_HOST = os.getenv('METRICS_HOST', "127.0.0.1") #address the Prometheus metrics endpoint listens on
+METRICS_PORT = int(os.getenv('METRICS_PORT', 9090)) #port for the metrics endpoint, 0 turns it off
+CLUSTER_ID = int(os.getenv('CLUSTER_ID') or 0) #which process this is when running under cluster.py
+CLUSTER_COUNT = int(os.getenv('CLUSTER_COUNT') or 1) #number of bot processes, commands for islands owned by another process are routed to it
+CLUSTER_PORT = int(os.getenv('CLUSTER_PORT', 7070)) #process N listens for routed commands on localhost port CLUSTER_PORT + N
+CLUSTER_SECRET = os.getenv('CLUSTER_SECRET') or None #shared by the cluster processes, routed commands without it are rejected
+SHARD_COUNT = os.getenv('SHARD_COUNT') or None #optional total number of shards, runs the bot as an AutoShardedBot
+SHARD_IDS = os.getenv('SHARD_IDS') or None #optional comma separated shards this process connects, defaults to all of them
+DM_PREFETCH = 3 #how many users at the front of each island's waiting line get their DM channel opened ahead of time
 
 DEBUG = False #flag to disable some restrictions when debugging
-SERVERS = [] #global list containing all guilds the bot is connected to
+DB = Database(DB_HOST, DB_USER, DB_PW, DB_NAME, maxSize=DB_POOL_SIZE) #pooled connections for storing Server information
+CONFIG_WRITER = ConfigWriter(DB) #writes Server config changes to the DB in the background
+REGISTRY = Registry() #indexes of all guilds the bot is connected to and their islands
+SCHEDULER = ExpiryScheduler() #deadlines for timing out Visitors and closing old Islands
+ISLAND_MAX_AGE = 10 #hours an island can stay open before it is closed automatically
+JOURNAL = Journal(JOURNAL_DIR, fsync=JOURNAL_FSYNC) #append-only record of queue changes for recovering open queues after a restart
+USERS = UserDirectory(NAME_CACHE_SIZE) #turns the user ids queues hold into names and discord.Users, its client is set once the bot is created
+DISPATCHER = Dispatcher(DM_CONCURRENCY, cacheSize=DM_CACHE_SIZE, resolveUser=USERS.resolve) #sends DMs concurrently within Discord's rate limits
+COALESCER = ChannelCoalescer(CHANNEL_COALESCE_WINDOW) #merges bursts of join/leave replies and announcements per channel
+BOARDS = QueueBoards(BOARD_INTERVAL, USERS.name) #live-updating queue messages for servers that turned them on
+ADMISSION = AdmissionControl(scale=RATE_LIMIT_SCALE) #token buckets per user, guild and command, checked before every command
+QUEUES_RESTORED = asyncio.Event() #set once the journal has been replayed, commands wait on it
+ISLAND_IDS = IdAllocator(
+    ISLAND_ID_WIDTH,
+    ISLAND_ID_PREFIX,
+    None if ISLAND_ID_START == None else int(ISLAND_ID_START),
+    None if ISLAND_ID_STOP == None else int(ISLAND_ID_STOP)
+)
+STORE = BackgroundStore(SqliteQueueStore(QUEUE_STORE) if QUEUE_STORE else MemoryQueueStore()) #queue state by id, written in the background, see queueStore.py
+HISTORY = HistoryStore(HISTORY_DB) if HISTORY_DB else None #visit events and their hourly/daily rollups, see history.py
+PRICES = PriceLog(PRICE_DIR) if PRICE_DIR else None #every turnip price islands were created or updated with, see prices.py
+ROUTER = ClusterRouter(CLUSTER_ID, CLUSTER_COUNT, CLUSTER_PORT, CLUSTER_SECRET) if CLUSTER_COUNT > 1 else None #routes commands between cluster processes
+
+#one gateway connection unless a shard count is given, see cluster.py
+BotBase = commands.AutoShardedBot if SHARD_COUNT != None else commands.Bot
+shardOptions = {}
+if SHARD_COUNT != None:
+    shardOptions["shard_count"] = int(SHARD_COUNT)
+    if SHARD_IDS:
+        shardOptions["shard_ids"] = [int(shard) for shard in SHARD_IDS.split(",")]
+
+#commands.Bot that flushes queued config writes and closes the DB pool when it shuts down
+class IslandQueueBot(BotBase):
+    async def close(self):
+        if ROUTER != None:
+            await ROUTER.close()
+        await METRICS.close()
+        await COALESCER.close()
+        await CONFIG_WRITER.close()
+        logging.info("Flushed config writes, last flush took %.3f seconds. %d failed writes.", CONFIG_WRITER.lastFlushLatency, CONFIG_WRITER.failures)
+        await DB.close()
+        JOURNAL.close()
+        await STORE.close()
+        if HISTORY != None:
+            await HISTORY.close()
+        if PRICES != None:
+            PRICES.close()
+        await super().close()
+        LOG_LISTENER.stop() #writes out everything still queued
+
+    #commands with their own error handler skip RateLimited there, this covers the rest
+    async def on_command_error(self, ctx, error):
+        if isinstance(error, RateLimited): #admitCommand already replied if it needed to
+            return
+        await super().on_command_error(ctx, error)
 
-bot = commands.Bot(command_prefix=helpMessages.COMMAND_PREFIX, case_insensitive=True)
+bot = IslandQueueBot(command_prefix=helpMessages.COMMAND_PREFIX, case_insensitive=True, **shardOptions)
+USERS.client = bot
 bot.remove_command('help')
 
+#---Metrics Setup---#
+METRICS.gauge("guilds", lambda: len(REGISTRY), "Guilds the bot is connected to.")
+METRICS.gauge("open_islands", lambda: len(REGISTRY.islands), "Islands with a queue.")
+METRICS.gauge("visitors_waiting", lambda: REGISTRY.totals.waiting, "Visitors waiting in line over every island.")
+METRICS.gauge("visitors_admitted", lambda: REGISTRY.totals.admitted, "Visitors allowed on an island.")
+METRICS.describe("command_seconds", "Time spent running each command.")
+METRICS.describe("commands_total", "Commands run, by command and outcome.")
+METRICS.describe("dm_send_seconds", "Time taken by each DM send, including opening the DM channel.")
+METRICS.describe("db_query_seconds", "Time taken by each database statement, including waiting for a connection.")
+METRICS.describe("expiry_cycle_seconds", "Time taken by each pass over expired visitors and islands.")
+METRICS.describe("expiry_deadlines_total", "Visitor and island deadlines handled by the expiry passes.")
+METRICS.describe("dm_sent_total", "DMs sent.")
+METRICS.describe("dm_failed_total", "DMs that could not be sent.")
+METRICS.describe("dm_rate_limited_total", "DM sends Discord answered with a 429.")
+METRICS.gauge("dm_channel_cache_size", lambda: len(DISPATCHER.channels), "DM channels kept open.")
+METRICS.gauge("dm_channel_cache_hits", lambda: DISPATCHER.channels.hits, "DM channel lookups served from the cache.")
+METRICS.gauge("dm_channel_cache_misses", lambda: DISPATCHER.channels.misses, "DM channel lookups that had to open a channel.")
+METRICS.gauge("dm_channel_cache_hit_ratio", lambda: DISPATCHER.channels.hitRate(), "Fraction of DM channel lookups served from the cache.")
+METRICS.gauge("dm_recent_send_seconds", lambda: DISPATCHER.averageLatency(), "Average time the most recent 1000 DM sends took.")
+METRICS.describe("visitors_served_total", "Visitors that were let on an island and then left or timed out.")
+METRICS.gauge("visitors_served_per_hour", lambda: sum(island.getThroughput() for island in REGISTRY.islands.values()), "Visitors served an hour over every open island.")
+METRICS.gauge("config_writes_pending", lambda: CONFIG_WRITER.queueDepth(), "Guilds with config changes waiting to be written to the database.")
+METRICS.gauge("config_flush_seconds", lambda: CONFIG_WRITER.lastFlushLatency, "Time the most recent config flush took.")
+METRICS.gauge("queue_store_pending", lambda: len(STORE.pending), "Queue changes waiting to be written to the queue store.")
+METRICS.gauge("history_events_pending", lambda: len(HISTORY.pending) if HISTORY != None else 0, "Visit events waiting to be written to the history.")
+METRICS.gauge("prices_stored", lambda: PRICES.rows if PRICES != None else 0, "Turnip prices kept in the price log.")
+METRICS.describe("commands_rejected_total", "Commands rejected by rate limiting, by command and whether the user or guild limit was hit.")
+METRICS.gauge("rate_limit_buckets", lambda: len(ADMISSION.buckets), "Token buckets kept for rate limiting commands.")
+
 #---Logging Setup---#
-logFileName = '../logs/' + str(datetime.now().strftime('%m_%d_%y_%I_%M')) + '.log'
-if DEBUG:  
-    logFileName = "../logs/log.log"
-logging.basicConfig(format='%(asctime)s: %(message)s', filename=logFileName, filemode='w', level=logging.INFO, datefmt='%m-%d-%y %H:%M:%S')
-console = logging.StreamHandler()
-console.setLevel(logging.ERROR)
-logging.getLogger("").addHandler(console)
+#records are queued and written as JSON lines to LOG_DIR/bot.log by a background thread, see logPipeline.py
+LOG_LISTENER, LOG_QUEUE = setupLogging(LOG_DIR, logging.INFO, LOG_MAX_BYTES, LOG_ROTATE_HOURS * 3600, LOG_BACKUPS, LOG_QUEUE_SIZE)
+METRICS.gauge("log_records_dropped", lambda: LOG_QUEUE.dropped, "Log records dropped because the log queue was full.")
 
 #---Helper Funtions---#
 
-#Searches all Servers for an Island owned by <owner>
+#Looks up the Island owned by <owner> in any Server
 #Parameters: <owner : discord.User>
 #Returns the Island or None if not found
 def getIslandByOwner(owner):
-    for server in SERVERS:
-        for island in server.islands:
-            if island.owner == owner:
-                return island
+    return REGISTRY.getIslandByOwner(owner)
 
-#Searches a <server> for an Island owned by <owner>
+#Looks up the Island owned by <owner> in a <server>
 #Parameters: <owner : discord.User> <server : Server>
 #Returns the Island or None if not found
 def getIslandByOwnerInServer(owner, server):
-    for island in server.islands:
-        if island.owner == owner:
-            return island
+    return REGISTRY.getIslandByOwnerInGuild(owner, server.guild)
 
-#Seaches for all Servers for an Island by its unique <islandId> generated from createIslandId()
+#Looks up an Island in any Server by its unique <islandId> generated from createIslandId()
 #Parameters: <islandId : str>
 #Returns the Island or None if not found
 def getIslandById(islandId):
-    for server in SERVERS:
-        for island in server.islands:
-            if island.islandId == islandId:
-                return island  
+    return REGISTRY.getIslandById(islandId)
 
-#Seaches for a Servers for an Island by its unique <islandId> generated from createIslandId()
+#Looks up an Island in a <server> by its unique <islandId> generated from createIslandId()
 #Parameters: <islandId : str> <server : Server>
 #Returns the Island or None if not found
 def getIslandByIdInServer(islandId, server):
-    for island in server.islands:
-        if island.islandId == islandId:
-            return island  
+    return server.islands.get(islandId)
 
-#Creates a random and unique 4 digit island ID
+#Parameters: <island : Island>
+#Returns: True if <island> is still open, check again after waiting for island.lock
+def isOpen(island):
+    return getIslandById(island.islandId) is island
+
+#Creates a random and unique island ID (4 digits unless ISLAND_ID_WIDTH is set)
 #Returns the islandId as a str
 def createIslandId():
-    islandId = f'{random.randrange(1, 10**4):04}'
-    if getIslandById(islandId) == None:
-        return islandId
-    else: #ID already exists, try again
-        return createIslandId()
+    return ISLAND_IDS.allocate()
+
+#Removes an <island> from the registry and returns its ID to the pool
+#Parameters: <island : Island>
+#Returns: True if the island was removed
+def deleteIsland(island):
+    if REGISTRY.removeIsland(island):
+        recordChange("close", island.islandId)
+        recordVisit("close", island)
+        ISLAND_IDS.release(island.islandId)
+        SCHEDULER.cancel(("island", island.islandId))
+        BOARDS.discard(island)
+        for visitor in island.visitors.admitted:
+            cancelVisitor(island, visitor.userId)
+        return True
+    return False
 
 #Checks if a <user> has admin permissions in <guild>
 #Parameters: <user : discord.User> <guild : discord.Guild>
@@ -108,104 +247,332 @@ def isUserAdmin(user, guild):
 #Parameters: <guild : discord.Guild>
 #Returns: the Server or None if not found
 def getServerByGuild(guild):
-    for server in SERVERS:
-        if server.guild == guild:
-            return server
-
-#Creates an SQL connection for modifying the databse for storing Server information
-#Returns: The SQL connection
-def sqlConnection():
-    return mysql.connector.connect(
-            host=DB_HOST,
-            user=DB_USER,
-            passwd=DB_PW,
-            database=DB_NAME
-        )
+    return REGISTRY.getServer(guild)
+
+#Reads the stored properties for a <guild>, adding it to the database if it isn't there yet
+#Parameters: <guild : discord.Guild>
+#Returns: the Server for the guild
+async def loadServer(guild):
+    row = await DB.getServer(guild.id)
+
+    if row == None:
+        await DB.addServer(guild.id)
+        logging.info("Adding %s to database.", guild, extra={"guild": guild.id})
+
+    else:
+        logging.info("%s already present in database.", guild, extra={"guild": guild.id})
+
+    return Server(guild, row)
+
+#Loads every <guild> the bot doesn't have a Server for yet with one bulk read and one bulk insert
+#Parameters: <guilds : [discord.Guild]>
+async def loadServers(guilds):
+    guilds = [guild for guild in guilds if getServerByGuild(guild) == None]
+    rows = await DB.getServers([guild.id for guild in guilds])
+
+    missing = [guild.id for guild in guilds if guild.id not in rows]
+    if len(missing) > 0:
+        await DB.addServers(missing)
+        logging.info("Added %d servers to database.", len(missing))
+
+    for guild in guilds:
+        REGISTRY.addServer(Server(guild, rows.get(guild.id)))
+
+#Journals a queue change and queues it for the queue store
+#Parameters: <op : str> <islandId : str> <fields> the fields of the journal record, see journal.py
+def recordChange(op, islandId, **fields):
+    JOURNAL.record(op, islandId, **fields)
+    STORE.record(op, islandId, fields)
+
+#Adds a visit event on <island> to the history
+#Parameters: <kind : str> see history.KINDS <island : Island> <userId : int> <trips : int> <dwell : float> seconds an admitted visitor stayed
+def recordVisit(kind, island, userId=None, trips=None, dwell=None):
+    if HISTORY != None:
+        HISTORY.record(kind, island.islandId, island.guild.id, userId, trips, dwell)
+
+#Adds a turnip price given in <guildId> to the price log
+#Parameters: <guildId : int> <price : int>
+def recordPrice(guildId, price):
+    if PRICES != None and price != None:
+        PRICES.record(guildId, price)
+
+#Starts the timeout for every Visitor in <visitors> that was just allowed on <island>.
+#Called while holding island.lock, the Dodo codes are sent with messageUsers() once it is released.
+#Parameters: <visitors : [Visitor]> <island : Island>
+def admitVisitors(visitors, island):
+    for visitor in visitors:
+        visitor.setTimestamp()
+        recordChange("admit", island.islandId, user=visitor.userId, at=toWallClock(visitor.timestamp))
+        recordVisit("admit", island, visitor.userId)
+        scheduleVisitor(island, visitor)
 
 #Messages a user when they're allowed to visit an Island with the dodo code
 #Parameters: <visitor: Visitor> <island Island>
 async def messageUser(visitor, island):
-    logging.info(f"Messaging {visitor.user} to allow them on island {island.islandId}. User queue position: {island.getUserPositionInQueue(visitor.user) + 1}")
+    logging.info("Messaging %s to allow them on island %s.", visitor.userId, island.islandId, extra={"island": island.islandId, "user": visitor.userId})
 
+    await DISPATCHER.send(
+        visitor.userId,
+        f"Hello {USERS.name(visitor.userId)}, it's your turn to go to {island.owner.name}'s island! Use the Dodo code '{island.code}' to fly, and be sure to leave the queue with '{helpMessages.COMMAND_PREFIX}leave {island.islandId}' once you are done and completely off the island."
+    )
+
+#Messages every Visitor in <visitors> the dodo code for <island> concurrently
+#Parameters: <visitors : [Visitor]> <island : Island>
+async def messageUsers(visitors, island):
+    await asyncio.gather(*[messageUser(visitor, island) for visitor in visitors])
+    warmNextVisitors(island)
+
+#Opens DM channels in the background for the next users waiting on <island> so the Dodo code goes out quickly when a spot frees up
+#Parameters: <island : Island>
+def warmNextVisitors(island):
+    DISPATCHER.prefetch([visitor.userId for visitor in island.visitors.waiting(DM_PREFETCH)])
+
+#Rebuilds the islands recorded in the journal, reserving their IDs and rescheduling their deadlines and picking their boards back up.
+#The journal is the durable copy, so the queue store is brought in line with it and the islands are read back from the store.
+async def restoreQueues():
+    state = JOURNAL.load()
+    journaled = set(state)
+    boards = {islandId: record["board"] for islandId, record in state.items() if record.get("board") != None}
     try:
-        await visitor.user.create_dm()
-        await visitor.user.dm_channel.send(
-            f"Hello {visitor.user.name}, it's your turn to go to {island.owner.name}'s island! Use the Dodo code '{island.code}' to fly, and be sure to leave the queue with '{helpMessages.COMMAND_PREFIX}leave {island.islandId}' once you are done and completely off the island."
-        )
-    except:
-        logging.error(f"Could not message {visitor.user}.")
+        await STORE.run(STORE.store.loadState, state, ISLAND_IDS.owns)
+        state = await STORE.run(STORE.store.islands, lambda islandId: islandId in journaled)
+    except Exception:
+        logging.exception("Could not load the journal into the queue store, restoring straight from the journal.")
+    restored = 0
+    reattaching = []
+
+    for islandId, record in state.items():
+        server = REGISTRY.servers.get(record["guild"])
+        owner = await USERS.resolve(record["owner"])
+        if server == None or owner == None or not ISLAND_IDS.reserve(islandId):
+            logging.error("Could not restore island %s.", islandId, extra={"island": islandId, "guild": record["guild"]})
+            STORE.record("close", islandId, {})
+            if islandId in boards:
+                channelId, messageId = boards[islandId]
+                reattaching.append(BOARDS.reattach(islandId, bot.get_channel(channelId), messageId))
+            continue
+
+        island = Island(owner, record["price"], islandId, server.guild)
+        island.timestamp = fromWallClock(record["created"])
+        island.code = record["code"]
+        if record["queueSize"] != None:
+            island.setQueueSize(record["queueSize"])
+
+        #visitors are only ids, so they come back without asking discord about each of them
+        for userId, (trips, timestamp) in record["visitors"].items():
+            island.visitors.append(Visitor(int(userId), trips, fromWallClock(timestamp)))
+
+        REGISTRY.addIsland(island)
+        scheduleIsland(island)
+        for visitor in island.visitors.admitted:
+            scheduleVisitor(island, visitor)
+        if islandId in boards:
+            channelId, messageId = boards[islandId]
+            reattaching.append(BOARDS.reattach(islandId, bot.get_channel(channelId), messageId, island))
+        restored += 1
+
+    await asyncio.gather(*reattaching)
+
+    #fold the replayed records and anything that couldn't be restored into a fresh snapshot
+    await compactJournal()
+    logging.info("Restored %d islands from the journal in %.2f seconds.", restored, JOURNAL.recoveryTime)
+
+#Snapshots every open island into the journal so it can drop the records before now
+async def compactJournal():
+    await JOURNAL.compact({island.islandId: snapshotIsland(island, BOARDS.location(island.islandId)) for island in REGISTRY.islands.values()})
+    logging.info("Compacted the queue journal, %d bytes on disk.", JOURNAL.size())
+
+#Message stand-in for a command routed from another cluster process
+#Members: <author : discord.User> <channel : discord.DMChannel>
+class RoutedMessage:
+    def __init__(self, author, channel):
+        self.author = author
+        self.channel = channel
+
+#Context stand-in for a command routed from another cluster process, replies go to the author's DMs.
+#Has what the command checks and error handlers read so routed commands go through the same checks as any other.
+#Members: <author : discord.User> <channel : discord.DMChannel> <message : RoutedMessage> <guild : None> <routed : bool>
+#<bot : commands.Bot> <command : commands.Command> <command_failed : bool>
+class RoutedContext:
+    def __init__(self, author, channel, command):
+        self.author = author
+        self.channel = channel
+        self.message = RoutedMessage(author, channel)
+        self.guild = None
+        self.routed = True
+        self.bot = bot
+        self.command = command
+        self.command_failed = False
+
+    async def send(self, content):
+        return await self.channel.send(content)
+
+#Runs a command routed from another cluster process. Requests asking for the author's own island are declined if they don't own one here.
+#The command's checks and the global ones (rate limits, waiting for the queues) are run again here, failures go to its error handler.
+#Parameters: <request : dict> {"command" : str, "args" : list, "author" : int, "byOwner" : bool}
+#Returns: {"handled" : bool}
+async def handleRoutedCommand(request):
+    command = bot.get_command(request["command"])
+    if command == None or (request["byOwner"] and request["author"] not in REGISTRY.islandsByOwner):
+        return {"handled": False}
+
+    user = await USERS.resolve(request["author"])
+    if user == None:
+        return {"handled": False}
+
+    ctx = RoutedContext(user, await DISPATCHER.getChannel(user), command)
+    try:
+        if not await command.can_run(ctx):
+            raise commands.CheckFailure(f"The check functions for command {command.qualified_name} failed.")
+    except commands.CommandError as error:
+        try:
+            await command.dispatch_error(ctx, error)
+        except commands.CommandError: #the command's handler re-raises errors it doesn't reply to, the command was still refused here
+            logging.warning("Routed %s from %s failed its checks: %s", command.name, user, error, extra={"command": command.name, "user": user.id})
+        return {"handled": True}
+
+    await command.callback(ctx, *request["args"])
+    return {"handled": True}
+
+#Parameters: <ctx : discord.ext.commands.Context> <byOwner : bool>
+#Returns: the request for running <ctx>'s command in another cluster process
+def routedRequest(ctx, byOwner):
+    return {"command": ctx.command.name, "args": list(ctx.args[1:]), "author": ctx.author.id, "byOwner": byOwner}
+
+#Routes a command for <islandId> to the cluster process that owns it when that isn't this process
+#Parameters: <ctx : discord.ext.commands.Context> <islandId : str>
+#Returns: True if another process handled the command
+async def routeById(ctx, islandId):
+    if ROUTER == None or getattr(ctx, "routed", False):
+        return False
+
+    clusterId = clusterForIsland(islandId, CLUSTER_COUNT, ISLAND_ID_WIDTH, ISLAND_ID_PREFIX)
+    if clusterId == None or clusterId == CLUSTER_ID:
+        return False
 
-    visitor.setTimestamp()
+    reply = await ROUTER.forward(clusterId, routedRequest(ctx, False))
+    return reply["handled"]
+
+#Routes a command about the author's own island to whichever cluster process has it
+#Parameters: <ctx : discord.ext.commands.Context>
+#Returns: True if another process handled the command
+async def routeByOwner(ctx):
+    if ROUTER == None or getattr(ctx, "routed", False):
+        return False
+
+    for clusterId in range(CLUSTER_COUNT):
+        if clusterId != CLUSTER_ID:
+            reply = await ROUTER.forward(clusterId, routedRequest(ctx, True))
+            if reply["handled"]:
+                return True
+    return False
 
 #---Backround Tasks---#
 
-#Task that runs every 5 minutes and clears out any Islands older than 10 hrs and any Visitors who have overstayed their welcome on an Island
-async def clean():
-    await bot.wait_until_ready()
+#Closes an <island> that has been open for more than ISLAND_MAX_AGE hours. Scheduled by scheduleIsland().
+#Parameters: <island : Island>
+#Returns: the coroutine that announces the closure, started by the scheduler once the rest of the guild's expiries are done
+async def expireIsland(island):
+    async with island.lock:
+        if not isOpen(island):
+            return
+
+        server = getServerByGuild(island.guild)
+        closedStr = f"Island {island.islandId} owned by {island.owner} is being closed since it has been active for more than {ISLAND_MAX_AGE} hours."
+
+        #collect remaining users in queue
+        if island.getNumVisitors() > 0:
+            closedStr += " The following users were still in line:\n" + "\n".join([f"{i+1}: {USERS.name(visitor.userId)}" for i, visitor in enumerate(island.visitors)])
+
+        deleteIsland(island)
+
+    logging.info("Island %s has been closed due to inactivity.", island.islandId, extra={"island": island.islandId, "guild": island.guild.id})
+    return announceExpiredIsland(island, server, closedStr)
+
+#Posts <closedStr> about an <island> closed by expireIsland() and lets the owner know
+#Parameters: <island : Island> <server : Server> <closedStr : str>
+async def announceExpiredIsland(island, server, closedStr):
+    if island.price != None and server.turnipChannel != None:
+        await COALESCER.post(bot.get_channel(server.turnipChannel), closedStr)
+
+    elif server.generalChannel != None:
+        await COALESCER.post(bot.get_channel(server.generalChannel), closedStr)
+
+    await DISPATCHER.send(
+        island.owner,
+        f"Your island {island.islandId} was closed due to being active for more than {ISLAND_MAX_AGE} hours. Please remember to use '{helpMessages.COMMAND_PREFIX}close' to close your island when you're done in the future."
+    )
+
+#Removes a <visitor> who has been allowed on an <island> for longer than the server's timeout. Scheduled by scheduleVisitor().
+#Parameters: <island : Island> <visitor : Visitor>
+#Returns: the coroutine that messages the visitor and whoever was let on in their place, started by the scheduler
+async def expireVisitor(island, visitor):
+    async with island.lock:
+        if not isOpen(island) or visitor not in island.visitors.admitted:
+            return
+
+        #the visitor may have been let back on with a fresh timeout since this deadline was popped
+        server = getServerByGuild(island.guild)
+        if visitor.getDeadline(server.timeout) > time.monotonic():
+            return
+
+        cancelVisitor(island, visitor.userId)
+        position, promoted = island.removeUser(visitor.userId)
+        recordChange("remove", island.islandId, user=visitor.userId)
+        recordVisit("timeout", island, visitor.userId, dwell=time.monotonic() - visitor.timestamp)
+        admitVisitors(promoted, island)
+
+    logging.info(
+        "%s has been removed due to inactivity from island %s from position %d. %d remaining in queue.", visitor.userId, island.islandId, position + 1, island.getNumVisitors(),
+        extra={"island": island.islandId, "guild": island.guild.id, "user": visitor.userId}
+    )
+    return announceExpiredVisitor(island, visitor, server, promoted)
+
+#Messages a <visitor> removed by expireVisitor() and sends the Dodo code to the <promoted> Visitors that took their place
+#Parameters: <island : Island> <visitor : Visitor> <server : Server> <promoted : [Visitor]>
+async def announceExpiredVisitor(island, visitor, server, promoted):
+    await DISPATCHER.send(
+        visitor.userId,
+        f"Hello {USERS.name(visitor.userId)}, you have been removed from the queue {island.owner.name}'s island for being allowed on for over {server.timeout} minutes. Please remember to use '{helpMessages.COMMAND_PREFIX}leave <islandId>' once you're done in the future."
+    )
+
+    #message next user in line the dodo code
+    await messageUsers(promoted, island)
+
+#Schedules an <island> to be closed once it has been open for ISLAND_MAX_AGE hours
+#Parameters: <island : Island>
+def scheduleIsland(island):
+    SCHEDULER.schedule(("island", island.islandId), island.getDeadline(ISLAND_MAX_AGE), expireIsland, island)
+
+#Schedules a <visitor> that was just allowed on an <island> to be removed once the server's timeout passes
+#Parameters: <island : Island> <visitor : Visitor>
+def scheduleVisitor(island, visitor):
+    timeout = getServerByGuild(island.guild).timeout
+    SCHEDULER.schedule(("visitor", island.islandId, visitor.userId), visitor.getDeadline(timeout), expireVisitor, island, visitor)
+
+#Cancels the timeout for a user that left or is no longer allowed on an <island>
+#Parameters: <island : Island> <userId : int>
+def cancelVisitor(island, userId):
+    SCHEDULER.cancel(("visitor", island.islandId, userId))
+
+#Task that compacts the queue journal every JOURNAL_SNAPSHOT_INTERVAL seconds if anything changed
+async def snapshotQueues():
+    await QUEUES_RESTORED.wait()
 
     while True:
-        if DEBUG == True:
-            logging.info("Starting Island/User clean.")
-        for server in SERVERS:
-            for island in server.islands:
-
-                if island.getAge() >= 10: #close islands that have been open for more than 10 hrs
-                    closedStr = f"Island {island.islandId} owned by {island.owner} is being closed since it has been active for more than 10 hours."
-
-                    #collect remaining users in queue
-                    if island.getNumVisitors() > 0:
-                        closedStr +=  " The following users were still in line:"
-                        for i in range(island.getNumVisitors()):
-                            closedStr += f"\n{i+1}: {island.visitors[i].user.name}"
-
-                    if island.price != None and server.turnipChannel != None:
-                        await bot.get_channel(server.turnipChannel).send(closedStr) 
-
-                    elif server.generalChannel != None:
-                        await bot.get_channel(server.generalChannel).send(closedStr) 
-
-                    logging.info(f"Island {island.islandId} has been closed due to inactivity.")
-
-                    try:
-                        await island.owner.create_dm()
-                        await island.owner.dm_channel.send(
-                            f"Your island {island.islandId} was closed due to being active for more than 10 hours. Please remember to use '{helpMessages.COMMAND_PREFIX}close' to close your island when you're done in the future."
-                        )
-                    except:
-                        logging.error(f"Could not message {island.owner}.")
-
-
-                    server.islands.remove(island)
-
-                else: #remove users who have been allowed on an island more than alloted time set by server
-                    removedUsers = []
-                    if island.queueSize != None:
-                        for i in range(island.queueSize):
-                            if i < island.getNumVisitors() and island.visitors[i].getTimeSpent() >= server.timeout:
-                                removedUsers.append(island.visitors[i])
-
-                    for removedUser in removedUsers:
-                        island.visitors.remove(removedUser)
-                        logging.info(f"{removedUser.user} has been removed due to inactivity from island {island.islandId} from position {i+1}. {island.getNumVisitors()} remaining in queue.")
-
-                        try:
-                            await removedUser.user.create_dm()
-                            await removedUser.user.dm_channel.send(
-                                f"Hello {removedUser.user.name}, you have been removed from the queue {island.owner.name}'s island for being allowed on for over {server.timeout} minutes. Please remember to use '{helpMessages.COMMAND_PREFIX}leave <islandId>' once you're done in the future."
-                            )
-
-                        except:
-                            logging.error(f"Could not message {removedUser}.")
-
-                        #message next user in line the dodo code
-                        if i < island.queueSize and island.getNumVisitors() >= island.queueSize:
-                            await messageUser(island.visitors[island.queueSize-1], island)
-
-        if DEBUG == True:
-            logging.info("Finished Island/User clean.")
-            await asyncio.sleep(150)
-        else:
-            await asyncio.sleep(300) #run every 5 min
+        await asyncio.sleep(JOURNAL_SNAPSHOT_INTERVAL)
+        if JOURNAL.records > 0:
+            await compactJournal()
+
+#Parameters: <key : tuple> <args : tuple> a SCHEDULER entry, its first argument is always the Island
+#Returns: the id of the guild the entry belongs to, each guild's expiries run as a separate pass
+def expiryGuild(key, args):
+    return args[0].guild.id
+
+#Task that expires Islands older than ISLAND_MAX_AGE hours and Visitors who have overstayed their welcome on an Island as soon as their deadline passes
+async def clean():
+    await bot.wait_until_ready()
+    await SCHEDULER.run(expiryGuild, EXPIRY_CONCURRENCY)
 
 #---Events---#
 
@@ -213,29 +580,29 @@ async def clean():
 #When the bot spins up, load server properties from database
 @bot.event
 async def on_ready():
-    logging.info(f"{bot.user} is up and running.\nConnected to {len(bot.guilds)} servers")
+    logging.info("%s is up and running.\nConnected to %d servers", bot.user, len(bot.guilds))
     await bot.change_presence(activity=discord.Game(f"{helpMessages.COMMAND_PREFIX}help | github.com/marshalltj/island-queue-bot"))
-    for guild in bot.guilds:
-        if getServerByGuild(guild) == None:
-            db = sqlConnection()
-            cursor = db.cursor()
-
-            sql = f"SELECT * FROM Servers WHERE ID={guild.id}"
-            cursor.execute(sql)
-            if cursor.fetchone() == None:
-
-                sql = f"INSERT INTO Servers (ID) VALUES ({guild.id})"
-                cursor.execute(sql)
-                db.commit()
-                logging.info(f"Adding {guild} to databse.")
-
-            else:
-                logging.info(f"{guild} already present in database.")
-
-            cursor.close()
-            db.close()
+    startTime = time.monotonic()
+    try:
+        await DB.connect()
+        await loadServers(bot.guilds)
+        logging.info("Loaded %d servers in %.2f seconds.", len(REGISTRY), time.monotonic() - startTime)
+
+        #on_ready can fire again after a reconnect, only replay the journal the first time
+        if not QUEUES_RESTORED.is_set():
+            await restoreQueues()
+            QUEUES_RESTORED.set()
+    except Exception:
+        if QUEUES_RESTORED.is_set(): #a reconnect, the servers and queues loaded before are still being served
+            raise
+        #commands wait for QUEUES_RESTORED, so shut down rather than leave them waiting forever
+        logging.critical("Could not load servers or restore queues on start up, shutting down.", exc_info=True)
+        await bot.close()
+        return
 
-            SERVERS.append(Server(guild, sqlConnection()))
+    if ROUTER != None:
+        await ROUTER.start(handleRoutedCommand)
+        logging.info("Cluster %d of %d accepting routed commands.", CLUSTER_ID, CLUSTER_COUNT)
 
 #on_guild_join override
 #When bot joins a guild, add that guild to the list of servers and add the Server to the database
@@ -243,43 +610,64 @@ async def on_ready():
 @bot.event
 async def on_guild_join(guild):
     if getServerByGuild(guild) == None:
-        db = sqlConnection()
-        cursor = db.cursor()
-
-        sql = f"SELECT * FROM Servers WHERE ID={guild.id}"
-        cursor.execute(sql)
-
-        if cursor.fetchone() == None:
-            sql = f"INSERT INTO Servers (ID) VALUES ({guild.id})"
-            cursor.execute(sql)
-            db.commit()
-            logging.info(f"Adding {guild} to database.")
-
-        else:
-            logging.info(f"{guild} already present in database.")
-
-        cursor.close()
-        db.close()
-
-        SERVERS.append(Server(guild, sqlConnection()))
-        logging.info(f"Bot added to server {guild}.")
+        REGISTRY.addServer(await loadServer(guild))
+        logging.info("Bot added to server %s.", guild, extra={"guild": guild.id})
 
 #on_guild_remove override
 #When bot leaves a guild, remove that guild from the list of servers and delete its info from the database.
 #Parameters: <guild : discord.Guild>
 @bot.event
 async def on_guild_remove(guild):
-    db = sqlConnection()
-    cursor = db.cursor()
-    sql = f"DELETE FROM Servers WHERE ID = {guild.id}"
-    cursor.execute(sql, guild.id)
-    db.commit()
-
-    cursor.close()
-    db.close()
+    CONFIG_WRITER.discard(guild.id)
+    await DB.removeServer(guild.id)
+
+    server = getServerByGuild(guild)
+    if server != None:
+        for island in list(server.islands.values()):
+            deleteIsland(island)
+
+    REGISTRY.removeServer(guild)
+    logging.info("Bot removed from server %s.", guild, extra={"guild": guild.id})
+
+#Notes when a command starts so after_invoke can record how long it took
+@bot.before_invoke
+async def startCommandTimer(ctx):
+    ctx.startTime = time.monotonic()
+
+#Records the latency and outcome of every command
+@bot.after_invoke
+async def recordCommand(ctx):
+    labels = (("command", ctx.command.name),)
+    if getattr(ctx, "startTime", None) != None:
+        latency = time.monotonic() - ctx.startTime
+        METRICS.observe("command_seconds", latency, labels)
+        logging.info("Ran %s for %s", ctx.command.name, ctx.author, extra={
+            "command": ctx.command.name, "latency": round(latency, 4), "user": ctx.author.id, "guild": ctx.guild.id if ctx.guild != None else None
+        })
+    METRICS.inc("commands_total", labels + (("status", "error" if ctx.command_failed else "ok"),))
+
+#Global check that rejects commands from users or guilds going over their rate in admission.py before any other work is done.
+#The user is told how long to wait once per cooldown, further commands in that window are dropped without a reply.
+@bot.check
+async def admitCommand(ctx):
+    guildId = ctx.guild.id if ctx.guild != None else None
+    wait, scope = ADMISSION.admit(ctx.command.name, ctx.author.id, guildId)
+    if wait == 0:
+        return True
+
+    METRICS.inc("commands_rejected_total", (("command", ctx.command.name), ("scope", scope)))
+    if ADMISSION.shouldNotify(ctx.author.id, ctx.command.name, wait):
+        if scope == "user":
+            await ctx.send(f"{ctx.author.name}, you're using '{helpMessages.COMMAND_PREFIX}{ctx.command.name}' too quickly. Try again in {math.ceil(wait)} seconds.")
+        else:
+            await ctx.send(f"{ctx.author.name}, this server is using '{helpMessages.COMMAND_PREFIX}{ctx.command.name}' too quickly. Try again in {math.ceil(wait)} seconds.")
+    raise RateLimited(wait, scope)
 
-    SERVERS.remove(getServerByGuild(guild))
-    logging.info(f"Bot removed from server {guild}.")
+#Global check that holds commands until the journal has been replayed so they see the restored queues
+@bot.check
+async def waitForQueues(ctx):
+    await QUEUES_RESTORED.wait()
+    return True
 
 #---Managing Queue Commands---#
 
@@ -291,6 +679,10 @@ async def createIsland(ctx, price: int = None):
     owner = ctx.message.author
     server = getServerByGuild(ctx.guild)
 
+    if price != None and not MIN_PRICE <= price <= MAX_PRICE:
+        await ctx.send(f"Please provide a valid turnip price ({MIN_PRICE}-{MAX_PRICE} bells).")
+        return
+
     island = getIslandByOwnerInServer(owner, server)
 
     if island != None:
@@ -304,17 +696,30 @@ async def createIsland(ctx, price: int = None):
             )
         return
 
-    server.islands.append(Island(owner, price, createIslandId(), ctx.guild))
+    try:
+        islandId = createIslandId()
+    except IdPoolExhausted:
+        await ctx.send("There are too many open islands right now, please try again later.")
+        logging.error("Ran out of island IDs creating an island for %s.", owner, extra={"guild": server.guild.id, "user": owner.id})
+        return
+
+    REGISTRY.addIsland(Island(owner, price, islandId, ctx.guild))
+    scheduleIsland(getIslandById(islandId))
+    recordChange("create", islandId, guild=ctx.guild.id, owner=owner.id, price=price, at=toWallClock(getIslandById(islandId).timestamp))
+    recordPrice(ctx.guild.id, price)
 
     newIsland = getIslandByOwnerInServer(owner, server)
 
     #check if island was successfully created
     if newIsland == None:
         await ctx.send("Failed to create queue for island.")
-        logging.error(f"Failed to create island for {owner}.")
+        logging.error("Failed to create island for %s.", owner, extra={"guild": server.guild.id, "user": owner.id})
         return
 
-    logging.info(f"Created new island queue for {owner}. ID: {newIsland.islandId} on server {newIsland.guild}.")
+    logging.info(
+        "Created new island queue for %s. ID: %s on server %s.", owner, newIsland.islandId, newIsland.guild,
+        extra={"island": newIsland.islandId, "guild": newIsland.guild.id, "user": owner.id}
+    )
     await ctx.send(
         f"Island created with ID: {newIsland.islandId}. DM this bot with {helpMessages.COMMAND_PREFIX}open <dodo code> to open a queue for your island."
     )
@@ -326,6 +731,8 @@ async def createIsland(ctx, price: int = None):
 async def openQueue(ctx, code, queueSize : int = 3):
     owner = ctx.message.author
     island = getIslandByOwner(owner)
+    if island == None and await routeByOwner(ctx):
+        return
 
     if island == None:
         await ctx.send(
@@ -333,38 +740,52 @@ async def openQueue(ctx, code, queueSize : int = 3):
         )
         return
 
-    if island.code != None:
-        await ctx.send(
-            f"You already have an open queue. Use '{helpMessages.COMMAND_PREFIX}close' to close it or '{helpMessages.COMMAND_PREFIX}update' to update it."
-        )
-        return
-
     if queueSize < 1 or queueSize > 7:
         await ctx.send("Please provide a valid queue size (1-7).")
         return
 
-    island.queueSize = queueSize
-    island.code = code
+    async with island.lock:
+        alreadyOpen = island.code != None
+        if isOpen(island) and not alreadyOpen:
+            island.setQueueSize(queueSize)
+            island.code = code
+            recordChange("open", island.islandId, code=code, size=queueSize)
+
+    if alreadyOpen:
+        await ctx.send(
+            f"You already have an open queue. Use '{helpMessages.COMMAND_PREFIX}close' to close it or '{helpMessages.COMMAND_PREFIX}update' to update it."
+        )
+        return
 
     server = getServerByGuild(island.guild)
 
     await ctx.send(
         f"Your island queue is now open. Users can join the queue using '{helpMessages.COMMAND_PREFIX}join {island.islandId}'."
     )
-    logging.info(f"Opening the queue for island {island.islandId} on server {island.guild}.")
+    logging.info("Opening the queue for island %s on server %s.", island.islandId, island.guild, extra={"island": island.islandId, "guild": island.guild.id})
 
     #figure out which channel to broadcast that the island queue is now open
+    announceChannel = None
     if island.price != None:
         if server.turnipChannel != None:
-            await bot.get_channel(server.turnipChannel).send(
+            announceChannel = bot.get_channel(server.turnipChannel)
+            await COALESCER.post(
+                announceChannel,
                 f"{owner.name} has a queue to visit their island to move turnips for {island.price} bells! Use '{helpMessages.COMMAND_PREFIX}join {island.islandId} <number of trips>' to be added to the queue!"
             )        
 
     elif server.generalChannel != None:
-        await bot.get_channel(server.generalChannel).send(
+        announceChannel = bot.get_channel(server.generalChannel)
+        await COALESCER.post(
+            announceChannel,
             f"{owner.name} has a queue to visit their island! Use '{helpMessages.COMMAND_PREFIX}join {island.islandId} <number of trips>' to be added to the queue!"
         )
 
+    if server.liveBoard:
+        board = await BOARDS.open(island, announceChannel)
+        if board != None: #journaled so the board is picked back up after a restart, the queue store has no use for it
+            JOURNAL.record("board", island.islandId, channel=announceChannel.id, message=board.message.id)
+
 #Command that deletes an Island object from the list of ISLANDS
 #Parameters: <islandId : str>
 @bot.command(name='close')
@@ -375,6 +796,8 @@ async def closeQueue(ctx, islandId : str = None):
     #id provided, probably an admin closure
     if islandId != None: 
         island = getIslandById(islandId)
+        if island == None and await routeById(ctx, islandId):
+            return
 
         if island == None:
             await ctx.send(f"{owner.name}, {islandId} is not a valid island ID.")
@@ -390,6 +813,8 @@ async def closeQueue(ctx, islandId : str = None):
 
     else:
         island = getIslandByOwner(owner)
+        if island == None and await routeByOwner(ctx):
+            return
 
         if island == None:
             await ctx.send(f"{owner.name}, you have no open queues.")
@@ -404,39 +829,42 @@ async def closeQueue(ctx, islandId : str = None):
     else:
         closedStr = f"{owner.name} has closed their island queue."
 
-    #collect remaining users in queue
-    if island.getNumVisitors() > 0:
-        closedStr +=  " The following users were still in line:"
-        for i in range(island.getNumVisitors()):
-            closedStr += f"\n{i+1}: {island.visitors[i].user.name}"
-    
-    server.islands.remove(island)
+    async with island.lock:
+        #collect remaining users in queue
+        if island.getNumVisitors() > 0:
+            closedStr += " The following users were still in line:\n" + "\n".join([f"{i+1}: {USERS.name(visitor.userId)}" for i, visitor in enumerate(island.visitors)])
+
+        deleted = deleteIsland(island)
+
+    #someone else closed it first and already announced it
+    if not deleted:
+        await ctx.send(f"{owner.name}'s island queue was already closed.")
+        return
 
     #check if island was successfully deleted
     if getIslandByOwnerInServer(owner, server) != None:
         await ctx.send(f"Failed to close queue for {owner.name}")
-        logging.error(f"Failed to delete island queue for {owner} ID: {removedIslandID}.")
+        logging.error("Failed to delete island queue for %s ID: %s.", owner, removedIslandID, extra={"island": removedIslandID, "guild": island.guild.id, "user": owner.id})
         return
 
     #determine which channel to send closed message to
     if removedIslandPrice != None:
         if server.turnipChannel != None and ctx.message.channel.id != server.turnipChannel:
-            await bot.get_channel(server.turnipChannel).send(closedStr)
+            await COALESCER.post(bot.get_channel(server.turnipChannel), closedStr)
 
     elif server.generalChannel != None and ctx.message.channel.id != server.generalChannel:
-        await bot.get_channel(server.generalChannel).send(closedStr)
+        await COALESCER.post(bot.get_channel(server.generalChannel), closedStr)
 
-    await ctx.send(closedStr)
+    await COALESCER.post(ctx.channel, closedStr)
 
     if admin != None:
-        logging.info(f"Admin {admin} deleted island queue for island id: {removedIslandID}.")
-        try:
-            await owner.create_dm()
-            await owner.dm_channel.send(f"Hello {owner.name}, {admin.name} has closed your island queue.")
-        except:
-            logging.error(f"Could not message {owner}.")
+        logging.info("Admin %s deleted island queue for island id: %s.", admin, removedIslandID, extra={"island": removedIslandID, "user": admin.id})
+        await DISPATCHER.send(
+            owner,
+            f"Hello {owner.name}, {admin.name} has closed your island queue."
+        )
     else:
-        logging.info(f"Deleted island queue for {owner} ID: {removedIslandID}.")
+        logging.info("Deleted island queue for %s ID: %s.", owner, removedIslandID, extra={"island": removedIslandID, "user": owner.id})
         
 #Command to remove a Visitor in <position> of a queue from an Island and then message the user that they were removed.
 #Parameters: <ctx : discord.ext.commands.Context> <position : int> <islandId : str>
@@ -447,6 +875,8 @@ async def removeUser(ctx, position : int, islandId: str = None):
 
     if islandId != None: #admin removal probably
         island = getIslandById(islandId)
+        if island == None and await routeById(ctx, islandId):
+            return
 
         if island == None:
             await ctx.send(f"{owner.name}, {islandId} is not a valid island ID.")
@@ -458,38 +888,50 @@ async def removeUser(ctx, position : int, islandId: str = None):
 
     else:
         island = getIslandByOwner(owner)
+        if island == None and await routeByOwner(ctx):
+            return
         if island == None:
             await ctx.send(f"{owner.name}, you do not currently have any open islands.")
             return
 
-    if idx < 0 or idx >= island.getNumVisitors():
+    #the position is checked and used under the lock so it can't go stale in between
+    async with island.lock:
+        validPosition = isOpen(island) and 0 <= idx < island.getNumVisitors()
+        if validPosition:
+            removedVisitor, promoted = island.popVisitor(idx)
+            removedUserId = removedVisitor.userId
+            cancelVisitor(island, removedUserId)
+            recordChange("remove", island.islandId, user=removedUserId)
+            recordVisit("leave", island, removedUserId, dwell=time.monotonic() - removedVisitor.timestamp if idx < island.queueSize else None)
+            admitVisitors(promoted, island)
+
+    if not validPosition:
         await ctx.send(
             f"{position} is not a valid position in the queue. Use {helpMessages.COMMAND_PREFIX}list {island.islandId} to see who's in line currently."
         )
         return
 
-    removedUser = island.popVisitor(idx).user 
+    removedName = USERS.name(removedUserId)
 
     #check if Visitor was successfully removed
-    if island.getUserPositionInQueue(removedUser) != -1:
-        await ctx.send(f"Failed to remove {removedUser.name} from {owner.name}'s queue.")
-        logging.error(f"Failed to remove {removedUser} from island {island.islandId}.")
+    if island.getUserPositionInQueue(removedUserId) != -1:
+        await ctx.send(f"Failed to remove {removedName} from {owner.name}'s queue.")
+        logging.error("Failed to remove %s from island %s.", removedName, island.islandId, extra={"island": island.islandId, "guild": island.guild.id, "user": removedUserId})
         return
 
-    await ctx.send(f"{owner.name} has removed {removedUser.name} from their island queue.")
-    logging.info(f"{owner} has removed {removedUser} from Island {island.islandId} from position {position}. {island.getNumVisitors()} remaining in queue.")
+    await ctx.send(f"{owner.name} has removed {removedName} from their island queue.")
+    logging.info(
+        "%s has removed %s from Island %s from position %d. %d remaining in queue.", owner, removedName, island.islandId, position, island.getNumVisitors(),
+        extra={"island": island.islandId, "guild": island.guild.id, "user": removedUserId}
+    )
 
-    try:
-        await removedUser.create_dm()
-        await removedUser.dm_channel.send(
-            f"Hello {removedUser.name}, {owner.name} has removed you from the island queue for island{island.islandId}, most likely due to you forgetting to leave the queue after finishing up on the island."
-        )
-    except:
-        logging.error(f"Could not message {removedUser}.")
+    await DISPATCHER.send(
+        removedUserId,
+        f"Hello {removedName}, {owner.name} has removed you from the island queue for island{island.islandId}, most likely due to you forgetting to leave the queue after finishing up on the island."
+    )
 
     #message next user in line the dodo code
-    if idx < island.queueSize and island.getNumVisitors() >= island.queueSize:
-        await messageUser(island.visitors[island.queueSize-1], island)
+    await messageUsers(promoted, island)
 
 #Command to update members of an Island.
 #Paramters: <ctx : discord.ext.commands.Context> <attribute : str> <value : str>
@@ -497,6 +939,8 @@ async def removeUser(ctx, position : int, islandId: str = None):
 async def updateQueue(ctx, attribute, value):
     owner = ctx.message.author
     island = getIslandByOwner(owner)
+    if island == None and await routeByOwner(ctx):
+        return
     attribute = attribute.lower()
 
     if island == None:
@@ -514,28 +958,29 @@ async def updateQueue(ctx, attribute, value):
             await ctx.send(f"You haven't opened your queue yet - to set the Dodo code and open your Island use '{helpMessages.COMMAND_PREFIX}open <dodo code>'")
             return
 
-        island.code = value
+        async with island.lock:
+            closed = not isOpen(island)
+            if not closed:
+                island.code = value
+                recordChange("update", island.islandId, code=value)
+                admitted = list(island.visitors.admitted)
 
-        if island.getNumVisitors() < island.queueSize:
-            dmLen = island.getNumVisitors()
-        else:
-            dmLen = island.queueSize
+        if closed:
+            await ctx.send(f"{owner.name}, you do not have any open islands.")
+            return
+
+        dmLen = len(admitted)
 
         await ctx.send(
             f"{owner}, your Dodo code has been updated to {island.code}. {dmLen} users will be messaged with the updated code."
         )
-        logging.info(f"Updated Dodo code for island {island.islandId}. Messaging {dmLen} users updated dodo code for island.")
+        logging.info("Updated Dodo code for island %s. Messaging %d users updated dodo code for island.", island.islandId, dmLen, extra={"island": island.islandId, "guild": island.guild.id})
 
         #mesage users that are allowed on updated dodo code
-        for i in range(dmLen):
-            visitor = island.visitors[i].user
-            try:
-                await visitor.create_dm()
-                await visitor.dm_channel.send(
-                    f"Hello {visitor.name}, {owner} has updated their Dodo code. Use {island.code} to visit their island instead of the previous code. Remember to use '{helpMessages.COMMAND_PREFIX}leave {island.islandId}' when you're done and off their island."
-                )
-            except:
-                logging.error("Could not message {visitor}.")
+        await DISPATCHER.fanout([
+            (visitor.userId, f"Hello {USERS.name(visitor.userId)}, {owner} has updated their Dodo code. Use {island.code} to visit their island instead of the previous code. Remember to use '{helpMessages.COMMAND_PREFIX}leave {island.islandId}' when you're done and off their island.")
+            for visitor in admitted
+        ])
 
     #updating price
     elif attribute == "price":
@@ -547,8 +992,22 @@ async def updateQueue(ctx, attribute, value):
             )
             return
 
-        oldPrice = island.price
-        island.price = price
+        if not MIN_PRICE <= price <= MAX_PRICE:
+            await ctx.send(f"Please provide a valid turnip price ({MIN_PRICE}-{MAX_PRICE} bells).")
+            return
+
+        async with island.lock:
+            closed = not isOpen(island)
+            if not closed:
+                oldPrice = island.price
+                island.setPrice(price)
+                recordChange("update", island.islandId, price=price)
+
+        if closed:
+            await ctx.send(f"{owner.name}, you do not have any open islands.")
+            return
+
+        recordPrice(island.guild.id, price)
 
         await ctx.send(f"Price updated from {oldPrice} bells to {island.price} bells.")
 
@@ -566,29 +1025,31 @@ async def updateQueue(ctx, attribute, value):
             await ctx.send("Please provide a valid queue size (1-7).")
             return
 
-        oldSize = island.queueSize
-        diff = size - oldSize
-        island.queueSize = size
+        async with island.lock:
+            closed = not isOpen(island)
+            if not closed:
+                oldSize = island.queueSize
+                promoted, demoted = island.setQueueSize(size)
+                recordChange("update", island.islandId, queueSize=size)
+                admitVisitors(promoted, island)
+                for visitor in demoted:
+                    cancelVisitor(island, visitor.userId)
+
+        if closed:
+            await ctx.send(f"{owner.name}, you do not have any open islands.")
+            return
 
-        if diff == 0:
+        if size == oldSize:
             await ctx.send(f"{owner.name}, the queue size for you island was already {size}.")
 
-        elif diff > 0 and island.getNumVisitors() > oldSize: #queue size got bigger, let on additional users
-            for i in range(oldSize, oldSize + diff):
-                if i < island.getNumVisitors():
-                    await messageUser(island.visitors[i], island)
-
-        elif diff < 0 and island.getNumVisitors() > size: #queue size got smaller, message users bumped from queue to wait
-            for i in range(size, size + (diff*-1)):
-                if i < island.getNumVisitors():
-                    user = island.visitors[i].user
-                    try:
-                        await user.create_dm()
-                        await user.dm_channel.send(
-                            f"Hello {user.name}, {island.owner.name} has updated their queue size to be smaller. If you haven't flown to their island yet, please wait until this bot messages you again. If you already are on their island, try and leave at a convienent time and then come back when this bot messages you again."
-                        )
-                    except:
-                        logging.error(f"Could not message {user}.")
+        #queue size got bigger, let on additional users
+        await messageUsers(promoted, island)
+
+        #queue size got smaller, message users bumped from queue to wait
+        await DISPATCHER.fanout([
+            (visitor.userId, f"Hello {USERS.name(visitor.userId)}, {island.owner.name} has updated their queue size to be smaller. If you haven't flown to their island yet, please wait until this bot messages you again. If you already are on their island, try and leave at a convienent time and then come back when this bot messages you again.")
+            for visitor in demoted
+        ])
 
         await ctx.send(f"Queue size update from {oldSize} to {size}.")
 
@@ -619,31 +1080,59 @@ async def joinQueue(ctx, islandId, trips : int = 0):
         await ctx.send(f"{user.name}, you can't join the queue for your own island.")
         return
 
-    queuePosition = island.getUserPositionInQueue(user)
+    async with island.lock:
+        closed = not isOpen(island)
+        queuePosition = island.getUserPositionInQueue(user.id)
+        alreadyQueued = queuePosition != -1
+        numVisitors = island.getNumVisitors()
+
+        if not closed and not alreadyQueued:
+            USERS.remember(user) #the queue only keeps the id, the name is looked up when it's listed
+            queuePosition = island.addVisitor(user.id, trips)
+            recordChange("join", island.islandId, user=user.id, trips=trips, at=toWallClock(island.visitors.get(user.id).timestamp))
+            recordVisit("join", island, user.id, trips)
+            visitor = island.visitors.get(user.id)
+            admitted = queuePosition < island.queueSize
+            if admitted:
+                admitVisitors([visitor], island)
+
+    if closed:
+        await ctx.send(f"{user.name}, {islandId} is not a valid island ID.")
+        return
 
-    if queuePosition != -1:
+    if alreadyQueued:
         await ctx.send(
-            f"{user.name}, you are already in the queue at position {queuePosition + 1} out of {island.getNumVisitors()}."
+            f"{user.name}, you are already in the queue at position {queuePosition + 1} out of {numVisitors}."
         )
         return
 
-    island.addVisitor(user, trips)
-    queuePosition = island.getUserPositionInQueue(user)
-
     #check if Visitor was sucessfully added
     if queuePosition == -1:
         await ctx.send(f"Failed to add {user.name} to {island.owner.name}'s queue.")
-        logging.error(f"Failed to add {user} to island {island.id}.")
+        logging.error("Failed to add %s to island %s.", user, island.islandId, extra={"island": island.islandId, "user": user.id})
         return
 
-    logging.info(f"User {user} has joined the queue for island {island.islandId} in position {queuePosition + 1}.")
-    await ctx.send(
-        f"{user.name}, you have been added to the queue for {island.owner.name}'s island and are currently in position {queuePosition + 1}. A DM will be sent to you from this bot with the Dodo code when it's your turn to visit the island."
+    logging.info(
+        "User %s has joined the queue for island %s in position %d.", user, island.islandId, queuePosition + 1,
+        extra={"island": island.islandId, "guild": island.guild.id, "user": user.id}
+    )
+    waitStr = ""
+    estimate = island.estimateWait(queuePosition)
+    if not admitted and estimate != None:
+        waitStr = f" The estimated wait is {formatWait(estimate)}."
+
+    await COALESCER.post(
+        ctx.channel,
+        f"{user.name}, you have been added to the queue for {island.owner.name}'s island and are currently in position {queuePosition + 1}.{waitStr} A DM will be sent to you from this bot with the Dodo code when it's your turn to visit the island.",
+        f"Added to {island.owner.name}'s queue ({island.islandId})",
+        f"{user.name} (#{queuePosition + 1})"
     )
 
     #message user the dodo code if allowed on the island
-    if queuePosition < island.queueSize:
-        await messageUser(island.visitors[queuePosition], island)
+    if admitted:
+        await messageUser(visitor, island)
+    elif queuePosition < island.queueSize + DM_PREFETCH:
+        warmNextVisitors(island)
 
 #Command to remove a Visitor from an Island
 #Parameters: <ctx : discord.ext.commands.Context> <islandId : str>
@@ -651,31 +1140,45 @@ async def joinQueue(ctx, islandId, trips : int = 0):
 async def leaveQueue(ctx, islandId):
     user = ctx.message.author
     island = getIslandById(islandId)
+    if island == None and await routeById(ctx, islandId):
+        return
 
     if island == None:
         await ctx.send(f"{user.name}, {islandId} is not a valid island ID.")
         return
 
-    queuePosition = island.getUserPositionInQueue(user)
+    async with island.lock:
+        visitor = island.visitors.get(user.id)
+        queuePosition, promoted = island.removeUser(user.id) if isOpen(island) else (-1, [])
+        if queuePosition != -1:
+            cancelVisitor(island, user.id)
+            recordChange("leave", island.islandId, user=user.id)
+            recordVisit("leave", island, user.id, dwell=time.monotonic() - visitor.timestamp if queuePosition < island.queueSize else None)
+            admitVisitors(promoted, island)
 
     if queuePosition == -1:
         await ctx.send(f"{user.name}, you are not currently in the queue for {island.owner.name}'s island.")
         return
 
-    removed = island.removeUser(user)
-
     #check if Visitor was successfully removed
-    if removed == False or island.getUserPositionInQueue(user) != -1:
+    if island.getUserPositionInQueue(user.id) != -1:
         await ctx.send(f"Failed to remove {user.name} from {island.owner.name}'s queue.")
-        logging.error(f"Failed to remove {user} from island {island.islandId}.")
+        logging.error("Failed to remove %s from island %s.", user, island.islandId, extra={"island": island.islandId, "user": user.id})
         return
 
-    await ctx.send(f"Thanks {user.name}, you've been removed from the queue for {island.owner.name}'s island!")
-    logging.info(f"Removed {user} from queue for island {island.islandId} from position {queuePosition + 1}. {island.getNumVisitors()} remaining in line.")
+    await COALESCER.post(
+        ctx.channel,
+        f"Thanks {user.name}, you've been removed from the queue for {island.owner.name}'s island!",
+        f"Removed from {island.owner.name}'s queue ({island.islandId})",
+        user.name
+    )
+    logging.info(
+        "Removed %s from queue for island %s from position %d. %d remaining in line.", user, island.islandId, queuePosition + 1, island.getNumVisitors(),
+        extra={"island": island.islandId, "guild": island.guild.id, "user": user.id}
+    )
 
     #message next user in line the dodo code
-    if queuePosition < island.queueSize and island.getNumVisitors() >= island.queueSize:
-        await messageUser(island.visitors[island.queueSize-1], island)
+    await messageUsers(promoted, island)
 
 #message the user the dodo code if they're allowed on the Island
 #Paramters: <ctx : discord.ext.commands.Context> <islandId : str>
@@ -683,12 +1186,14 @@ async def leaveQueue(ctx, islandId):
 async def sendDodoCode(ctx, islandId):
     user = ctx.message.author
     island = getIslandById(islandId)
+    if island == None and await routeById(ctx, islandId):
+        return
 
     if island == None:
         await ctx.send(f"{user.name}, {islandId} is not a valid island ID.")
         return
 
-    queuePosition = island.getUserPositionInQueue(user)
+    queuePosition = island.getUserPositionInQueue(user.id)
 
     if queuePosition == -1:
         await ctx.send(f"{user.name}, you are not currently in the queue for {island.owner.name}'s island.")
@@ -699,71 +1204,61 @@ async def sendDodoCode(ctx, islandId):
             f"{user.name}, it's not your turn to visit the island yet. Use '{helpMessages.COMMAND_PREFIX}queue {islandId}' to view the island's queue."
         )
         return
-    try:
-        await user.create_dm()
-        await user.dm_channel.send(
-            f"The Dodo code for {island.owner.name}'s island is '{island.code}'. Be sure to leave the queue with '{helpMessages.COMMAND_PREFIX}leave {island.islandId}' once you are done and completely off the island."
-        )
-    except:
-        logging.error(f"Could not message {user}.")
+    await DISPATCHER.send(
+        user,
+        f"The Dodo code for {island.owner.name}'s island is '{island.code}'. Be sure to leave the queue with '{helpMessages.COMMAND_PREFIX}leave {island.islandId}' once you are done and completely off the island."
+    )
 
 #--- General Commands ---#
 
-#Lists all the islands for a Server or all the users for one in a queue if an ID is provided.
-#Parameters: <ctx : discord.ext.commands.Context> <islandId : str>
+#Lists all the islands for a Server or all the users for one in a queue if an ID is provided. Long listings are split into pages.
+#Parameters: <ctx : discord.ext.commands.Context> <islandId : str> island ID or 'all' <page : int>
 @bot.command(name='list')
-async def listInfo(ctx, islandId : str = None):
-    if islandId == None: #list all
+async def listInfo(ctx, islandId : str = None, page : int = 1):
+    if islandId == None or islandId.lower() == "all": #list all
 
         if ctx.guild == None:  
             await ctx.send(f"To list all the islands for a server, call this command from a server. To list the queue for a specific island, use {helpMessages.COMMAND_PREFIX}list <island id>.")
             return
 
         server = getServerByGuild(ctx.guild)
-
-        islandStr = f"Currently {len(server.islands)} open."
-
-        if len(server.islands) > 0:
-            islandStr += "\n\n```"
-            for island in server.islands:
-                islandStr += f"\nOwner: {island.owner.name} | ID: {island.islandId}"
-
-                if island.price != None:
-                    islandStr += f" | Bell Price: {island.price}" 
-
-                islandStr += f" | Users in queue: {island.getNumVisitors()}"
-
-            islandStr += f"```\n\nIsland there that isn't open? Tell the owner or an admin to use '{helpMessages.COMMAND_PREFIX}close' to close their island."
-        islandStr += f"\nCreate a queue for your own island by using '{helpMessages.COMMAND_PREFIX}create'."
-        await ctx.send(islandStr)
+        await ctx.send(listing.getPage(listing.renderServerPages(server), page))
 
     else: #list one
 
         island = getIslandById(islandId)
+        if island == None and await routeById(ctx, islandId):
+            return
 
         if island == None:
             await ctx.send(f"{ctx.message.author.name}, {islandId} is not a valid island ID.")
             return
 
-        queue = f"```Owner: {island.owner.name} | ID: {islandId}"
-
-        if island.price != None:
-            queue+= f" | Bell Price: {island.price}"
-
-        queue += f" | Users in queue: {island.getNumVisitors()}\n{island.queueSize} users allowed on this island at a time."
+        await ctx.send(listing.getPage(listing.renderIslandPages(island, USERS.name), page))
 
-        if island.getNumVisitors() > 0:
-            queue += f"\n------------------------------"
-            for i in range(island.getNumVisitors()):
-                if i == island.queueSize:
-                    queue += "\n------------------------------"
-                queue += f"\n{i + 1}: {island.visitors[i].user.name}    {island.visitors[i].trips} trips"
-                if i < island.queueSize:
-                    queue += f"    {island.visitors[i].getTimeSpent()} minutes"
+#Shows the spread of turnip prices given in this server, the average price on each day of the week and the best hour to sell.
+#Worked out over every stored price with NumPy and cached until the server gets a new price.
+#Parameters: <ctx : discord.ext.commands.Context>
+@commands.guild_only()
+@bot.command(name='prices')
+async def showPrices(ctx):
+    if PRICES == None:
+        await ctx.send("The price log is turned off for this bot.")
+        return
 
-        queue += f"```\n\nUse '{helpMessages.COMMAND_PREFIX}join {islandId} <number of trips>' to join this queue."
+    stats = PRICES.analyze(ctx.guild.id)
+    if stats == None:
+        await ctx.send(f"No turnip prices have been given in {ctx.guild} yet. Prices are saved when an island is created or updated with one.")
+        return
 
-        await ctx.send(queue)
+    percentiles = stats.percentiles
+    lines = [
+        f"Prices given: {stats.count} | Highest: {stats.highest} bells",
+        f"Median: {percentiles[50]:.0f} bells | Middle half: {percentiles[25]:.0f}-{percentiles[75]:.0f} | 10th-90th percentile: {percentiles[10]:.0f}-{percentiles[90]:.0f}",
+        "Average by day: " + ", ".join(f"{day} {mean:.0f}" for day, mean in zip(DAYS, stats.dayMeans) if mean != None),
+        f"Best hour: {stats.bestHour:02d}:00 UTC, averaging {stats.bestHourMean:.0f} bells"
+    ]
+    await ctx.send(f"Turnip prices for {ctx.guild}:\n```\n" + "\n".join(lines) + "```")
 
 #--- Server Admin Commands ---#
 
@@ -776,11 +1271,11 @@ async def setChannel(ctx, channel):
     server = getServerByGuild(ctx.guild)
 
     if channel == "turnip":
-        server.setTurnipChannel(ctx.channel.id, sqlConnection())
+        server.setTurnipChannel(ctx.channel.id, CONFIG_WRITER)
         await ctx.send(f"Turnip Channel set to {ctx.channel}.")
 
     elif channel == "general":
-        server.setGeneralChannel(ctx.channel.id, sqlConnection())
+        server.setGeneralChannel(ctx.channel.id, CONFIG_WRITER)
         await ctx.send(f"General Channel set to {ctx.channel}.")
 
     else:
@@ -795,24 +1290,87 @@ async def setTimeout(ctx, time : int):
 
     oldTimeout = server.timeout
 
-    server.setTimeout(time, sqlConnection())
+    server.setTimeout(time, CONFIG_WRITER)
+
+    #move the deadline for everyone currently allowed on an island in this server
+    for island in server.islands.values():
+        for visitor in island.visitors.admitted:
+            scheduleVisitor(island, visitor)
 
     await ctx.send(f"User timeout updated from {oldTimeout} to {server.timeout} minutes.")
 
+#Turns the live queue board on or off for a server (updates DB)
+#Parameters: <ctx : discord.ext.commands.Context> <setting : str>
+@commands.has_guild_permissions(administrator=True)
+@bot.command(name='board')
+async def setBoard(ctx, setting):
+    setting = setting.lower()
+    server = getServerByGuild(ctx.guild)
+
+    if setting == "on":
+        server.setLiveBoard(True, CONFIG_WRITER)
+        await ctx.send("Live queue boards turned on. Islands opened from now on will get a pinned board in their broadcast channel.")
+
+    elif setting == "off":
+        server.setLiveBoard(False, CONFIG_WRITER)
+        await ctx.send("Live queue boards turned off.")
+
+    else:
+        await ctx.send(f"{setting} is not a valid setting. Use '{helpMessages.COMMAND_PREFIX}board on/off'.")
+
+#Shows the server's visits over the last day and week. Answered from the history rollups, so it reads at most 33 rows however busy the server is.
+#Parameters: <ctx : discord.ext.commands.Context>
+@commands.has_guild_permissions(administrator=True)
+@bot.command(name='history')
+async def showHistory(ctx):
+    if HISTORY == None:
+        await ctx.send("Visit history is turned off for this bot.")
+        return
+
+    recent, week, hourly = await HISTORY.summary(ctx.guild.id)
+    lines = [f"Last 24 hours: {recent.summarize()}", f"Last 7 days: {week.summarize()}"]
+    if len(hourly) > 0:
+        busiest, totals = max(hourly, key=lambda entry: entry[1].joins)
+        lines.append(f"Busiest hour of the last day: {time.strftime('%H:00', time.gmtime(busiest))} UTC with {totals.joins} joins")
+
+    await ctx.send(f"Visit history for {ctx.guild}:\n```\n" + "\n".join(lines) + "```")
+
 #--- Bot Owner Commands ---#
 
 #Get a list of servers the bot is connected to
 @commands.is_owner()
 @bot.command(name='servers')
 async def listServers(ctx):
-    serverStr = f"Currently connected to {len(SERVERS)}."
+    serverStr = f"Currently connected to {len(REGISTRY)}."
+
+    if len(REGISTRY) > 0:
+        serverStr += "\n\n```\n" + "\n".join([f"{server.guild} | {len(server.islands)} islands" for server in REGISTRY]) + "```"
+    for part in coalescer.split(serverStr):
+        await ctx.send(part)
 
-    if len(SERVERS) > 0:
-        serverStr += "\n\n```"
-        for server in SERVERS:
-            serverStr += f"\n{server.guild} | {len(server.islands)} islands"
-        serverStr += "```"
-    await ctx.send(serverStr)
+#Shows the bot's metrics, every figure is a stored counter so this doesn't scan any queues
+@commands.is_owner()
+@bot.command(name='stats')
+async def showStats(ctx):
+    dms = METRICS.histogram("dm_send_seconds")
+    queries = METRICS.histogram("db_query_seconds")
+    cycles = METRICS.histogram("expiry_cycle_seconds")
+
+    lines = [
+        f"Guilds: {len(REGISTRY)} | Open islands: {len(REGISTRY.islands)} | Waiting: {REGISTRY.totals.waiting} | Admitted: {REGISTRY.totals.admitted}",
+        f"DMs: {METRICS.counter('dm_sent_total')} sent, {METRICS.counter('dm_failed_total')} failed, {METRICS.counter('dm_rate_limited_total')} rate limited" +
+            (f", {dms.mean() * 1000:.0f}ms average" if dms != None else ""),
+        f"DM channels: {len(DISPATCHER.channels)} cached, {DISPATCHER.channels.hitRate() * 100:.1f}% hit rate " +
+            f"({DISPATCHER.channels.hits} hits, {DISPATCHER.channels.misses} misses), recent sends {DISPATCHER.averageLatency() * 1000:.0f}ms average",
+        f"DB queries: {queries.count if queries != None else 0}" + (f", {queries.mean() * 1000:.0f}ms average" if queries != None else ""),
+        f"Expiry cycles: {cycles.count if cycles != None else 0}" + (f", {cycles.mean() * 1000:.0f}ms average" if cycles != None else ""),
+        f"Rate limited commands: {ADMISSION.rejected}",
+        f"Config writes: {CONFIG_WRITER.queueDepth()} guilds pending, last flush {CONFIG_WRITER.lastFlushLatency * 1000:.0f}ms, {CONFIG_WRITER.failures} failed"
+    ]
+    for labels, histogram in sorted(METRICS.histograms.get("command_seconds", {}).items()):
+        lines.append(f"{labels[0][1]}: {histogram.count} runs, {histogram.mean() * 1000:.1f}ms average")
+
+    await ctx.send("```\n" + "\n".join(lines) + "```")
 
 #flip the debug flag
 @commands.is_owner()
@@ -833,7 +1391,7 @@ async def createError(ctx, error):
         await ctx.send(f"Looks like you didn't give a number for the <price> - use an integer like '500', don't type it out 'five-hundred'.")
     elif isinstance(error, commands.NoPrivateMessage):
         await ctx.send("This command must be called from a server.")
-    else:
+    elif not isinstance(error, RateLimited): #admitCommand already replied if it needed to
         raise
 
 @openQueue.error
@@ -844,7 +1402,7 @@ async def openError(ctx, error):
         await ctx.send(f"Looks like you didn't give a number for the <queue size> - use an integer like '4', don't type it out 'four'.")
     elif isinstance(error, commands.PrivateMessageOnly):
         await ctx.send(f"{helpMessages.COMMAND_PREFIX}open can only be exectued by directly messaging the bot - please create a new dodo code and try again by messaging this bot directly.")
-    else:
+    elif not isinstance(error, RateLimited): #admitCommand already replied if it needed to
         raise
 
 @removeUser.error
@@ -853,14 +1411,14 @@ async def removeError(ctx, error):
         await ctx.send("Looks like you didn't give a number for the position - use an integer like '4', don't type it out.")
     elif isinstance(error, commands.MissingRequiredArgument):
         await ctx.send(f"Looks like you're missing an argument - use '{helpMessages.COMMAND_PREFIX}remove <position> <islandId (Optional)>'")
-    else:
+    elif not isinstance(error, RateLimited): #admitCommand already replied if it needed to
         raise
 
 @updateQueue.error
 async def updateError(ctx, error):
     if isinstance(error, commands.MissingRequiredArgument):
         await ctx.send(f"Looks like you're missing an argument - Use '{helpMessages.COMMAND_PREFIX}update dodo/price/size <value>'.")
-    else:
+    elif not isinstance(error, RateLimited): #admitCommand already replied if it needed to
         raise
 
 @updateQueue.error
@@ -869,7 +1427,7 @@ async def updateError(ctx, error):
         await ctx.send("Update can only be exectued by directly messaging the bot - please create a new dodo code and try again by messaging this bot directly.")
     elif isinstance(error, commands.MissingRequiredArgument):
         await ctx.send(f"Looks like you're missing the new Dodo code - use '{helpMessages.COMMAND_PREFIX}update <dodo code>'")
-    else:
+    elif not isinstance(error, RateLimited): #admitCommand already replied if it needed to
         raise
 
 @joinQueue.error
@@ -880,21 +1438,35 @@ async def joinError(ctx, error):
         await ctx.send("Looks like you didn't give a number for your number of trips - use an integer like '4', don't type it out.")
     elif isinstance(error, commands.NoPrivateMessage):
         await ctx.send("This command must be called from a server.")
-    else:
+    elif not isinstance(error, RateLimited): #admitCommand already replied if it needed to
         raise
 
 @leaveQueue.error
 async def leaveError(ctx, error):
     if isinstance(error, commands.MissingRequiredArgument):
         await ctx.send(f"Looks like you're missing an argument - use '{helpMessages.COMMAND_PREFIX}leave <island ID>'")
-    else:
+    elif not isinstance(error, RateLimited): #admitCommand already replied if it needed to
         raise
 
 @sendDodoCode.error
 async def dodoError(ctx, error):
     if isinstance(error, commands.MissingRequiredArgument):
         await ctx.send(f"Looks like you're missing an argument - use '{helpMessages.COMMAND_PREFIX}dodo <island ID>'")
-    else:
+    elif not isinstance(error, RateLimited): #admitCommand already replied if it needed to
+        raise
+
+@listInfo.error
+async def listError(ctx, error):
+    if isinstance(error, commands.BadArgument):
+        await ctx.send("Looks like you didn't give a number for the page - use an integer like '2', don't type it out.")
+    elif not isinstance(error, RateLimited): #admitCommand already replied if it needed to
+        raise
+
+@showPrices.error
+async def pricesError(ctx, error):
+    if isinstance(error, commands.NoPrivateMessage):
+        await ctx.send("This command can't be called in a DM.")
+    elif not isinstance(error, RateLimited): #admitCommand already replied if it needed to
         raise
 
 @setChannel.error
@@ -905,7 +1477,7 @@ async def setChannelError(ctx, error):
         await ctx.send("You don't have admin permissions on this server.")
     elif isinstance(error, commands.MissingRequiredArgument):
         await ctx.send("Looks like you're missing an argument - use '{helpMessages.COMMAND_PREFIX}setChannel turnip/general'.")
-    else:
+    elif not isinstance(error, RateLimited): #admitCommand already replied if it needed to
         raise
 
 @setTimeout.error
@@ -918,7 +1490,27 @@ async def setTimeoutError(ctx, error):
         await ctx.send("Looks like you're missing an argument - use '{helpMessages.COMMAND_PREFIX}setTimeout <time>'.")
     elif isinstance(error, commands.BadArgument):
         await ctx.send("Looks like you didn't give a number for the time - use an integer like '20', don't type it out.")
-    else:
+    elif not isinstance(error, RateLimited): #admitCommand already replied if it needed to
+        raise
+
+@setBoard.error
+async def setBoardError(ctx, error):
+    if isinstance(error, commands.NoPrivateMessage):
+        await ctx.send("This command can't be called in a DM.")
+    elif isinstance(error, commands.MissingPermissions):
+        await ctx.send("You don't have admin permissions on this server.")
+    elif isinstance(error, commands.MissingRequiredArgument):
+        await ctx.send(f"Looks like you're missing an argument - use '{helpMessages.COMMAND_PREFIX}board on/off'.")
+    elif not isinstance(error, RateLimited): #admitCommand already replied if it needed to
+        raise
+
+@showHistory.error
+async def historyError(ctx, error):
+    if isinstance(error, commands.NoPrivateMessage):
+        await ctx.send("This command can't be called in a DM.")
+    elif isinstance(error, commands.MissingPermissions):
+        await ctx.send("You don't have admin permissions on this server.")
+    elif not isinstance(error, RateLimited): #admitCommand already replied if it needed to
         raise
 
 @listServers.error
@@ -926,7 +1518,14 @@ async def setTimeoutError(ctx, error):
 async def listServersError(ctx, error):
     if isinstance(error, commands.NotOwner):
         await ctx.send("Only the owner of the bot can call this command.")
-    else:
+    elif not isinstance(error, RateLimited): #admitCommand already replied if it needed to
+        raise
+
+@showStats.error
+async def showStatsError(ctx, error):
+    if isinstance(error, commands.NotOwner):
+        await ctx.send("Only the owner of the bot can call this command.")
+    elif not isinstance(error, RateLimited): #admitCommand already replied if it needed to
         raise
 
 #---Help Menus---#  
@@ -974,10 +1573,27 @@ async def help(ctx, com : str = None):
     elif com == "timeout":
         helpStr = helpMessages.TIMEOUT
 
+    elif com == "board":
+        helpStr = helpMessages.BOARD
+
+    elif com == "history":
+        helpStr = helpMessages.HISTORY
+
+    elif com == "prices":
+        helpStr = helpMessages.PRICES
+
     else:
         helpStr = f"{com} is not a valid command. Use '{helpMessages.COMMAND_PREFIX}help' to list this bot's available commands."
 
     await ctx.send(helpStr)
 
-bot.loop.create_task(clean())
-bot.run(TOKEN)
\ No newline at end of file
+#only connect when run directly so the command handlers can be imported and driven by the scripts in bench
+if __name__ == "__main__":
+    if METRICS_PORT > 0:
+        bot.loop.create_task(METRICS.serve(METRICS_HOST, METRICS_PORT))
+    bot.loop.create_task(clean())
+    bot.loop.create_task(snapshotQueues())
+    bot.loop.create_task(BOARDS.run())
+    bot.run(TOKEN)
+    if not QUEUES_RESTORED.is_set():
+        sys.exit(1) #never got as far as serving commands, let whatever started the bot see it failed
@@ -0,0 +1,170 @@
+"""
+Animal Crossing New Horizons Island Queue Discord Bot
+Author: Marshall Jankovsky
+github.com/marshalltj/island-queue-bot
+
+Version: 2.0.0
+
+cluster.py runs the bot as several processes that each own a range of shards, and routes commands between them.
+
+Usage: python cluster.py <number of processes> <number of shards>
+
+Each process gets CLUSTER_ID, CLUSTER_COUNT, SHARD_COUNT and SHARD_IDS in its environment and its own slice of the island ID range,
+so island IDs stay unique across processes and the process that owns an island can be worked out from its ID.
+Every process also gets the same CLUSTER_SECRET (random unless one is set), which routed commands must carry to be run.
+"""
+
+import asyncio
+import hmac
+import json
+import logging
+import os
+import secrets
+import signal
+import subprocess
+import sys
+
+#Parameters: <clusterId : int> <clusterCount : int> <shardCount : int>
+#Returns: the list of shard ids process <clusterId> connects
+def shardIds(clusterId, clusterCount, shardCount):
+    return [shard for shard in range(shardCount) if shard % clusterCount == clusterId]
+
+#Parameters: <clusterId : int> <clusterCount : int> <width : int> digits in an island ID
+#Returns: the (start, stop) island ID numbers process <clusterId> hands out
+def idRange(clusterId, clusterCount, width):
+    size = (10**width - 1) // clusterCount
+    start = 1 + clusterId * size
+    stop = 10**width if clusterId == clusterCount - 1 else start + size
+    return start, stop
+
+#Parameters: <islandId : str> <clusterCount : int> <width : int> <prefix : str>
+#Returns: the id of the process that owns <islandId> or None if it isn't a valid ID
+def clusterForIsland(islandId, clusterCount, width, prefix=""):
+    digits = islandId[len(prefix):]
+    if not islandId.startswith(prefix) or len(digits) != width or not digits.isdigit():
+        return None
+
+    number = int(digits)
+    for clusterId in range(clusterCount):
+        start, stop = idRange(clusterId, clusterCount, width)
+        if start <= number < stop:
+            return clusterId
+
+#Class that sends routed commands to the other bot processes over localhost and serves the ones sent to this process.
+#Requests and replies are single JSON lines. Any local program can connect to the port, so a request is only run if it carries
+#the <secret> every process in the cluster was started with.
+#Members: <clusterId : int> <clusterCount : int> <basePort : int> <handler : coroutine function> <forwarded : int> <received : int> <rejected : int>
+class ClusterRouter:
+    def __init__(self, clusterId, clusterCount, basePort=7070, secret=None):
+        if not secret:
+            raise ValueError("CLUSTER_SECRET must be set when running more than one process, start them with cluster.py.")
+
+        self.clusterId = clusterId
+        self.clusterCount = clusterCount
+        self.basePort = basePort #process N listens on basePort + N
+        self.handler = None
+        self.forwarded = 0
+        self.received = 0
+        self.rejected = 0 #requests without the right secret
+        self._secret = secret.encode()
+        self._server = None
+
+    #Starts listening for routed commands, each one is passed to <handler>(request) and its return value sent back
+    #Parameters: <handler : coroutine function>
+    async def start(self, handler):
+        self.handler = handler
+        if self._server == None:
+            self._server = await asyncio.start_server(self._serve, "127.0.0.1", self.basePort + self.clusterId)
+
+    async def _serve(self, reader, writer):
+        try:
+            request = json.loads(await reader.readline())
+            if not isinstance(request, dict) or not hmac.compare_digest(str(request.pop("secret", "")).encode(), self._secret):
+                self.rejected += 1
+                logging.warning("Rejected a routed command without the cluster secret.")
+                reply = {"handled": False}
+            else:
+                self.received += 1
+                reply = await self.handler(request)
+        except Exception:
+            logging.exception("Failed to handle a routed command.")
+            reply = {"handled": False}
+
+        writer.write((json.dumps(reply) + "\n").encode())
+        await writer.drain()
+        writer.close()
+
+    #Sends <request> to process <clusterId>
+    #Parameters: <clusterId : int> <request : dict>
+    #Returns: the reply dict, or {"handled" : False} if the process couldn't be reached
+    async def forward(self, clusterId, request):
+        try:
+            reader, writer = await asyncio.open_connection("127.0.0.1", self.basePort + clusterId)
+            writer.write((json.dumps({**request, "secret": self._secret.decode()}) + "\n").encode())
+            await writer.drain()
+            reply = json.loads(await reader.readline())
+            writer.close()
+            self.forwarded += 1
+            return reply
+        except (OSError, ValueError):
+            logging.error("Could not route %s to cluster %d.", request.get("command"), clusterId, extra={"command": request.get("command"), "user": request.get("author")})
+            return {"handled": False}
+
+    async def close(self):
+        if self._server != None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+#Starts <clusterCount> bot processes splitting <shardCount> shards between them and waits for them to exit
+#Parameters: <clusterCount : int> <shardCount : int>
+def launch(clusterCount, shardCount):
+    width = int(os.getenv('ISLAND_ID_WIDTH', 4))
+    journalDir = os.getenv('JOURNAL_DIR', "../journal")
+    logDir = os.getenv('LOG_DIR', "../logs") #each process rotates its own bot.log
+    priceDir = os.getenv('PRICE_DIR', "../prices") #each process logs the prices for its own guilds, empty keeps the log off
+    metricsPort = int(os.getenv('METRICS_PORT', 9090)) #each process serves its metrics on the next port up
+    secret = os.getenv('CLUSTER_SECRET') or secrets.token_hex(32) #shared by the processes so they only run each other's routed commands
+    processes = []
+
+    for clusterId in range(clusterCount):
+        start, stop = idRange(clusterId, clusterCount, width)
+        env = dict(os.environ)
+        env.update({
+            "CLUSTER_ID": str(clusterId),
+            "CLUSTER_COUNT": str(clusterCount),
+            "SHARD_COUNT": str(shardCount),
+            "SHARD_IDS": ",".join(str(shard) for shard in shardIds(clusterId, clusterCount, shardCount)),
+            "CLUSTER_SECRET": secret,
+            "ISLAND_ID_START": str(start),
+            "ISLAND_ID_STOP": str(stop),
+            "JOURNAL_DIR": os.path.join(journalDir, f"cluster-{clusterId}"),
+            "LOG_DIR": os.path.join(logDir, f"cluster-{clusterId}"),
+            "PRICE_DIR": os.path.join(priceDir, f"cluster-{clusterId}") if priceDir else "",
+            "METRICS_PORT": str(metricsPort + clusterId if metricsPort > 0 else 0)
+        })
+        processes.append(subprocess.Popen([sys.executable, "bot.py"], env=env, cwd=os.path.dirname(os.path.abspath(__file__))))
+        print(f"Started cluster {clusterId} with shards {env['SHARD_IDS']} and island IDs {start}-{stop - 1}.")
+
+    #pass Ctrl+C/SIGTERM on to every process so they can flush and shut down cleanly
+    def stop(signum, frame):
+        for process in processes:
+            process.send_signal(signal.SIGTERM)
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    for process in processes:
+        process.wait()
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Usage: python cluster.py <number of processes> <number of shards>")
+        sys.exit(1)
+
+    clusters = int(sys.argv[1])
+    shards = int(sys.argv[2])
+    if clusters < 1 or shards < clusters:
+        print("Need at least one process and at least as many shards as processes.")
+        sys.exit(1)
+
+    launch(clusters, shards)
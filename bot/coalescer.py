@@ -0,0 +1,145 @@
+"""
+Animal Crossing New Horizons Island Queue Discord Bot
+Author: Marshall Jankovsky
+github.com/marshalltj/island-queue-bot
+
+Version: 2.0.0
+
+coalescer.py contains a class ChannelCoalescer that merges bursts of channel messages into a single message per channel.
+"""
+
+import asyncio
+import collections
+import logging
+import time
+
+MAX_MESSAGE_LENGTH = 2000 #Discord's limit on message length
+
+#Class that holds the messages waiting to be sent to one channel
+#Members: <channel : discord.abc.Messageable> <lines : [str]> <groups : OrderedDict(str : [str])> <lastSent : float> <task : asyncio.Task>
+class PendingChannel:
+    def __init__(self, channel):
+        self.channel = channel
+        self.lines = []
+        self.groups = collections.OrderedDict()
+        self.lastSent = 0.0
+        self.task = None
+
+    def isEmpty(self):
+        return len(self.lines) == 0 and len(self.groups) == 0
+
+    #Returns: the buffered messages merged into one str, grouped items listed together as "<group>: a, b, c"
+    def render(self):
+        merged = [f"{group}: {', '.join(items)}" for group, items in self.groups.items()]
+        return "\n".join(merged + self.lines)
+
+#Class that sends the first message to a quiet channel straight away and buffers any others sent within <window> seconds of it,
+#flushing them together as one message when the window closes.
+#Members: <window : float> <channels : {int : PendingChannel}> <posted : int> <sent : int>
+class ChannelCoalescer:
+    def __init__(self, window=2.0):
+        self.window = window
+        self.channels = {}
+        self.posted = 0 #messages handed to post()
+        self.sent = 0 #messages actually sent to Discord
+
+    #Sends <content> to <channel>, or buffers it if the channel had a message in the last <window> seconds.
+    #If <group> and <item> are given a buffered message is shortened to <item> and listed with the other items in its <group>.
+    #Parameters: <channel : discord.abc.Messageable> <content : str> <group : str> <item : str>
+    async def post(self, channel, content, group=None, item=None):
+        if channel == None:
+            return
+
+        self.posted += 1
+        if self.window <= 0:
+            await self._send(channel, content)
+            return
+
+        pending = self.channels.get(channel.id)
+        if pending == None:
+            pending = PendingChannel(channel)
+            self.channels[channel.id] = pending
+
+        #light traffic, nothing buffered and nothing sent recently
+        if pending.isEmpty() and time.monotonic() - pending.lastSent >= self.window:
+            pending.lastSent = time.monotonic()
+            await self._send(channel, content)
+            return
+
+        if group != None and item != None:
+            pending.groups.setdefault(group, []).append(item)
+        else:
+            pending.lines.append(content)
+
+        if pending.task == None:
+            delay = max(0, self.window - (time.monotonic() - pending.lastSent))
+            pending.task = asyncio.ensure_future(self._flushLater(channel.id, delay))
+
+    async def _flushLater(self, channelId, delay):
+        await asyncio.sleep(delay)
+        await self.flush(channelId)
+
+    #Sends everything buffered for <channelId>
+    #Parameters: <channelId : int>
+    async def flush(self, channelId):
+        pending = self.channels.get(channelId)
+        if pending == None:
+            return
+
+        pending.task = None
+        if pending.isEmpty():
+            del self.channels[channelId] #nothing new came in, stop tracking the channel
+            return
+
+        content = pending.render()
+        pending.lines = []
+        pending.groups = collections.OrderedDict()
+        pending.lastSent = time.monotonic()
+        await self._send(pending.channel, content)
+
+        #keep the channel around for one more window so the next burst is also merged
+        pending.task = asyncio.ensure_future(self._flushLater(channelId, self.window))
+
+    #Sends everything still buffered, called on shutdown
+    async def close(self):
+        channels = self.channels
+        self.channels = {}
+        for pending in channels.values():
+            if pending.task != None:
+                pending.task.cancel()
+            if not pending.isEmpty():
+                await self._send(pending.channel, pending.render())
+
+    async def _send(self, channel, content):
+        for part in split(content):
+            try:
+                await channel.send(part)
+                self.sent += 1
+            except Exception:
+                logging.error("Could not send to channel %s.", channel)
+
+#Splits <content> into pieces no longer than MAX_MESSAGE_LENGTH, on line breaks where possible
+#Parameters: <content : str>
+#Returns: a list of str
+def split(content):
+    parts = []
+    current = ""
+    for line in content.split("\n"):
+        while len(line) > MAX_MESSAGE_LENGTH:
+            if len(current) > 0:
+                parts.append(current)
+                current = ""
+            parts.append(line[:MAX_MESSAGE_LENGTH])
+            line = line[MAX_MESSAGE_LENGTH:]
+
+        if len(current) == 0:
+            current = line
+        elif len(current) + 1 + len(line) <= MAX_MESSAGE_LENGTH:
+            current += "\n" + line
+        else:
+            parts.append(current)
+            current = line
+
+    if len(current) > 0:
+        parts.append(current)
+    return parts
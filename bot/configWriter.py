@@ -0,0 +1,104 @@
+"""
+Animal Crossing New Horizons Island Queue Discord Bot
+Author: Marshall Jankovsky
+github.com/marshalltj/island-queue-bot
+
+Version: 2.0.0
+
+configWriter.py contains a class ConfigWriter that writes Server configuration changes to the database in the background.
+"""
+
+import asyncio
+import logging
+import time
+
+#Class that queues Server column changes and writes them to the Database after a short delay.
+#Changes to the same guild made before the flush are merged so each guild gets at most one UPDATE per flush.
+#Members: <db : Database> <delay : float> <pending : {int : {str : any}}> <flushes : int> <statements : int> <failures : int> <lastFlushLatency : float>
+class ConfigWriter:
+    def __init__(self, db, delay=2.0):
+        self.db = db
+        self.delay = delay #seconds to wait for more changes before writing
+        self.pending = {}
+
+        self.flushes = 0
+        self.statements = 0
+        self.failures = 0
+        self.lastFlushLatency = 0.0 #seconds the most recent flush took
+
+        self._task = None
+        self._sleeping = False #True while _task is still waiting out the delay and hasn't started writing
+        self._lock = asyncio.Lock()
+
+    #Returns: the number of guilds with changes waiting to be written
+    def queueDepth(self):
+        return len(self.pending)
+
+    #Queues <column> = <value> for <guildId> and makes sure a flush is scheduled
+    #Parameters: <guildId : int> <column : str> <value>
+    def write(self, guildId, column, value):
+        self.pending.setdefault(guildId, {})[column] = value
+
+        if self._task == None or self._task.done():
+            self._sleeping = True
+            self._task = asyncio.ensure_future(self._flushLater())
+
+    #Drops any queued changes for <guildId>, e.g. when the bot leaves the guild
+    #Parameters: <guildId : int>
+    def discard(self, guildId):
+        self.pending.pop(guildId, None)
+
+    #Whoever schedules this sets _sleeping first, so close() also cancels a delayed flush that hasn't started running yet
+    async def _flushLater(self):
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self._sleeping = False
+        await self.flush()
+
+    #Writes every queued change now
+    async def flush(self):
+        async with self._lock:
+            if len(self.pending) == 0:
+                return
+
+            batch = self.pending
+            self.pending = {}
+            startTime = time.monotonic()
+
+            for guildId, columns in batch.items():
+                try:
+                    await self.db.updateServerColumns(guildId, columns)
+                    self.statements += 1
+                except Exception:
+                    self.failures += 1
+                    logging.exception("Failed to write config for server %s, requeueing.", guildId, extra={"guild": guildId})
+                    #keep anything newer that was queued while this flush was running
+                    self.pending[guildId] = {**columns, **self.pending.get(guildId, {})}
+
+            self.flushes += 1
+            self.lastFlushLatency = time.monotonic() - startTime
+
+        #schedule another flush for changes that came in or failed while this one ran
+        if len(self.pending) > 0 and (self._task == None or self._task.done() or self._task is asyncio.current_task()):
+            self._sleeping = True
+            self._task = asyncio.ensure_future(self._flushLater())
+
+    #Cancels the delayed flush and writes everything still queued, called on shutdown.
+    #A flush that is already writing is waited on for up to <timeout> seconds, cancelling it would lose the batch it took from pending.
+    #Parameters: <timeout : float>
+    async def close(self, timeout=10.0):
+        if self._task != None and not self._task.done():
+            if self._sleeping:
+                self._task.cancel()
+            else:
+                try:
+                    await asyncio.wait_for(asyncio.shield(self._task), timeout)
+                except asyncio.TimeoutError:
+                    logging.error("Config flush still running after %s seconds on shutdown.", timeout)
+        self._task = None
+
+        #retrying forever on shutdown could hang the bot, so this is a single attempt
+        await self.flush()
+        if self._task != None:
+            self._task.cancel()
@@ -0,0 +1,146 @@
+"""
+Animal Crossing New Horizons Island Queue Discord Bot
+Author: Marshall Jankovsky
+github.com/marshalltj/island-queue-bot
+
+Version: 2.0.0
+
+database.py contains a class Database that wraps an aiomysql connection pool and holds every query the bot runs against the Servers table.
+"""
+
+import aiomysql
+import logging
+import time
+
+from metrics import METRICS
+
+#Parameterized statements for the Servers table. Values are always passed to the driver separately and never formatted into the SQL.
+SELECT_SERVER = "SELECT TurnipChannel, GeneralChannel, Timeout, LiveBoard FROM Servers WHERE ID = %s"
+SELECT_SERVERS = "SELECT ID, TurnipChannel, GeneralChannel, Timeout, LiveBoard FROM Servers WHERE ID IN ({})"
+INSERT_SERVERS = "INSERT IGNORE INTO Servers (ID) VALUES {}"
+INSERT_SERVER = "INSERT IGNORE INTO Servers (ID) VALUES (%s)"
+DELETE_SERVER = "DELETE FROM Servers WHERE ID = %s"
+BULK_CHUNK_SIZE = 1000 #max guild ids per bulk statement to stay well under max_allowed_packet
+UPDATE_SERVER = "UPDATE Servers SET {} WHERE ID = %s"
+SERVER_COLUMNS = ("TurnipChannel", "GeneralChannel", "Timeout", "LiveBoard") #columns UPDATE_SERVER may set
+
+#Columns added to Servers since it was first created and their definitions, added by migrate() to databases that don't have them yet
+MIGRATIONS = (("LiveBoard", "BOOLEAN NULL"),)
+SELECT_COLUMN = "SELECT COUNT(*) FROM information_schema.COLUMNS WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'Servers' AND COLUMN_NAME = %s"
+ADD_COLUMN = "ALTER TABLE Servers ADD COLUMN {} {}"
+
+#Class that owns a bounded pool of MySQL connections so queries never block the event loop.
+#Members: <pool : aiomysql.Pool>
+class Database:
+    def __init__(self, host, user, password, name, minSize=1, maxSize=5, recycle=3600):
+        self.host = host
+        self.user = user
+        self.password = password
+        self.name = name
+        self.minSize = minSize
+        self.maxSize = maxSize
+        self.recycle = recycle #seconds before an idle connection is replaced
+        self.pool = None
+
+    #Creates the connection pool if it hasn't been created yet and brings the Servers table up to date
+    async def connect(self):
+        if self.pool == None:
+            self.pool = await aiomysql.create_pool(
+                host=self.host,
+                user=self.user,
+                password=self.password,
+                db=self.name,
+                minsize=self.minSize,
+                maxsize=self.maxSize,
+                pool_recycle=self.recycle,
+                autocommit=True
+            )
+            await self.migrate()
+
+    #Adds any column in MIGRATIONS that the Servers table is missing. Safe to run every start up.
+    async def migrate(self):
+        for name, definition in MIGRATIONS:
+            row = await self.execute(SELECT_COLUMN, (name,), "one")
+            if row[0] == 0:
+                try:
+                    await self.execute(ADD_COLUMN.format(name, definition))
+                except aiomysql.OperationalError as error:
+                    if error.args[0] != 1060: #duplicate column name, another process added it first
+                        raise
+                logging.info("Added column %s to the Servers table.", name)
+
+    async def close(self):
+        if self.pool != None:
+            self.pool.close()
+            await self.pool.wait_closed()
+            self.pool = None
+
+    #Runs <sql> with <args> on a pooled connection that has been pinged first so dropped connections are reopened
+    #Parameters: <sql : str> <args : tuple> <fetch : str> None, "one" or "all"
+    #Returns: the fetched row(s) or the number of affected rows
+    async def execute(self, sql, args=(), fetch=None):
+        startTime = time.monotonic()
+        try:
+            async with self.pool.acquire() as conn:
+                await conn.ping(reconnect=True)
+                async with conn.cursor() as cursor:
+                    affected = await cursor.execute(sql, args)
+                    if fetch == "one":
+                        return await cursor.fetchone()
+                    if fetch == "all":
+                        return await cursor.fetchall()
+                    return affected
+        finally:
+            METRICS.observe("db_query_seconds", time.monotonic() - startTime) #includes waiting for a pooled connection
+
+    #Parameters: <guildId : int>
+    #Returns: a tuple of (TurnipChannel, GeneralChannel, Timeout, LiveBoard) or None if the guild isn't stored
+    async def getServer(self, guildId):
+        return await self.execute(SELECT_SERVER, (guildId,), "one")
+
+    #Parameters: <guildId : int>
+    #Returns: True if a row was added, False if the guild was already stored
+    async def addServer(self, guildId):
+        return await self.execute(INSERT_SERVER, (guildId,)) > 0
+
+    #Reads the rows for many guilds with one SELECT per BULK_CHUNK_SIZE ids
+    #Parameters: <guildIds : [int]>
+    #Returns: a dict of guild id -> (TurnipChannel, GeneralChannel, Timeout, LiveBoard) for the guilds that are stored
+    async def getServers(self, guildIds):
+        rows = {}
+        for chunk in chunks(guildIds):
+            sql = SELECT_SERVERS.format(", ".join(["%s"] * len(chunk)))
+            for row in await self.execute(sql, tuple(chunk), "all"):
+                rows[row[0]] = row[1:]
+        return rows
+
+    #Adds many guilds with one multi-row INSERT IGNORE per BULK_CHUNK_SIZE ids
+    #Parameters: <guildIds : [int]>
+    #Returns: the number of rows added
+    async def addServers(self, guildIds):
+        added = 0
+        for chunk in chunks(guildIds):
+            sql = INSERT_SERVERS.format(", ".join(["(%s)"] * len(chunk)))
+            added += await self.execute(sql, tuple(chunk))
+        return added
+
+    #Parameters: <guildId : int>
+    async def removeServer(self, guildId):
+        await self.execute(DELETE_SERVER, (guildId,))
+
+    #Sets several columns for a guild in one UPDATE
+    #Parameters: <guildId : int> <columns : {str : any}> keyed by names in SERVER_COLUMNS
+    async def updateServerColumns(self, guildId, columns):
+        names = [name for name in SERVER_COLUMNS if name in columns]
+        if len(names) != len(columns):
+            raise ValueError(f"Unknown Servers columns: {set(columns) - set(names)}")
+
+        sql = UPDATE_SERVER.format(", ".join([f"{name} = %s" for name in names]))
+        await self.execute(sql, tuple(columns[name] for name in names) + (guildId,))
+
+#Splits <items> into lists of at most BULK_CHUNK_SIZE
+#Parameters: <items : [any]>
+def chunks(items):
+    items = list(items)
+    for i in range(0, len(items), BULK_CHUNK_SIZE):
+        yield items[i:i + BULK_CHUNK_SIZE]
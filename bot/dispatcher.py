@@ -0,0 +1,278 @@
+"""
+Animal Crossing New Horizons Island Queue Discord Bot
+Author: Marshall Jankovsky
+github.com/marshalltj/island-queue-bot
+
+Version: 2.0.0
+
+dispatcher.py contains a class Dispatcher that sends DMs concurrently while staying under Discord's rate limits.
+"""
+
+import asyncio
+import collections
+import logging
+import time
+
+import discord
+from metrics import METRICS
+
+#Class for a token bucket that refills <rate> tokens a second up to <capacity>
+#Members: <rate : float> <capacity : float> <tokens : float> <blockedUntil : float>
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.blockedUntil = 0.0 #set when Discord answers with a 429
+        self._updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    #Returns: seconds to wait before a token is available, without taking it
+    def peek(self):
+        now = time.monotonic()
+        if now < self.blockedUntil:
+            return self.blockedUntil - now
+
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    #Returns: seconds to wait before a token is available, taking it if it is available now
+    def reserve(self):
+        wait = self.peek()
+        if wait == 0:
+            self.tokens -= 1
+        return wait
+
+    #Waits until a token is available and takes it
+    async def acquire(self):
+        wait = self.reserve()
+        while wait > 0:
+            await asyncio.sleep(wait)
+            wait = self.reserve()
+
+    #Returns: True if the bucket is full and not blocked, so it can be dropped without losing state
+    def isIdle(self):
+        now = time.monotonic()
+        self._refill(now)
+        return now >= self.blockedUntil and self.tokens >= self.capacity
+
+#Class for a bounded least recently used cache of DM channels keyed by user id
+#Members: <capacity : int> <channels : OrderedDict(int : discord.DMChannel)> <hits : int> <misses : int>
+class ChannelCache:
+    def __init__(self, capacity=5000):
+        self.capacity = capacity
+        self.channels = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.channels)
+
+    def __contains__(self, userId):
+        return userId in self.channels
+
+    #Parameters: <userId : int>
+    #Returns: the cached channel or None, counting the hit or miss
+    def get(self, userId):
+        channel = self.channels.get(userId)
+        if channel == None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.channels.move_to_end(userId)
+        return channel
+
+    def put(self, userId, channel):
+        self.channels[userId] = channel
+        self.channels.move_to_end(userId)
+        while len(self.channels) > self.capacity:
+            self.channels.popitem(last=False)
+
+    def evict(self, userId):
+        self.channels.pop(userId, None)
+
+    #Returns: the fraction of lookups that were served from the cache
+    def hitRate(self):
+        total = self.hits + self.misses
+        if total == 0:
+            return 0.0
+        return self.hits / total
+
+#Parameters: <user : discord.User or int>
+#Returns: the user id of <user>, which may already be an id
+def userIdOf(user):
+    if isinstance(user, int):
+        return user
+    return user.id
+
+#discord.py 1.x's HTTPException has no retry_after, so it is read from the response Discord sent
+#Parameters: <error : discord.HTTPException> a 429
+#Returns: a tuple of (seconds to wait, True if the limit is global rather than for the route)
+def rateLimitOf(error):
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        retryAfter = float(headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        retryAfter = 1.0
+    isGlobal = str(headers.get("X-RateLimit-Global", "")).lower() == "true" or "global" in str(getattr(error, "text", "")).lower()
+    return retryAfter, isGlobal
+
+#Class that sends DMs with bounded concurrency.
+#Every send takes a token from a global bucket (Discord allows 50 requests a second per bot) and from a per-user route bucket
+#(sends to one DM channel are limited to 5 every 5 seconds). A 429 blocks the bucket it came from for the response's Retry-After.
+#DM channels are kept in a ChannelCache so a message to a user we've messaged before is a single request, and can be warmed ahead of time with prefetch().
+#Users can be given as discord.Users or as ids, ids are only turned into a discord.User with <resolveUser> when a DM channel has to be opened.
+#Members: <resolveUser : coroutine function(int) -> discord.User> <sent : int> <failed : int> <rateLimited : int> <latencies : deque(float)> <channels : ChannelCache>
+class Dispatcher:
+    def __init__(self, concurrency=10, globalRate=50, routeRate=1, routeBurst=5, maxRoutes=10000, cacheSize=5000, resolveUser=None):
+        self.concurrency = concurrency
+        self.resolveUser = resolveUser
+        self.globalBucket = TokenBucket(globalRate, globalRate)
+        self.routeRate = routeRate
+        self.routeBurst = routeBurst
+        self.maxRoutes = maxRoutes
+        self.routes = collections.OrderedDict() #user id -> TokenBucket, least recently used first
+
+        self.sent = 0
+        self.failed = 0
+        self.rateLimited = 0
+        self.latencies = collections.deque(maxlen=1000) #seconds each of the most recent sends took
+        self.channels = ChannelCache(cacheSize)
+        self._prefetching = {} #user id -> task opening their DM channel
+
+        self._semaphore = None
+
+    def _routeBucket(self, userId):
+        bucket = self.routes.get(userId)
+        if bucket == None:
+            bucket = TokenBucket(self.routeRate, self.routeBurst)
+            self.routes[userId] = bucket
+
+            #drop idle buckets for users we haven't messaged in a while
+            while len(self.routes) > self.maxRoutes and self.routes[next(iter(self.routes))].isIdle():
+                self.routes.popitem(last=False)
+        else:
+            self.routes.move_to_end(userId)
+        return bucket
+
+    #Sends <content> to <user> as a DM. A send Discord answers with a 429 is tried once more after the block it asked for.
+    #Parameters: <user : discord.User or int> <content : str>
+    #Returns: True if the message was sent
+    async def send(self, user, content):
+        if self._semaphore == None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+
+        userId = userIdOf(user)
+        for attempt in range(2):
+            route = self._routeBucket(userId)
+            #wait on the user's own route before taking a slot, so a burst of DMs to one user can't hold every slot while it sleeps
+            await route.acquire()
+            async with self._semaphore:
+                await self.globalBucket.acquire()
+
+                startTime = time.monotonic()
+                try:
+                    channel = await self.getChannel(user)
+                    await channel.send(content)
+                except discord.HTTPException as error:
+                    if error.status in (403, 404): #user blocked DMs or the channel is gone, open a new one next time
+                        self.channels.evict(userId)
+                    if error.status == 429:
+                        self.rateLimited += 1
+                        METRICS.inc("dm_rate_limited_total")
+                        retryAfter, isGlobal = rateLimitOf(error)
+                        bucket = self.globalBucket if isGlobal else route
+                        bucket.blockedUntil = time.monotonic() + retryAfter
+                        if attempt == 0: #the buckets hold the retry back until the block is over
+                            logging.debug("Rate limited messaging %s, retrying in %.1f seconds.", user, retryAfter, extra={"user": userId})
+                            continue
+                    return self._failed(user, startTime)
+                except Exception:
+                    return self._failed(user, startTime)
+
+                latency = time.monotonic() - startTime
+                self.latencies.append(latency)
+                self.sent += 1
+                METRICS.inc("dm_sent_total")
+                METRICS.observe("dm_send_seconds", latency)
+                logging.debug("Messaged %s in %.3f seconds.", user, latency, extra={"user": userId, "latency": latency})
+                return True
+
+    #Parameters: <user : discord.User or int>
+    #Returns: the DM channel for <user>, from the cache if possible
+    async def getChannel(self, user):
+        userId = userIdOf(user)
+        channel = self.channels.get(userId)
+        if channel != None:
+            return channel
+
+        task = self._prefetching.get(userId)
+        if task != None: #a prefetch is already opening this channel
+            channel = await task
+            if channel != None:
+                return channel
+
+        channel = await self._openChannel(user)
+        self.channels.put(userId, channel)
+        return channel
+
+    async def _openChannel(self, user):
+        if isinstance(user, int):
+            userId = user
+            user = await self.resolveUser(userId)
+            if user == None:
+                raise LookupError(f"user {userId} could not be found")
+        return await user.create_dm()
+
+    #Opens DM channels for <users> in the background so their next message only needs one request
+    #Parameters: <users : [discord.User or int]>
+    def prefetch(self, users):
+        for user in users:
+            userId = userIdOf(user)
+            if userId not in self.channels and userId not in self._prefetching:
+                self._prefetching[userId] = asyncio.ensure_future(self._prefetch(user))
+
+    async def _prefetch(self, user):
+        userId = userIdOf(user)
+        try:
+            await self.globalBucket.acquire()
+            channel = await self._openChannel(user)
+            self.channels.put(userId, channel)
+            return channel
+        except Exception:
+            logging.debug("Could not open a DM channel for %s.", user, extra={"user": userId})
+        finally:
+            del self._prefetching[userId]
+
+    def _failed(self, user, startTime):
+        latency = time.monotonic() - startTime
+        self.latencies.append(latency)
+        self.failed += 1
+        METRICS.inc("dm_failed_total")
+        METRICS.observe("dm_send_seconds", latency)
+        logging.error("Could not message %s.", user, extra={"user": userIdOf(user)})
+        return False
+
+    #Sends every (user, content) pair in <messages> concurrently
+    #Parameters: <messages : [(discord.User or int, str)]>
+    #Returns: a list of True/False for each message in order
+    async def fanout(self, messages):
+        if len(messages) == 0:
+            return []
+
+        startTime = time.monotonic()
+        results = await asyncio.gather(*[self.send(user, content) for user, content in messages])
+        logging.info("Sent %d/%d DMs in %.3f seconds.", results.count(True), len(results), time.monotonic() - startTime)
+        return results
+
+    #Returns: the average latency in seconds of the recent sends
+    def averageLatency(self):
+        if len(self.latencies) == 0:
+            return 0.0
+        return sum(self.latencies) / len(self.latencies)
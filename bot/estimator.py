@@ -0,0 +1,149 @@
+"""
+Animal Crossing New Horizons Island Queue Discord Bot
+Author: Marshall Jankovsky
+github.com/marshalltj/island-queue-bot
+
+Version: 2.0.0
+
+estimator.py contains streaming estimators for how long visitors stay on an island, used to tell people in line how long they'll wait.
+Each takes O(1) time and memory per visitor, no history of visits is kept.
+"""
+
+import math
+
+MIN_SAMPLES = 3 #visits an island needs before it gives estimates
+
+#Class for an exponentially weighted moving average, recent values count for more so estimates follow an island as it speeds up or slows down
+#Members: <alpha : float> weight of each new value <value : float> <count : int>
+class Ewma:
+    def __init__(self, alpha=0.2):
+        self.alpha = alpha
+        self.value = None
+        self.count = 0
+
+    def update(self, x):
+        self.count += 1
+        if self.value == None:
+            self.value = x
+        else:
+            self.value += self.alpha * (x - self.value)
+
+#Class that estimates the <p> quantile of a stream with the P-square algorithm (Jain & Chlamtac 1985) using five markers
+#Members: <p : float> <count : int> <heights : [float]> marker values <positions : [int]> <desired : [float]> desired marker positions
+class P2Quantile:
+    def __init__(self, p):
+        self.p = p
+        self.count = 0
+        self.heights = []
+        self.positions = [1, 2, 3, 4, 5]
+        self.desired = [1, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5]
+        self._increments = [0, p / 2, p, (1 + p) / 2, 1]
+
+    def update(self, x):
+        self.count += 1
+        heights = self.heights
+        if self.count <= 5:
+            heights.append(x)
+            heights.sort()
+            return
+
+        #find the cell x falls in, stretching the outer markers if it's a new min or max
+        if x < heights[0]:
+            heights[0] = x
+            cell = 0
+        elif x >= heights[4]:
+            heights[4] = x
+            cell = 3
+        else:
+            cell = 0
+            while x >= heights[cell + 1]:
+                cell += 1
+
+        for i in range(cell + 1, 5):
+            self.positions[i] += 1
+        for i in range(5):
+            self.desired[i] += self._increments[i]
+
+        #move the middle markers towards where they should be
+        positions = self.positions
+        for i in range(1, 4):
+            offset = self.desired[i] - positions[i]
+            if (offset >= 1 and positions[i + 1] - positions[i] > 1) or (offset <= -1 and positions[i - 1] - positions[i] < -1):
+                step = 1 if offset > 0 else -1
+                height = self._parabolic(i, step)
+                if not heights[i - 1] < height < heights[i + 1]:
+                    height = heights[i] + step * (heights[i + step] - heights[i]) / (positions[i + step] - positions[i])
+                heights[i] = height
+                positions[i] += step
+
+    def _parabolic(self, i, step):
+        heights = self.heights
+        positions = self.positions
+        return heights[i] + step / (positions[i + 1] - positions[i - 1]) * (
+            (positions[i] - positions[i - 1] + step) * (heights[i + 1] - heights[i]) / (positions[i + 1] - positions[i]) +
+            (positions[i + 1] - positions[i] - step) * (heights[i] - heights[i - 1]) / (positions[i] - positions[i - 1])
+        )
+
+    #Returns: the estimated quantile, or None if nothing was seen
+    def value(self):
+        if self.count == 0:
+            return None
+        if self.count <= 5:
+            return self.heights[round(self.p * (len(self.heights) - 1))]
+        return self.heights[2]
+
+#Class that tracks how long visitors stay once they're let on an island and how often they leave
+#Members: <mean : Ewma> <high : P2Quantile> 90th percentile <gaps : Ewma> seconds between departures <served : int> <lastDeparture : float>
+class DwellStats:
+    def __init__(self):
+        self.mean = Ewma()
+        self.high = P2Quantile(0.9)
+        self.gaps = Ewma()
+        self.served = 0
+        self.lastDeparture = None
+
+    #Records a visitor leaving at <now> after <seconds> on the island
+    #Parameters: <seconds : float> <now : float (time.monotonic())>
+    def record(self, seconds, now):
+        self.mean.update(seconds)
+        self.high.update(seconds)
+        if self.lastDeparture != None:
+            self.gaps.update(now - self.lastDeparture)
+        self.lastDeparture = now
+        self.served += 1
+
+    #Estimates how long the visitor at <position> will wait for a spot when <queueSize> visitors are let on at once.
+    #Each spot frees up about once per average stay, so the wait is the spots that need to free up ahead of them over the spots there are.
+    #Parameters: <position : int> 0-indexed position in the queue <queueSize : int>
+    #Returns: a tuple of (expected seconds, seconds at the 90th percentile stay), or None if there aren't enough visits to tell
+    def estimateWait(self, position, queueSize):
+        if self.served < MIN_SAMPLES or queueSize == None or queueSize < 1:
+            return None
+        if position < queueSize:
+            return 0.0, 0.0
+
+        ahead = position - queueSize + 1
+        return ahead * self.mean.value / queueSize, ahead * max(self.high.value(), self.mean.value) / queueSize
+
+    #Parameters: <now : float (time.monotonic())>
+    #Returns: visitors served an hour going by the recent gaps between departures, falling as the current gap grows past them
+    def throughput(self, now):
+        if self.gaps.value == None:
+            return 0.0
+        gap = max(self.gaps.value, now - self.lastDeparture)
+        if gap <= 0:
+            return 0.0
+        return 3600 / gap
+
+#Parameters: <estimate : (float, float)> from DwellStats.estimateWait()
+#Returns: the estimate in words, e.g. "about 10 minutes (up to 15)"
+def formatWait(estimate):
+    expected, high = estimate
+    if high <= 0:
+        return "no wait"
+    expected = max(1, math.ceil(expected / 60))
+    high = max(expected, math.ceil(high / 60))
+    unit = "minute" if expected == 1 else "minutes"
+    if high == expected:
+        return f"about {expected} {unit}"
+    return f"about {expected} {unit} (up to {high})"
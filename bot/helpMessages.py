@@ -23,9 +23,12 @@ MENU="```Island Queue Bot" + \
 "\n  dodo      Get the Dodo code for an island resent to you" + \
 "\nGeneral Commands:" + \
 "\n  list      List info about an island or all islands" + \
+"\n  prices    Show turnip price trends for the server" + \
 "\nCommands for Server Admins:" + \
 "\n  channel   Set the channels the bot broadcasts msgs to" + \
 "\n  timeout   Set the time a user is allowed on an island" + \
+"\n  board     Turn live-updating queue boards on or off" + \
+"\n  history   Show visits to the server's islands" + \
 f"\n\nUse {COMMAND_PREFIX}help <command> for more info on a command.\n\nVisit github.com/marshalltj/island-queue-bot for additional documentaion." + \
 "```"
 
@@ -73,8 +76,14 @@ f"\n\nUsage: {COMMAND_PREFIX}dodo <island ID>" + \
 "```"
 
 LIST="```Listing Information about Islands:" + \
-f"\n\nUsage: {COMMAND_PREFIX}islands <island id (Optional)>" + \
-"\n\nPrints all open islands, their owners, bell price, and number of users in the queue. If an <island id> is provided, prints information about the island in a header then lists the current users in the queue and how many trips they plan to take. Users that are currently allowed on the island will be framed with formatting along with the amount of time they've been allowed on the island." + \
+f"\n\nUsage: {COMMAND_PREFIX}list <island id/'all' (Optional)> <page (Optional)>" + \
+"\n\nPrints all open islands, their owners, bell price, and number of users in the queue. If an <island id> is provided, prints information about the island in a header then lists the current users in the queue and how many trips they plan to take. Users that are currently allowed on the island will be framed with formatting along with the amount of time they've been allowed on the island. Long listings are split into pages, use <page> to see the rest." + \
+"```"
+
+PRICES="```Turnip Price Trends:" + \
+f"\n\nUsage: {COMMAND_PREFIX}prices" + \
+"\n\nRestrictions: This command must be called in a server." + \
+f"\n\nShows the turnip prices islands in this server were created or updated with: the median and spread of prices, the average price on each day of the week and the hour (UTC) prices have been highest. Prices are saved whenever {COMMAND_PREFIX}create or {COMMAND_PREFIX}update price is given one." + \
 "```"
 
 CHANNEL="```Setting Broadcast Channels:" + \
@@ -86,5 +95,17 @@ f"\n\nUsage: {COMMAND_PREFIX}channel <'turnip'/'general'>" + \
 TIMEOUT="```Seting the User Timeout:" + \
 f"\n\nUsage: {COMMAND_PREFIX}timeout <minutes>" + \
 "\n\nRestrictions: Only server admins can user this command." + \
-"\n\nSets the amount of time users are allowed on an island before they are automatically removed from the queue. Deafulted to 30 minutes. Users are removed every 5 minutes so it can be up to 5 minutes passed <minutes> until they are actually removed." + \
-"```"
\ No newline at end of file
+"\n\nSets the amount of time users are allowed on an island before they are automatically removed from the queue. Deafulted to 30 minutes. Users are removed as soon as <minutes> have passed since they were messaged the Dodo code." + \
+"```"
+
+BOARD="```Live Queue Boards:" + \
+f"\n\nUsage: {COMMAND_PREFIX}board <'on'/'off'>" + \
+"\n\nRestrictions: Only server admins can user this command." + \
+f"\n\nWhen turned on, every island opened in this server gets a pinned message in its broadcast channel listing the queue. The bot edits the message every few seconds while the queue changes, so users don't need to keep using {COMMAND_PREFIX}list to check their position." + \
+"```"
+
+HISTORY="```Visit History:" + \
+f"\n\nUsage: {COMMAND_PREFIX}history" + \
+"\n\nRestrictions: Only server admins can user this command." + \
+"\n\nShows how many users joined, were let on, left and timed out of this server's island queues over the last 24 hours and 7 days, how long visitors stayed on average, and the busiest hour of the last day." + \
+"```"
@@ -0,0 +1,210 @@
+"""
+Animal Crossing New Horizons Island Queue Discord Bot
+Author: Marshall Jankovsky
+github.com/marshalltj/island-queue-bot
+
+Version: 2.0.0
+
+history.py contains a class HistoryStore that keeps a history of visits (joins, admits, leaves, timeouts and island closes) in a
+local SQLite file, along with hourly and daily per-guild rollups that are updated as events are written so summaries never scan raw events.
+"""
+
+import asyncio
+import concurrent.futures
+import logging
+import sqlite3
+import time
+
+KINDS = ("join", "admit", "leave", "timeout", "close")
+PERIODS = (("hour", 3600), ("day", 86400)) #rollup period names and their length in seconds, buckets are aligned to UTC
+
+#Class that holds the totals of one or more rollup rows
+#Members: <joins : int> <admits : int> <leaves : int> <timeouts : int> <closes : int> <dwellSum : float> <dwellCount : int>
+class Totals:
+    def __init__(self, row=(0, 0, 0, 0, 0, 0.0, 0)):
+        self.joins, self.admits, self.leaves, self.timeouts, self.closes, self.dwellSum, self.dwellCount = row
+
+    def add(self, other):
+        self.joins += other.joins
+        self.admits += other.admits
+        self.leaves += other.leaves
+        self.timeouts += other.timeouts
+        self.closes += other.closes
+        self.dwellSum += other.dwellSum
+        self.dwellCount += other.dwellCount
+
+    #Returns: the average seconds an admitted visitor stayed, or None if nobody left
+    def averageDwell(self):
+        if self.dwellCount == 0:
+            return None
+        return self.dwellSum / self.dwellCount
+
+    #Returns: the totals in words for the history command
+    def summarize(self):
+        text = f"{self.joins} joins, {self.admits} let on, {self.leaves} left, {self.timeouts} timed out, {self.closes} islands closed"
+        if self.dwellCount > 0:
+            text += f", {self.averageDwell() / 60:.0f} minute average stay"
+        return text
+
+#Class that buffers visit events on the event loop and writes them in batches on a single background thread.
+#Each batch inserts the raw events and adds their counts to the Rollups rows for their hour and day in the same transaction.
+#The file is in WAL mode so every cluster process on a host can share it.
+#Members: <path : str> <delay : float> <batchSize : int> <maxPending : int> <pending : [tuple]> <written : int> <dropped : int> <failures : int> <lastFlushLatency : float>
+class HistoryStore:
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS Events ("
+        "Id INTEGER PRIMARY KEY, Kind TEXT NOT NULL, Island TEXT NOT NULL, Guild INTEGER NOT NULL, User INTEGER, Trips INTEGER, Dwell REAL, At REAL NOT NULL)",
+        "CREATE TABLE IF NOT EXISTS Rollups ("
+        "Guild INTEGER NOT NULL, Period TEXT NOT NULL, Bucket INTEGER NOT NULL, "
+        "Joins INTEGER NOT NULL, Admits INTEGER NOT NULL, Leaves INTEGER NOT NULL, Timeouts INTEGER NOT NULL, Closes INTEGER NOT NULL, "
+        "DwellSum REAL NOT NULL, DwellCount INTEGER NOT NULL, PRIMARY KEY (Guild, Period, Bucket)) WITHOUT ROWID"
+    )
+
+    UPSERT = (
+        "INSERT INTO Rollups VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT (Guild, Period, Bucket) DO UPDATE SET "
+        "Joins = Joins + excluded.Joins, Admits = Admits + excluded.Admits, Leaves = Leaves + excluded.Leaves, "
+        "Timeouts = Timeouts + excluded.Timeouts, Closes = Closes + excluded.Closes, "
+        "DwellSum = DwellSum + excluded.DwellSum, DwellCount = DwellCount + excluded.DwellCount"
+    )
+
+    def __init__(self, path, delay=2.0, batchSize=500, maxPending=100000, timeout=5.0):
+        self.path = path
+        self.delay = delay #seconds to wait for more events before writing
+        self.batchSize = batchSize #write straight away once this many events are waiting
+        self.maxPending = maxPending #events kept while writes are failing, the oldest are dropped past this
+        self.pending = []
+
+        self.written = 0
+        self.dropped = 0
+        self.failures = 0
+        self.lastFlushLatency = 0.0
+
+        #sqlite connections belong to one thread, so every statement runs on this executor's only thread
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="history")
+        self._connection = self._executor.submit(self._connect, timeout).result()
+        self._task = None
+        self._sleeping = False #True while _task is still waiting out the delay and hasn't started writing
+        self._lock = asyncio.Lock()
+
+    def _connect(self, timeout):
+        #autocommit mode, each batch is its own BEGIN IMMEDIATE transaction
+        connection = sqlite3.connect(self.path, timeout=timeout, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        for statement in self.SCHEMA:
+            connection.execute(statement)
+        return connection
+
+    #Queues an event and makes sure it is written soon. Never blocks.
+    #Parameters: <kind : str> one of KINDS <islandId : str> <guildId : int> <userId : int> <trips : int> <dwell : float> seconds an admitted visitor stayed
+    def record(self, kind, islandId, guildId, userId=None, trips=None, dwell=None):
+        self.pending.append((kind, islandId, guildId, userId, trips, dwell, time.time()))
+        if len(self.pending) > self.maxPending:
+            del self.pending[:len(self.pending) - self.maxPending]
+            self.dropped += 1
+
+        if len(self.pending) >= self.batchSize:
+            if self._task == None or self._task.done():
+                self._task = asyncio.ensure_future(self.flush())
+        elif self._task == None or self._task.done():
+            self._sleeping = True
+            self._task = asyncio.ensure_future(self._flushLater())
+
+    #Whoever schedules this sets _sleeping first, so close() also cancels a delayed flush that hasn't started running yet
+    async def _flushLater(self):
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self._sleeping = False
+        await self.flush()
+
+    #Writes every queued event now
+    async def flush(self):
+        async with self._lock:
+            if len(self.pending) == 0:
+                return
+
+            batch = self.pending
+            self.pending = []
+            startTime = time.monotonic()
+            try:
+                await asyncio.get_running_loop().run_in_executor(self._executor, self._write, batch)
+                self.written += len(batch)
+            except Exception:
+                self.failures += 1
+                logging.exception("Failed to write %d history events, requeueing.", len(batch))
+                self.pending = (batch + self.pending)[-self.maxPending:]
+            self.lastFlushLatency = time.monotonic() - startTime
+
+        if len(self.pending) > 0 and (self._task == None or self._task.done() or self._task is asyncio.current_task()):
+            self._sleeping = True
+            self._task = asyncio.ensure_future(self._flushLater())
+
+    #Inserts <batch> and folds it into the rollups in one transaction. Runs on the executor thread.
+    def _write(self, batch):
+        rollups = {}
+        for kind, islandId, guildId, userId, trips, dwell, at in batch:
+            for period, length in PERIODS:
+                key = (guildId, period, int(at // length) * length)
+                counts = rollups.get(key)
+                if counts == None:
+                    counts = [0, 0, 0, 0, 0, 0.0, 0]
+                    rollups[key] = counts
+                counts[KINDS.index(kind)] += 1
+                if dwell != None:
+                    counts[5] += dwell
+                    counts[6] += 1
+
+        connection = self._connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.executemany("INSERT INTO Events (Kind, Island, Guild, User, Trips, Dwell, At) VALUES (?, ?, ?, ?, ?, ?, ?)", batch)
+            connection.executemany(self.UPSERT, [key + tuple(counts) for key, counts in rollups.items()])
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+    #Adds up the rollups for <guildId> over the last <hours> hours and <days> days. Reads at most <hours> + <days> + 2 rows by primary key.
+    #Events still waiting to be written are flushed first so the summary is current.
+    #Parameters: <guildId : int> <hours : int> <days : int>
+    #Returns: a tuple of (Totals for the hours, Totals for the days, [(hour start in wall clock seconds, Totals)] for each hour with events)
+    async def summary(self, guildId, hours=24, days=7):
+        await self.flush()
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self._summary, guildId, hours, days, time.time())
+
+    def _summary(self, guildId, hours, days, now):
+        query = "SELECT Bucket, Joins, Admits, Leaves, Timeouts, Closes, DwellSum, DwellCount FROM Rollups WHERE Guild = ? AND Period = ? AND Bucket >= ?"
+
+        hourly = []
+        recent = Totals()
+        for row in self._connection.execute(query, (guildId, "hour", int(now // 3600 - hours + 1) * 3600)):
+            totals = Totals(row[1:])
+            recent.add(totals)
+            hourly.append((row[0], totals))
+
+        daily = Totals()
+        for row in self._connection.execute(query, (guildId, "day", int(now // 86400 - days + 1) * 86400)):
+            daily.add(Totals(row[1:]))
+
+        return recent, daily, hourly
+
+    #Cancels the delayed flush, writes whatever is still queued and closes the file, called on shutdown.
+    #A flush that is already writing is waited on for up to <timeout> seconds, cancelling it would lose the batch it took from pending.
+    #Parameters: <timeout : float>
+    async def close(self, timeout=10.0):
+        if self._task != None and not self._task.done():
+            if self._sleeping:
+                self._task.cancel()
+            else:
+                try:
+                    await asyncio.wait_for(asyncio.shield(self._task), timeout)
+                except asyncio.TimeoutError:
+                    logging.error("History flush still running after %s seconds on shutdown.", timeout)
+        self._task = None
+
+        await self.flush()
+        if self._task != None:
+            self._task.cancel()
+        self._executor.submit(self._connection.close).result()
+        self._executor.shutdown()
@@ -0,0 +1,102 @@
+"""
+Animal Crossing New Horizons Island Queue Discord Bot
+Author: Marshall Jankovsky
+github.com/marshalltj/island-queue-bot
+
+Version: 2.0.0
+
+idAllocator.py contains a class IdAllocator that hands out unique island IDs in constant time.
+"""
+
+import math
+import random
+
+#Raised when every ID in an IdAllocator's range is in use
+class IdPoolExhausted(Exception):
+    pass
+
+#Class that allocates unique island IDs from the range [start, stop) formatted as <prefix> followed by a zero padded <width> digit number.
+#Fresh IDs are walked in a shuffled order using an affine permutation (a*i + b mod size) so no table of the whole range is needed.
+#Released IDs go to a free pool that is only drawn from once the fresh IDs run out, so a closed island's ID isn't immediately reused.
+#Members: <width : int> <prefix : str> <start : int> <stop : int> <inUse : {str}>
+class IdAllocator:
+    def __init__(self, width=4, prefix="", start=None, stop=None):
+        self.width = width
+        self.prefix = prefix
+        self.start = 1 if start == None else start
+        self.stop = 10**width if stop == None else stop
+        self.inUse = set()
+
+        if self.start < 0 or self.stop > 10**width or self.start >= self.stop:
+            raise ValueError(f"Invalid island ID range [{self.start}, {self.stop}) for width {width}.")
+
+        self._size = self.stop - self.start
+        self._multiplier = self._pickMultiplier()
+        self._inverse = pow(self._multiplier, -1, self._size) #undoes the multiplier to find where an ID falls in the walk
+        self._offset = random.randrange(self._size)
+        self._next = 0      #how many fresh IDs have been handed out
+        self._freePool = [] #released IDs waiting to be reused
+
+    #Returns: a unique island ID as a str
+    def allocate(self):
+        while self._next < self._size:
+            islandId = self._format(self.start + (self._multiplier * self._next + self._offset) % self._size)
+            self._next += 1
+            if islandId not in self.inUse: #skip IDs that were reserved out of order
+                self.inUse.add(islandId)
+                return islandId
+
+        while len(self._freePool) > 0:
+            islandId = self._freePool.pop()
+            if islandId not in self.inUse:
+                self.inUse.add(islandId)
+                return islandId
+
+        raise IdPoolExhausted(f"All {self._size} island IDs are in use.")
+
+    #Returns an <islandId> to the free pool. IDs the fresh walk hasn't reached yet, e.g. ones reserved after a restart, are left for
+    #the walk to hand out instead so they can't be handed out twice.
+    #Parameters: <islandId : str>
+    def release(self, islandId):
+        if islandId in self.inUse:
+            self.inUse.remove(islandId)
+            if self._walkIndex(islandId) < self._next:
+                self._freePool.append(islandId)
+
+    #Marks an <islandId> as in use without allocating it, e.g. when restoring islands after a restart
+    #Parameters: <islandId : str>
+    #Returns: True if the ID belongs to this allocator and wasn't already in use
+    def reserve(self, islandId):
+        if not self.owns(islandId) or islandId in self.inUse:
+            return False
+
+        self.inUse.add(islandId)
+        if islandId in self._freePool:
+            self._freePool.remove(islandId)
+        return True
+
+    #Parameters: <islandId : str>
+    #Returns: True if <islandId> falls within this allocator's prefix and range
+    def owns(self, islandId):
+        digits = islandId[len(self.prefix):]
+        if not islandId.startswith(self.prefix) or len(digits) != self.width or not digits.isdigit():
+            return False
+        return self.start <= int(digits) < self.stop
+
+    def __len__(self):
+        return len(self.inUse)
+
+    #Returns: the step of the fresh walk that hands out <islandId>
+    def _walkIndex(self, islandId):
+        return (int(islandId[len(self.prefix):]) - self.start - self._offset) * self._inverse % self._size
+
+    def _format(self, number):
+        return f"{self.prefix}{number:0{self.width}}"
+
+    def _pickMultiplier(self):
+        if self._size == 1:
+            return 1
+        while True:
+            multiplier = random.randrange(1, self._size)
+            if math.gcd(multiplier, self._size) == 1:
+                return multiplier
@@ -8,12 +8,19 @@ Version: 2.0.0
 island.py contains a class Island that tracks information about an island queue. 
 """
 
-import datetime
+import asyncio
+import time
+from estimator import DwellStats
+from metrics import METRICS
 from visitor import Visitor
+from visitorQueue import VisitorQueue
 
-#Class that contains information about an island queue.
-#Members: <owner : discord.User> <price : int>  <islandId : str> <guild : discord.Guild> <queueSize : int> <code : str> <timestamp : datetime.datetime> <visitors : [Visitor]>
+#Class that contains information about an island queue. The owner and guild are kept as discord objects since there is only one
+#island per owner and the guild is already held by the Server, the per-user cost is in the Visitors.
+#Members: <owner : discord.User> <price : int>  <islandId : str> <guild : discord.Guild> <queueSize : int> <code : str> <timestamp : float (time.monotonic())> <visitors : VisitorQueue> <server : Server> <version : int> <pageCache : tuple> <lock : asyncio.Lock> <dwell : DwellStats>
 class Island:
+    __slots__ = ("owner", "price", "islandId", "guild", "queueSize", "code", "timestamp", "visitors", "server", "version", "pageCache", "lock", "dwell")
+
     def __init__(self, owner, price, islandId, guild):
         self.owner = owner
         self.price = price
@@ -21,30 +28,94 @@ class Island:
         self.guild = guild
         self.queueSize = None
         self.code = None
-        self.timestamp = datetime.datetime.now()
-        self.visitors = []
+        self.timestamp = time.monotonic()
+        self.visitors = VisitorQueue()
+        self.server = None #set by Registry.addIsland
+        self.version = 0 #bumped on every change that shows up in a listing
+        self.pageCache = None #rendered listing pages, see listing.py
+        self.lock = asyncio.Lock() #held while a command checks and changes the queue, never across a Discord call
+        self.dwell = DwellStats() #how long admitted visitors stay, for wait estimates
+
+    #Marks the island (and its Server's island list) as changed so cached listings are re-rendered
+    def touch(self):
+        self.version += 1
+        if self.server != None:
+            self.server.touch()
 
     def getNumVisitors(self):
         return len(self.visitors)
 
-    def addVisitor(self, visitor, trips):
-        self.visitors.append(Visitor(visitor, trips))
+    #Adds a Visitor for <userId> to the back of the queue
+    #Parameters: <userId : int> <trips : int>
+    #Returns: the 0-indexed position of the new Visitor
+    def addVisitor(self, userId, trips):
+        self.touch()
+        return self.visitors.append(Visitor(userId, trips))
 
-    def removeUser(self, user):
-        for visitor in self.visitors:
-            if visitor.user == user:
-                self.visitors.remove(visitor)
-                return True
-        return False
+    #Removes <userId> from the queue and admits the next Visitors in line if a spot opened up
+    #Parameters: <userId : int>
+    #Returns: a tuple of (0-indexed position the user was removed from or -1 if not found, newly admitted Visitors)
+    def removeUser(self, userId):
+        visitor = self.visitors.get(userId)
+        numAdmitted = len(self.visitors.admitted)
+        position = self.visitors.remove(userId)
+        if position == -1:
+            return -1, []
+        if position < numAdmitted:
+            self.recordDeparture(visitor)
+        self.touch()
+        return position, self.visitors.promote()
 
+    #Removes the Visitor at <idx> and admits the next Visitors in line if a spot opened up
+    #Parameters: <idx : int>
+    #Returns: a tuple of (removed Visitor, newly admitted Visitors)
     def popVisitor(self, idx):
-        return self.visitors.pop(idx)
+        numAdmitted = len(self.visitors.admitted)
+        visitor = self.visitors.pop(idx)
+        if idx < numAdmitted:
+            self.recordDeparture(visitor)
+        self.touch()
+        return visitor, self.visitors.promote()
+
+    #Records how long an admitted <visitor> who just left was on the island
+    #Parameters: <visitor : Visitor>
+    def recordDeparture(self, visitor):
+        now = time.monotonic()
+        self.dwell.record(now - visitor.timestamp, now)
+        METRICS.inc("visitors_served_total")
+
+    #Parameters: <position : int> 0-indexed, defaults to the back of the line
+    #Returns: the (expected, 90th percentile) seconds until the visitor at <position> is let on, or None if there isn't enough history
+    def estimateWait(self, position=None):
+        if position == None:
+            position = len(self.visitors)
+        return self.dwell.estimateWait(position, self.queueSize)
+
+    #Returns: visitors let on and gone again per hour, recently
+    def getThroughput(self):
+        return self.dwell.throughput(time.monotonic())
 
-    def getUserPositionInQueue(self, user):
-        for i in range(self.getNumVisitors()):
-            if self.visitors[i].user == user:
-                return i
-        return -1
+    #Parameters: <userId : int>
+    #Returns: the 0-indexed position of <userId> in the queue or -1 if not found
+    def getUserPositionInQueue(self, userId):
+        return self.visitors.position(userId)
+
+    #Changes how many users are allowed on the island at once
+    #Parameters: <queueSize : int>
+    #Returns: a tuple of (newly admitted Visitors, Visitors that are no longer allowed on)
+    def setQueueSize(self, queueSize):
+        self.queueSize = queueSize
+        self.touch()
+        return self.visitors.setCapacity(queueSize)
+
+    def setPrice(self, price):
+        self.price = price
+        self.touch()
 
     def getAge(self):
-        return divmod((datetime.datetime.now() - self.timestamp).seconds, 3600)[0]
\ No newline at end of file
+        return int((time.monotonic() - self.timestamp) // 3600)
+
+    #Parameters: <maxAge : int> hours an island is allowed to stay open
+    #Returns: the time.monotonic() deadline for this island to be closed
+    def getDeadline(self, maxAge):
+        return self.timestamp + maxAge * 3600
\ No newline at end of file
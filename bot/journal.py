@@ -0,0 +1,268 @@
+"""
+Animal Crossing New Horizons Island Queue Discord Bot
+Author: Marshall Jankovsky
+github.com/marshalltj/island-queue-bot
+
+Version: 2.0.0
+
+journal.py contains a class Journal that records every island queue mutation to an append-only log so open queues survive a crash or restart.
+"""
+
+import asyncio
+import concurrent.futures
+import json
+import logging
+import os
+import time
+
+#Journal state is a plain dict so it can be replayed without discord objects:
+#{islandId : {"guild" : int, "owner" : int, "price" : int, "code" : str, "queueSize" : int, "created" : float, "visitors" : {str(userId) : [trips, timestamp]}, "board" : [channelId, messageId]}}
+#"board" is None for islands without a live board, the queue store doesn't keep it. Timestamps are stored as wall clock seconds since time.monotonic() doesn't carry across restarts. Visitor dicts keep queue order.
+
+#Converts a time.monotonic() <timestamp> to wall clock seconds
+def toWallClock(timestamp):
+    return time.time() - (time.monotonic() - timestamp)
+
+#Converts wall clock seconds back to a time.monotonic() timestamp
+def fromWallClock(timestamp):
+    return time.monotonic() - (time.time() - timestamp)
+
+#Applies one journal <record> to <state>
+#Parameters: <state : {str : dict}> <record : dict>
+def apply(state, record):
+    op = record["op"]
+    islandId = record["id"]
+
+    if op == "create":
+        state[islandId] = {
+            "guild": record["guild"],
+            "owner": record["owner"],
+            "price": record["price"],
+            "code": None,
+            "queueSize": None,
+            "created": record["at"],
+            "visitors": {},
+            "board": None
+        }
+        return
+
+    island = state.get(islandId)
+    if island == None: #island was closed before a snapshot dropped its create record
+        return
+
+    if op == "open":
+        island["code"] = record["code"]
+        island["queueSize"] = record["size"]
+
+    elif op == "join":
+        island["visitors"][str(record["user"])] = [record["trips"], record["at"]]
+
+    elif op == "leave" or op == "remove":
+        island["visitors"].pop(str(record["user"]), None)
+
+    elif op == "admit":
+        visitor = island["visitors"].get(str(record["user"]))
+        if visitor != None:
+            visitor[1] = record["at"]
+
+    elif op == "update":
+        for field in ("code", "price", "queueSize"):
+            if field in record:
+                island[field] = record[field]
+
+    elif op == "board":
+        island["board"] = [record["channel"], record["message"]]
+
+    elif op == "close":
+        del state[islandId]
+
+#Parameters: <island : Island> <board : [int, int]> channel and message id of the island's board, see QueueBoards.location()
+#Returns: the journal state dict for a live <island>
+def snapshotIsland(island, board=None):
+    return {
+        "guild": island.guild.id,
+        "owner": island.owner.id,
+        "price": island.price,
+        "code": island.code,
+        "queueSize": island.queueSize,
+        "created": toWallClock(island.timestamp),
+        "visitors": {str(visitor.userId): [visitor.trips, toWallClock(visitor.timestamp)] for visitor in island.visitors},
+        "board": board
+    }
+
+#Class that appends queue mutations to numbered segment files next to a compacted snapshot.
+#A snapshot records the first segment that isn't folded into it, so compaction switches to a new segment, writes the snapshot and then deletes the old segments.
+#Records are group committed: record() only queues the line, and a single writer thread writes and fsyncs everything queued since its
+#last write in one go. The event loop never waits on the disk and a burst of changes costs one fsync rather than one each.
+#A change is durable once the group it went out in is synced, a few milliseconds after it was recorded, so a crash or power loss can lose
+#at most the last group. With <fsync> off, groups are only handed to the OS, which survives the process crashing but not the machine.
+#Members: <directory : str> <fsync : bool> <segment : int> <records : int> <recoveryTime : float> <pending : [str]> <groups : int> <lastSyncLatency : float>
+class Journal:
+    def __init__(self, directory, fsync=True):
+        self.directory = directory
+        self.fsync = fsync #fsync each group of records so they survive power loss as well as crashes
+        self.segment = 0
+        self.records = 0 #records written since the last snapshot
+        self.recoveryTime = 0.0 #seconds load() took
+        self.pending = [] #lines waiting for the writer thread
+        self.groups = 0 #groups written
+        self.lastSyncLatency = 0.0 #seconds the most recent group took to write and sync
+        self._file = None
+        self._task = None
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="journal") #the only thread that writes segments
+
+    def _segmentPath(self, segment):
+        return os.path.join(self.directory, f"journal-{segment:08}.log")
+
+    def _snapshotPath(self):
+        return os.path.join(self.directory, "snapshot.json")
+
+    def _segments(self):
+        segments = []
+        for name in os.listdir(self.directory):
+            if name.startswith("journal-") and name.endswith(".log"):
+                segments.append(int(name[len("journal-"):-len(".log")]))
+        return sorted(segments)
+
+    #Returns: the size in bytes of the snapshot and all journal segments
+    def size(self):
+        total = 0
+        paths = [self._snapshotPath()] + [self._segmentPath(segment) for segment in self._segments()]
+        for path in paths:
+            if os.path.exists(path):
+                total += os.path.getsize(path)
+        return total
+
+    #Reads the snapshot and replays every segment after it, then opens the newest segment for appending
+    #Returns: the recovered state dict
+    def load(self):
+        startTime = time.monotonic()
+        os.makedirs(self.directory, exist_ok=True)
+
+        state = {}
+        firstSegment = 0
+        if os.path.exists(self._snapshotPath()):
+            with open(self._snapshotPath()) as snapshotFile:
+                snapshot = json.load(snapshotFile)
+            state = snapshot["islands"]
+            firstSegment = snapshot["segment"]
+
+        replayed = 0
+        for segment in self._segments():
+            if segment < firstSegment:
+                continue
+            with open(self._segmentPath(segment)) as segmentFile:
+                for line in segmentFile:
+                    try:
+                        record = json.loads(line)
+                    except ValueError: #a crash can leave the last line half written
+                        logging.error("Skipping unreadable journal record in segment %d.", segment)
+                        continue
+                    apply(state, record)
+                    replayed += 1
+
+        self.segment = max(self._segments() + [firstSegment])
+        self.records = replayed
+        self._file = open(self._segmentPath(self.segment), "a")
+        self.recoveryTime = time.monotonic() - startTime
+        return state
+
+    #Queues a mutation to be appended to the current segment in the next group. Never blocks.
+    #Parameters: <op : str> <islandId : str> <fields> the record's other values
+    def record(self, op, islandId, **fields):
+        if self._file == None:
+            return
+
+        fields["op"] = op
+        fields["id"] = islandId
+        self.pending.append(json.dumps(fields, separators=(",", ":")) + "\n")
+        self.records += 1
+
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError: #not on the event loop, e.g. a script editing a journal, so write it straight away
+            self._writeGroup(self._file, self._takePending())
+            return
+        if self._task == None or self._task.done():
+            self._task = asyncio.ensure_future(self._commit())
+
+    def _takePending(self):
+        lines = self.pending
+        self.pending = []
+        return lines
+
+    #Writes groups until nothing is left queued. Records made while one group is being synced go out together in the next.
+    async def _commit(self):
+        loop = asyncio.get_running_loop()
+        while len(self.pending) > 0 and self._file != None:
+            lines = self._takePending()
+            try:
+                await loop.run_in_executor(self._executor, self._writeGroup, self._file, lines)
+            except Exception:
+                #put the group back so it's retried with the next record rather than lost, the replay order stays the same
+                logging.exception("Failed to write %d journal records, retrying with the next change.", len(lines))
+                self.pending = lines + self.pending
+                return
+
+    #Appends <lines> to <segmentFile> and syncs them. Runs on the writer thread.
+    def _writeGroup(self, segmentFile, lines):
+        if len(lines) == 0:
+            return
+
+        startTime = time.monotonic()
+        segmentFile.write("".join(lines))
+        segmentFile.flush()
+        if self.fsync:
+            os.fsync(segmentFile.fileno())
+        self.groups += 1
+        self.lastSyncLatency = time.monotonic() - startTime
+
+    #Writes the queued groups and the segment's last lines, then closes it. Runs on the writer thread.
+    def _closeSegment(self, segmentFile, lines):
+        self._writeGroup(segmentFile, lines)
+        segmentFile.close()
+
+    #Waits until every record made before the call is written, and synced if <fsync> is on
+    async def flush(self):
+        while self._task != None and not self._task.done():
+            await asyncio.shield(self._task)
+        if len(self.pending) > 0 and self._file != None: #a group failed, try it again
+            self._task = asyncio.ensure_future(self._commit())
+            await asyncio.shield(self._task)
+
+    #Folds everything journaled so far into a new snapshot of <state>. The snapshot file is written off the event loop.
+    #Parameters: <state : {str : dict}> built from the live islands at the moment this is called
+    async def compact(self, state):
+        if self._file == None:
+            return
+
+        #new records go to a fresh segment while the snapshot is written. Lines still queued belong to the old segment, the writer thread
+        #runs jobs in order so they land after any group it is already writing and before the old segment is closed.
+        oldFile = self._file
+        lines = self._takePending()
+        self.segment += 1
+        self._file = open(self._segmentPath(self.segment), "a")
+        self.records = 0
+
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self._closeSegment, oldFile, lines)
+        snapshot = {"segment": self.segment, "islands": state}
+        await loop.run_in_executor(None, self._writeSnapshot, snapshot)
+
+    def _writeSnapshot(self, snapshot):
+        tmpPath = self._snapshotPath() + ".tmp"
+        with open(tmpPath, "w") as snapshotFile:
+            json.dump(snapshot, snapshotFile, separators=(",", ":"))
+            snapshotFile.flush()
+            os.fsync(snapshotFile.fileno())
+        os.replace(tmpPath, self._snapshotPath())
+
+        for segment in self._segments():
+            if segment < snapshot["segment"]:
+                os.remove(self._segmentPath(segment))
+
+    #Writes anything still queued and closes the segment, called on shutdown
+    def close(self):
+        if self._file != None:
+            self._executor.submit(self._closeSegment, self._file, self._takePending()).result()
+            self._file = None
@@ -0,0 +1,113 @@
+"""
+Animal Crossing New Horizons Island Queue Discord Bot
+Author: Marshall Jankovsky
+github.com/marshalltj/island-queue-bot
+
+Version: 2.0.0
+
+listing.py renders the pages for the list command. Rendered pages are cached on the Island or Server until its version changes.
+"""
+
+import time
+import helpMessages
+from estimator import formatWait
+
+PAGE_LENGTH = 1500 #characters of listing per page, leaving room under Discord's 2000 character limit for the header and footer
+SEPARATOR = "------------------------------"
+
+#Splits <lines> into pages of at most PAGE_LENGTH characters
+#Parameters: <lines : [str]>
+#Returns: a list of pages, each a list of lines
+def paginate(lines):
+    pages = [[]]
+    length = 0
+    for line in lines:
+        if length + len(line) + 1 > PAGE_LENGTH and len(pages[-1]) > 0:
+            pages.append([])
+            length = 0
+        pages[-1].append(line)
+        length += len(line) + 1
+    return pages
+
+#Adds "page N of M" navigation to <text> when there is more than one page
+#Parameters: <text : str> <page : int> <numPages : int> <target : str> what to pass to the list command to get another page
+def addNavigation(text, page, numPages, target):
+    if numPages <= 1:
+        return text
+    return f"{text}\nPage {page} of {numPages}. Use '{helpMessages.COMMAND_PREFIX}list {target} <page>' to see another page."
+
+#Parameters: <server : Server>
+#Returns: the list of rendered pages listing every island in <server>
+def renderServerPages(server):
+    if server.pageCache != None and server.pageCache[0] == server.version:
+        return server.pageCache[1]
+
+    lines = []
+    for island in server.islands.values():
+        line = f"Owner: {island.owner.name} | ID: {island.islandId}"
+        if island.price != None:
+            line += f" | Bell Price: {island.price}"
+        line += f" | Users in queue: {island.getNumVisitors()}"
+        estimate = island.estimateWait()
+        if estimate != None:
+            line += f" | Wait: {formatWait(estimate)}"
+        lines.append(line)
+
+    header = f"Currently {len(server.islands)} open."
+    footer = f"\nCreate a queue for your own island by using '{helpMessages.COMMAND_PREFIX}create'."
+
+    if len(lines) == 0:
+        pages = [header + footer]
+    else:
+        pages = []
+        for body in paginate(lines):
+            pages.append(
+                header + "\n\n```\n" + "\n".join(body) +
+                f"```\n\nIsland there that isn't open? Tell the owner or an admin to use '{helpMessages.COMMAND_PREFIX}close' to close their island." +
+                footer
+            )
+
+    pages = [addNavigation(text, i + 1, len(pages), "all") for i, text in enumerate(pages)]
+    server.pageCache = (server.version, pages)
+    return pages
+
+#Parameters: <island : Island> <nameOf : function> returns the name to show for a user id, see users.py
+#Returns: the list of rendered pages listing the queue for <island>
+def renderIslandPages(island, nameOf):
+    #admitted users show minutes spent on the island, so those pages also go stale every minute
+    minute = int(time.monotonic() // 60) if len(island.visitors.admitted) > 0 else None
+    key = (island.version, minute)
+    if island.pageCache != None and island.pageCache[0] == key:
+        return island.pageCache[1]
+
+    header = f"Owner: {island.owner.name} | ID: {island.islandId}"
+    if island.price != None:
+        header += f" | Bell Price: {island.price}"
+    header += f" | Users in queue: {island.getNumVisitors()}\n{island.queueSize} users allowed on this island at a time."
+    estimate = island.estimateWait()
+    if estimate != None:
+        header += f"\nWait for anyone joining now: {formatWait(estimate)}. {island.getThroughput():.1f} visitors served an hour."
+
+    lines = []
+    for i, visitor in enumerate(island.visitors):
+        if i == 0 or i == island.queueSize:
+            lines.append(SEPARATOR)
+        line = f"{i + 1}: {nameOf(visitor.userId)}    {visitor.formatTrips()} trips"
+        if island.queueSize != None and i < island.queueSize:
+            line += f"    {visitor.getTimeSpent()} minutes"
+        lines.append(line)
+
+    footer = f"```\n\nUse '{helpMessages.COMMAND_PREFIX}join {island.islandId} <number of trips>' to join this queue."
+    pages = []
+    for body in paginate(lines):
+        pages.append("```" + "\n".join([header] + body) + footer)
+
+    pages = [addNavigation(text, i + 1, len(pages), island.islandId) for i, text in enumerate(pages)]
+    island.pageCache = (key, pages)
+    return pages
+
+#Parameters: <pages : [str]> <page : int> 1-indexed, clamped to the pages available
+#Returns: the text of the requested page
+def getPage(pages, page):
+    page = min(max(page, 1), len(pages))
+    return pages[page - 1]
@@ -0,0 +1,110 @@
+"""
+Animal Crossing New Horizons Island Queue Discord Bot
+Author: Marshall Jankovsky
+github.com/marshalltj/island-queue-bot
+
+Version: 2.0.0
+
+logPipeline.py sets up logging so the event loop only ever puts records on a queue. A background thread formats them as JSON lines
+and writes them to a log file that is rotated by size and age and gzipped.
+
+Pass structured fields through extra, e.g. logging.info("Joined %s", user, extra={"island": islandId, "user": user.id}).
+"""
+
+import gzip
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import shutil
+import time
+
+FIELDS = ("guild", "island", "user", "command", "latency") #extra fields copied into each JSON line when present
+
+#Formatter that writes each record as one JSON object
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record, "%Y-%m-%d %H:%M:%S"),
+            "level": record.levelname,
+            "message": record.getMessage() #%-style arguments are only merged here, on the writer thread
+        }
+        for field in FIELDS:
+            value = getattr(record, field, None)
+            if value != None:
+                entry[field] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+#QueueHandler that never blocks or formats on the calling thread. Records that don't fit in the queue are dropped and counted.
+#Members: <dropped : int>
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    def __init__(self, recordQueue):
+        super().__init__(recordQueue)
+        self.dropped = 0
+
+    #the stock prepare() formats the message here, leave it for the writer thread
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+#QueueListener that can be stopped while the queue is full
+class BlockingStopListener(logging.handlers.QueueListener):
+    #the stock version uses put_nowait, which raises if the bot filled the queue just before shutdown
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+#RotatingFileHandler that also rolls the file over every <interval> seconds and gzips the files it rotates out
+#Members: <interval : float> <rolloverAt : float>
+class RotatingGzipHandler(logging.handlers.RotatingFileHandler):
+    def __init__(self, filename, maxBytes, interval, backupCount):
+        super().__init__(filename, maxBytes=maxBytes, backupCount=backupCount, encoding="utf-8")
+        self.interval = interval
+        self.rolloverAt = time.time() + interval
+        self.namer = lambda name: name + ".gz"
+        self.rotator = compress
+
+    def shouldRollover(self, record):
+        if self.interval > 0 and time.time() >= self.rolloverAt:
+            return True
+        return super().shouldRollover(record)
+
+    def doRollover(self):
+        super().doRollover()
+        self.rolloverAt = time.time() + self.interval
+
+#Gzips <source> into <destination> and removes <source>
+#Parameters: <source : str> <destination : str>
+def compress(source, destination):
+    with open(source, "rb") as sourceFile, gzip.open(destination, "wb") as destinationFile:
+        shutil.copyfileobj(sourceFile, destinationFile)
+    os.remove(source)
+
+#Routes every log record through a queue to a writer thread
+#Parameters: <directory : str> <level : int> <maxBytes : int> <interval : float> seconds <backupCount : int> <queueSize : int>
+#Returns: a tuple of (the BlockingStopListener to stop on shutdown, the DroppingQueueHandler whose dropped count can be reported)
+def setupLogging(directory, level=logging.INFO, maxBytes=10 * 1024 * 1024, interval=24 * 3600, backupCount=14, queueSize=10000):
+    os.makedirs(directory, exist_ok=True)
+
+    fileHandler = RotatingGzipHandler(os.path.join(directory, "bot.log"), maxBytes, interval, backupCount)
+    fileHandler.setFormatter(JsonFormatter())
+
+    console = logging.StreamHandler()
+    console.setLevel(logging.ERROR)
+    console.setFormatter(logging.Formatter("%(asctime)s: %(message)s", "%m-%d-%y %H:%M:%S"))
+
+    queueHandler = DroppingQueueHandler(queue.Queue(queueSize))
+    root = logging.getLogger("")
+    root.setLevel(level)
+    root.addHandler(queueHandler)
+
+    listener = BlockingStopListener(queueHandler.queue, fileHandler, console, respect_handler_level=True)
+    listener.start()
+    return listener, queueHandler
@@ -0,0 +1,143 @@
+"""
+Animal Crossing New Horizons Island Queue Discord Bot
+Author: Marshall Jankovsky
+github.com/marshalltj/island-queue-bot
+
+Version: 2.0.0
+
+metrics.py contains the counters, histograms and gauges the bot records and serves them in the Prometheus text format.
+Modules record into the shared METRICS instance.
+"""
+
+import bisect
+import logging
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10) #seconds
+
+#Class for a histogram with fixed bucket upper bounds
+#Members: <buckets : (float)> <counts : [int]> <sum : float> <count : int>
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1) #the last count is for values above every bucket
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    #Returns: the mean of every observed value
+    def mean(self):
+        if self.count == 0:
+            return 0.0
+        return self.sum / self.count
+
+#Formats <labels> as a Prometheus label set
+#Parameters: <labels : ((str, str))>
+def formatLabels(labels):
+    if len(labels) == 0:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+#Class that holds every metric. Metrics are created the first time they are recorded, keyed by name and a tuple of (label, value) pairs.
+#Gauges are functions read when the metrics are rendered, so they cost nothing until scraped.
+#Members: <counters : {str : {tuple : float}}> <histograms : {str : {tuple : Histogram}}> <gauges : {str : function}> <descriptions : {str : str}>
+class Metrics:
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+        self.gauges = {}
+        self.descriptions = {}
+        self._runner = None
+
+    #Adds <amount> to the counter <name>
+    #Parameters: <name : str> <labels : ((str, str))> <amount : float>
+    def inc(self, name, labels=(), amount=1):
+        series = self.counters.setdefault(name, {})
+        series[labels] = series.get(labels, 0) + amount
+
+    #Records <value> in the histogram <name>
+    #Parameters: <name : str> <value : float> <labels : ((str, str))>
+    def observe(self, name, value, labels=()):
+        series = self.histograms.setdefault(name, {})
+        histogram = series.get(labels)
+        if histogram == None:
+            histogram = Histogram()
+            series[labels] = histogram
+        histogram.observe(value)
+
+    #Parameters: <name : str> <labels : ((str, str))>
+    #Returns: the value of a counter, 0 if it was never incremented
+    def counter(self, name, labels=()):
+        return self.counters.get(name, {}).get(labels, 0)
+
+    #Parameters: <name : str> <labels : ((str, str))>
+    #Returns: the Histogram or None if nothing was recorded
+    def histogram(self, name, labels=()):
+        return self.histograms.get(name, {}).get(labels)
+
+    #Registers a gauge read from <function>() when rendering
+    #Parameters: <name : str> <function : function> <description : str>
+    def gauge(self, name, function, description=""):
+        self.gauges[name] = function
+        self.describe(name, description)
+
+    def describe(self, name, description):
+        self.descriptions[name] = description
+
+    #Returns: every metric in the Prometheus text exposition format
+    def render(self):
+        lines = []
+        for name, function in self.gauges.items():
+            self._header(lines, name, "gauge")
+            try:
+                lines.append(f"{name} {function()}")
+            except Exception:
+                logging.exception("Could not read gauge %s.", name)
+
+        for name, series in self.counters.items():
+            self._header(lines, name, "counter")
+            for labels, value in series.items():
+                lines.append(f"{name}{formatLabels(labels)} {value}")
+
+        for name, series in self.histograms.items():
+            self._header(lines, name, "histogram")
+            for labels, histogram in series.items():
+                total = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    total += count
+                    lines.append(f"{name}_bucket{formatLabels(labels + (('le', bound),))} {total}")
+                lines.append(f"{name}_bucket{formatLabels(labels + (('le', '+Inf'),))} {histogram.count}")
+                lines.append(f"{name}_sum{formatLabels(labels)} {histogram.sum}")
+                lines.append(f"{name}_count{formatLabels(labels)} {histogram.count}")
+
+        return "\n".join(lines) + "\n"
+
+    def _header(self, lines, name, kind):
+        if name in self.descriptions:
+            lines.append(f"# HELP {name} {self.descriptions[name]}")
+        lines.append(f"# TYPE {name} {kind}")
+
+    #Serves render() at http://<host>:<port>/metrics until close() is called
+    #Parameters: <host : str> <port : int>
+    async def serve(self, host, port):
+        from aiohttp import web #installed with discord.py
+
+        async def handle(request):
+            return web.Response(text=self.render(), content_type="text/plain", charset="utf-8")
+
+        app = web.Application()
+        app.router.add_get("/metrics", handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        logging.info("Serving metrics on http://%s:%s/metrics.", host, port)
+
+    async def close(self):
+        if self._runner != None:
+            await self._runner.cleanup()
+            self._runner = None
+
+METRICS = Metrics()
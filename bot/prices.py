@@ -0,0 +1,135 @@
+"""
+Animal Crossing New Horizons Island Queue Discord Bot
+Author: Marshall Jankovsky
+github.com/marshalltj/island-queue-bot
+
+Version: 2.0.0
+
+prices.py contains a class PriceLog that keeps every turnip price given to the bot in append-only column files and analyzes them
+per guild with NumPy: price percentiles, the average price on each day of the week and the best hour of the day to sell.
+"""
+
+import os
+import time
+
+import numpy as np
+
+COLUMNS = (("guild", np.int64), ("time", np.float64), ("price", np.int32)) #one file per column, the nth entry of each is one price
+PERCENTILES = (10, 25, 50, 75, 90)
+MIN_PRICE = 1
+MAX_PRICE = 999999999 #the most bells the game lets a player hold, well inside the price column's int32
+DAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+
+#Class that holds the analysis of one guild's prices. Days and hours are in UTC.
+#Members: <count : int> <percentiles : {int : float}> <dayMeans : [float]> None for days without prices <bestHour : int> <bestHourMean : float> <highest : int>
+class PriceStats:
+    def __init__(self, count, percentiles, dayMeans, bestHour, bestHourMean, highest):
+        self.count = count
+        self.percentiles = percentiles
+        self.dayMeans = dayMeans
+        self.bestHour = bestHour
+        self.bestHourMean = bestHourMean
+        self.highest = highest
+
+#Class that appends (guild, time, price) rows to one binary file per column and reads them back as memory mapped NumPy arrays,
+#so a million prices take 20 MB on disk and are only paged in when analyzed.
+#Analyses are cached per guild until that guild records a new price.
+#Members: <directory : str> <rows : int> <versions : {int : int}> <cache : {int : (int, PriceStats)}> <analyses : int>
+class PriceLog:
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.versions = {} #guild id -> prices recorded for it since the bot started
+        self.cache = {} #guild id -> (version it was computed at, PriceStats or None)
+        self.analyses = 0 #times an analysis actually ran rather than coming from the cache
+
+        self._files = {name: open(self._path(name), "ab") for name, dtype in COLUMNS}
+        self.rows = self._rowsOnDisk()
+        self._mapped = None #(rows, {name : np.memmap}) the last time the files were mapped
+
+    def _path(self, name):
+        return os.path.join(self.directory, f"{name}.bin")
+
+    #a crash part way through an append can leave the columns different lengths, they're cut back to the last whole row
+    #so new rows line up again
+    def _rowsOnDisk(self):
+        rows = min(os.path.getsize(self._path(name)) // np.dtype(dtype).itemsize for name, dtype in COLUMNS)
+        for name, dtype in COLUMNS:
+            self._files[name].truncate(rows * np.dtype(dtype).itemsize)
+        return rows
+
+    #Appends a price given for an island in <guildId>. Raises ValueError for prices outside [MIN_PRICE, MAX_PRICE].
+    #Parameters: <guildId : int> <price : int> <at : float> wall clock seconds, defaults to now
+    def record(self, guildId, price, at=None):
+        if not MIN_PRICE <= price <= MAX_PRICE:
+            raise ValueError(f"Price {price} is outside {MIN_PRICE}-{MAX_PRICE}.")
+
+        row = {"guild": guildId, "time": time.time() if at == None else at, "price": price}
+        for name, dtype in COLUMNS:
+            self._files[name].write(np.array(row[name], dtype=dtype).tobytes())
+            self._files[name].flush()
+        self.rows += 1
+        self.versions[guildId] = self.versions.get(guildId, 0) + 1
+
+    #Appends many rows at once
+    #Parameters: <guilds : array of int> <times : array of float> <prices : array of int>
+    def extend(self, guilds, times, prices):
+        for name, values in (("guild", guilds), ("time", times), ("price", prices)):
+            dtype = dict(COLUMNS)[name]
+            self._files[name].write(np.asarray(values, dtype=dtype).tobytes())
+            self._files[name].flush()
+        self.rows += len(prices)
+        for guildId in np.unique(guilds).tolist():
+            self.versions[guildId] = self.versions.get(guildId, 0) + 1
+
+    #Returns: {name : array} of every row written so far, remapping the files if rows were added since the last call
+    def _columns(self):
+        if self._mapped == None or self._mapped[0] != self.rows:
+            if self.rows == 0:
+                columns = {name: np.zeros(0, dtype=dtype) for name, dtype in COLUMNS}
+            else:
+                columns = {name: np.memmap(self._path(name), dtype=dtype, mode="r", shape=(self.rows,)) for name, dtype in COLUMNS}
+            self._mapped = (self.rows, columns)
+        return self._mapped[1]
+
+    #Parameters: <guildId : int>
+    #Returns: the PriceStats for every price recorded in <guildId>, or None if there are none
+    def analyze(self, guildId):
+        version = self.versions.get(guildId, 0)
+        cached = self.cache.get(guildId)
+        if cached != None and cached[0] == version:
+            return cached[1]
+
+        columns = self._columns()
+        mask = columns["guild"] == guildId
+        prices = columns["price"][mask].astype(np.float64)
+        times = columns["time"][mask]
+
+        stats = None
+        if len(prices) > 0:
+            days = ((times // 86400).astype(np.int64) + 3) % 7 #1970-01-01 was a Thursday, 0 is Monday
+            dayCounts = np.bincount(days, minlength=7)
+            dayMeans = np.bincount(days, weights=prices, minlength=7) / np.maximum(dayCounts, 1)
+
+            hours = (times // 3600).astype(np.int64) % 24
+            hourCounts = np.bincount(hours, minlength=24)
+            hourMeans = np.where(hourCounts > 0, np.bincount(hours, weights=prices, minlength=24) / np.maximum(hourCounts, 1), -np.inf)
+            bestHour = int(np.argmax(hourMeans))
+
+            stats = PriceStats(
+                len(prices),
+                dict(zip(PERCENTILES, np.percentile(prices, PERCENTILES).tolist())),
+                [mean if count > 0 else None for mean, count in zip(dayMeans.tolist(), dayCounts.tolist())],
+                bestHour,
+                float(hourMeans[bestHour]),
+                int(prices.max())
+            )
+
+        self.analyses += 1
+        self.cache[guildId] = (version, stats)
+        return stats
+
+    def close(self):
+        for priceFile in self._files.values():
+            priceFile.close()
+        self._mapped = None
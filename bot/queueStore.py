@@ -0,0 +1,483 @@
+"""
+Animal Crossing New Horizons Island Queue Discord Bot
+Author: Marshall Jankovsky
+github.com/marshalltj/island-queue-bot
+
+Version: 2.0.0
+
+queueStore.py contains the QueueStore interface for island queue state along with an in-process implementation and a SQLite one
+that several bot processes on the same host can share, and a class BackgroundStore that runs a store's operations off the event loop.
+
+Stores only deal in ids and wall clock timestamps (time.time()) so their state means the same thing in every process.
+Positions are 0-indexed like Island's and the admitted users of an island are the first <queueSize> users in the order they joined.
+"""
+
+import asyncio
+import concurrent.futures
+import logging
+import sqlite3
+import time
+
+from visitor import Visitor
+from visitorQueue import VisitorQueue
+
+DROP_LOG_INTERVAL = 60 #seconds between errors about dropped changes, a store that stays behind would otherwise log one per change
+
+#Class that defines the operations every queue store supports.
+#islands() and loadState() use the journal's state format (see journal.py) so a store can be filled from the journal and read back into Islands.
+class QueueStore:
+    #Parameters: <islandId : str> <guildId : int> <ownerId : int> <price : int> <createdAt : float>
+    def createIsland(self, islandId, guildId, ownerId, price, createdAt):
+        raise NotImplementedError
+
+    #Parameters: <islandId : str> <code : str> <queueSize : int>
+    def openIsland(self, islandId, code, queueSize):
+        raise NotImplementedError
+
+    #Changes any of the island's <code>, <price> or <queueSize> that aren't None
+    #Parameters: <islandId : str> <code : str> <price : int> <queueSize : int>
+    def updateIsland(self, islandId, code=None, price=None, queueSize=None):
+        raise NotImplementedError
+
+    #Parameters: <islandId : str>
+    def closeIsland(self, islandId):
+        raise NotImplementedError
+
+    #Parameters: <islandId : str>
+    #Returns: True if the island is in the store
+    def hasIsland(self, islandId):
+        raise NotImplementedError
+
+    #Adds <userId> to the back of the queue for <islandId>
+    #Parameters: <islandId : str> <userId : int> <trips : int> <joinedAt : float>
+    #Returns: the position of the user or -1 if the island doesn't exist
+    def enqueue(self, islandId, userId, trips, joinedAt):
+        raise NotImplementedError
+
+    #Removes <userId> from the queue for <islandId>
+    #Parameters: <islandId : str> <userId : int>
+    #Returns: the position the user was removed from or -1 if not found
+    def dequeue(self, islandId, userId):
+        raise NotImplementedError
+
+    #Parameters: <islandId : str> <userId : int>
+    #Returns: the position of <userId> in the queue for <islandId> or -1 if not found
+    def position(self, islandId, userId):
+        raise NotImplementedError
+
+    #Records that <userId> was let on to <islandId> at <admittedAt>
+    #Parameters: <islandId : str> <userId : int> <admittedAt : float>
+    def admit(self, islandId, userId, admittedAt):
+        raise NotImplementedError
+
+    #Parameters: <islandId : str>
+    #Returns: a list of (userId, timestamp) for the users allowed on <islandId>, timestamp being when they were admitted
+    def admitted(self, islandId):
+        raise NotImplementedError
+
+    #Parameters: <islandId : str>
+    #Returns: the number of users in the queue for <islandId>
+    def numVisitors(self, islandId):
+        raise NotImplementedError
+
+    #Parameters: <owns : function(str) -> bool> only islands it accepts are returned, defaults to every island
+    #Returns: {islandId : state dict} for the islands in the store, visitors in queue order
+    def islands(self, owns=None):
+        raise NotImplementedError
+
+    #Replaces the islands <owns> accepts with the islands in <state>, e.g. the journal's state on startup
+    #Parameters: <state : {str : dict}> <owns : function(str) -> bool> defaults to every island
+    def loadState(self, state, owns=None):
+        for islandId in self.islands(owns):
+            self.closeIsland(islandId)
+
+        for islandId, island in state.items():
+            self.createIsland(islandId, island["guild"], island["owner"], island["price"], island["created"])
+            self.updateIsland(islandId, island["code"], None, island["queueSize"])
+            for userId, (trips, timestamp) in island["visitors"].items():
+                self.enqueue(islandId, int(userId), trips, timestamp)
+
+    #Applies many journal records in order
+    #Parameters: <records : [(str, str, dict)]> (op, island id, fields) tuples
+    def applyRecords(self, records):
+        for op, islandId, fields in records:
+            applyRecord(self, op, islandId, fields)
+
+    def close(self):
+        pass
+
+#Applies a journal record (see journal.py) to <store> so the store follows the same changes as the journal
+#Parameters: <store : QueueStore> <op : str> <islandId : str> <fields : dict>
+def applyRecord(store, op, islandId, fields):
+    if op == "create":
+        store.createIsland(islandId, fields["guild"], fields["owner"], fields["price"], fields["at"])
+    elif op == "open":
+        store.openIsland(islandId, fields["code"], fields["size"])
+    elif op == "update":
+        store.updateIsland(islandId, fields.get("code"), fields.get("price"), fields.get("queueSize"))
+    elif op == "join":
+        store.enqueue(islandId, fields["user"], fields["trips"], fields["at"])
+    elif op == "leave" or op == "remove":
+        store.dequeue(islandId, fields["user"])
+    elif op == "admit":
+        store.admit(islandId, fields["user"], fields["at"])
+    elif op == "close":
+        store.closeIsland(islandId)
+
+#Class that holds an island's state in a MemoryQueueStore
+#Members: <guildId : int> <ownerId : int> <price : int> <code : str> <queueSize : int> <createdAt : float> <visitors : VisitorQueue>
+class StoredIsland:
+    def __init__(self, guildId, ownerId, price, createdAt):
+        self.guildId = guildId
+        self.ownerId = ownerId
+        self.price = price
+        self.code = None
+        self.queueSize = None
+        self.createdAt = createdAt
+        self.visitors = VisitorQueue()
+
+#Class that keeps queue state in this process using the same VisitorQueue an Island does. Fast, but only visible to this process.
+#Visitor timestamps hold wall clock seconds here rather than time.monotonic().
+class MemoryQueueStore(QueueStore):
+    def __init__(self):
+        self._islands = {} #island id -> StoredIsland
+
+    def createIsland(self, islandId, guildId, ownerId, price, createdAt):
+        self._islands[islandId] = StoredIsland(guildId, ownerId, price, createdAt)
+
+    def openIsland(self, islandId, code, queueSize):
+        self.updateIsland(islandId, code=code, queueSize=queueSize)
+
+    def updateIsland(self, islandId, code=None, price=None, queueSize=None):
+        island = self._islands.get(islandId)
+        if island == None:
+            return
+        if code != None:
+            island.code = code
+        if price != None:
+            island.price = price
+        if queueSize != None:
+            island.queueSize = queueSize
+            island.visitors.setCapacity(queueSize)
+
+    def closeIsland(self, islandId):
+        self._islands.pop(islandId, None)
+
+    def hasIsland(self, islandId):
+        return islandId in self._islands
+
+    def enqueue(self, islandId, userId, trips, joinedAt):
+        island = self._islands.get(islandId)
+        if island == None:
+            return -1
+        if userId in island.visitors:
+            return island.visitors.position(userId)
+        return island.visitors.append(Visitor(userId, trips, joinedAt))
+
+    def dequeue(self, islandId, userId):
+        island = self._islands.get(islandId)
+        if island == None:
+            return -1
+
+        position = island.visitors.remove(userId)
+        island.visitors.promote()
+        return position
+
+    def position(self, islandId, userId):
+        island = self._islands.get(islandId)
+        if island == None:
+            return -1
+        return island.visitors.position(userId)
+
+    def admit(self, islandId, userId, admittedAt):
+        island = self._islands.get(islandId)
+        if island != None and userId in island.visitors:
+            island.visitors.get(userId).timestamp = admittedAt
+
+    def admitted(self, islandId):
+        island = self._islands.get(islandId)
+        if island == None:
+            return []
+        return [(visitor.userId, visitor.timestamp) for visitor in island.visitors.admitted]
+
+    def numVisitors(self, islandId):
+        island = self._islands.get(islandId)
+        if island == None:
+            return 0
+        return len(island.visitors)
+
+    def islands(self, owns=None):
+        return {
+            islandId: {
+                "guild": island.guildId,
+                "owner": island.ownerId,
+                "price": island.price,
+                "code": island.code,
+                "queueSize": island.queueSize,
+                "created": island.createdAt,
+                "visitors": {str(visitor.userId): [visitor.trips, visitor.timestamp] for visitor in island.visitors}
+            }
+            for islandId, island in self._islands.items() if owns == None or owns(islandId)
+        }
+
+#Class that keeps queue state in a SQLite database in WAL mode so several bot processes on one host can read and write it at once.
+#Visitors are ordered by a per-island sequence number and an (island, seq) index keeps position and admitted queries to an index range scan.
+#The connection may be made on one thread and used on another, as BackgroundStore does, as long as only one thread uses it at a time.
+#Members: <path : str> <connection : sqlite3.Connection>
+class SqliteQueueStore(QueueStore):
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS Islands ("
+        "Id TEXT PRIMARY KEY, Guild INTEGER, Owner INTEGER, Price INTEGER, Code TEXT, QueueSize INTEGER, Created REAL)",
+        "CREATE TABLE IF NOT EXISTS Visitors ("
+        "Island TEXT NOT NULL, User INTEGER NOT NULL, Seq INTEGER NOT NULL, Trips INTEGER, Timestamp REAL, PRIMARY KEY (Island, User))",
+        "CREATE UNIQUE INDEX IF NOT EXISTS VisitorOrder ON Visitors (Island, Seq)"
+    )
+
+    def __init__(self, path, timeout=5.0):
+        self.path = path
+        #autocommit mode, writes that need several statements take the write lock up front with BEGIN IMMEDIATE
+        self.connection = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL") #WAL stays consistent across crashes, only the last commits can be lost on power loss
+        for statement in self.SCHEMA:
+            self.connection.execute(statement)
+
+    #Runs <function>(cursor) in one write transaction, or in the current one inside applyRecords() and loadState()
+    def _write(self, function):
+        cursor = self.connection.cursor()
+        if self.connection.in_transaction:
+            return function(cursor)
+
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            result = function(cursor)
+        except BaseException:
+            cursor.execute("ROLLBACK")
+            raise
+        cursor.execute("COMMIT")
+        return result
+
+    def _queueSize(self, cursor, islandId):
+        row = cursor.execute("SELECT QueueSize FROM Islands WHERE Id = ?", (islandId,)).fetchone()
+        if row == None:
+            return None
+        return row[0] or 0
+
+    def _position(self, cursor, islandId, userId):
+        row = cursor.execute("SELECT Seq FROM Visitors WHERE Island = ? AND User = ?", (islandId, userId)).fetchone()
+        if row == None:
+            return -1
+        return cursor.execute("SELECT COUNT(*) FROM Visitors WHERE Island = ? AND Seq < ?", (islandId, row[0])).fetchone()[0]
+
+    def createIsland(self, islandId, guildId, ownerId, price, createdAt):
+        def create(cursor):
+            #IDs are reused once an island closes, clear anything a crashed process left behind
+            cursor.execute("DELETE FROM Visitors WHERE Island = ?", (islandId,))
+            cursor.execute(
+                "INSERT OR REPLACE INTO Islands (Id, Guild, Owner, Price, Code, QueueSize, Created) VALUES (?, ?, ?, ?, NULL, NULL, ?)",
+                (islandId, guildId, ownerId, price, createdAt)
+            )
+        self._write(create)
+
+    def openIsland(self, islandId, code, queueSize):
+        self.updateIsland(islandId, code=code, queueSize=queueSize)
+
+    def updateIsland(self, islandId, code=None, price=None, queueSize=None):
+        self.connection.execute(
+            "UPDATE Islands SET Code = COALESCE(?, Code), Price = COALESCE(?, Price), QueueSize = COALESCE(?, QueueSize) WHERE Id = ?",
+            (code, price, queueSize, islandId)
+        )
+
+    def closeIsland(self, islandId):
+        def close(cursor):
+            cursor.execute("DELETE FROM Visitors WHERE Island = ?", (islandId,))
+            cursor.execute("DELETE FROM Islands WHERE Id = ?", (islandId,))
+        self._write(close)
+
+    def hasIsland(self, islandId):
+        return self.connection.execute("SELECT 1 FROM Islands WHERE Id = ?", (islandId,)).fetchone() != None
+
+    def enqueue(self, islandId, userId, trips, joinedAt):
+        def enqueue(cursor):
+            if self._queueSize(cursor, islandId) == None:
+                return -1
+
+            position = self._position(cursor, islandId, userId)
+            if position != -1:
+                return position
+
+            seq = cursor.execute("SELECT COALESCE(MAX(Seq), 0) + 1 FROM Visitors WHERE Island = ?", (islandId,)).fetchone()[0]
+            cursor.execute(
+                "INSERT INTO Visitors (Island, User, Seq, Trips, Timestamp) VALUES (?, ?, ?, ?, ?)",
+                (islandId, userId, seq, trips, joinedAt)
+            )
+            return cursor.execute("SELECT COUNT(*) FROM Visitors WHERE Island = ?", (islandId,)).fetchone()[0] - 1
+        return self._write(enqueue)
+
+    def dequeue(self, islandId, userId):
+        def dequeue(cursor):
+            position = self._position(cursor, islandId, userId)
+            if position != -1:
+                cursor.execute("DELETE FROM Visitors WHERE Island = ? AND User = ?", (islandId, userId))
+            return position
+        return self._write(dequeue)
+
+    def position(self, islandId, userId):
+        return self._position(self.connection.cursor(), islandId, userId)
+
+    def admit(self, islandId, userId, admittedAt):
+        self.connection.execute("UPDATE Visitors SET Timestamp = ? WHERE Island = ? AND User = ?", (admittedAt, islandId, userId))
+
+    def admitted(self, islandId):
+        cursor = self.connection.cursor()
+        queueSize = self._queueSize(cursor, islandId)
+        if queueSize == None:
+            return []
+        return cursor.execute(
+            "SELECT User, Timestamp FROM Visitors WHERE Island = ? ORDER BY Seq LIMIT ?", (islandId, queueSize)
+        ).fetchall()
+
+    def numVisitors(self, islandId):
+        return self.connection.execute("SELECT COUNT(*) FROM Visitors WHERE Island = ?", (islandId,)).fetchone()[0]
+
+    def islands(self, owns=None):
+        cursor = self.connection.cursor()
+        islands = {}
+        for islandId, guildId, ownerId, price, code, queueSize, createdAt in cursor.execute("SELECT Id, Guild, Owner, Price, Code, QueueSize, Created FROM Islands").fetchall():
+            if owns != None and not owns(islandId):
+                continue
+            visitors = cursor.execute("SELECT User, Trips, Timestamp FROM Visitors WHERE Island = ? ORDER BY Seq", (islandId,)).fetchall()
+            islands[islandId] = {
+                "guild": guildId,
+                "owner": ownerId,
+                "price": price,
+                "code": code,
+                "queueSize": queueSize,
+                "created": createdAt,
+                "visitors": {str(userId): [trips, timestamp] for userId, trips, timestamp in visitors}
+            }
+        return islands
+
+    #Replaces the islands in one write transaction so other processes never see them half loaded
+    def loadState(self, state, owns=None):
+        self._write(lambda cursor: QueueStore.loadState(self, state, owns))
+
+    #Applies many journal records in one write transaction, either all of them are written or none are
+    def applyRecords(self, records):
+        self._write(lambda cursor: QueueStore.applyRecords(self, records))
+
+    def close(self):
+        self.connection.close()
+
+#Class that runs a QueueStore's operations without blocking the event loop, every one of them on a single background thread that owns the store.
+#Changes are queued in order and applied in batches, one transaction per batch for SQLite, so a store locked by another process delays
+#the writes instead of stalling every command. A batch that hits a locked store is retried whole. Reads wait for the queued changes first.
+#Members: <store : QueueStore> <delay : float> <batchSize : int> <maxPending : int> <pending : [tuple]> <written : int> <dropped : int> <failures : int> <lastFlushLatency : float>
+class BackgroundStore:
+    def __init__(self, store, delay=0.5, batchSize=500, maxPending=100000):
+        self.store = store
+        self.delay = delay #seconds to wait for more changes before writing
+        self.batchSize = batchSize #write straight away once this many changes are waiting
+        self.maxPending = maxPending #changes kept while writes are failing, the oldest are dropped past this
+        self.pending = []
+
+        self.written = 0
+        self.dropped = 0
+        self.failures = 0
+        self.lastFlushLatency = 0.0
+        self._lastDropLog = None #time.monotonic() of the last error about dropped changes
+        self._droppedSinceLog = 0
+
+        #stores aren't thread safe, so after this the store is only used on this executor's only thread
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="queue-store")
+        self._task = None
+        self._sleeping = False #True while _task is still waiting out the delay and hasn't started writing
+        self._lock = asyncio.Lock()
+
+    #Queues a journal record to be applied to the store. Never blocks.
+    #Parameters: <op : str> <islandId : str> <fields : dict> see journal.py
+    def record(self, op, islandId, fields):
+        self.pending.append((op, islandId, fields))
+        if len(self.pending) > self.maxPending:
+            overflow = len(self.pending) - self.maxPending
+            del self.pending[:overflow]
+            self.dropped += overflow
+            self._droppedSinceLog += overflow
+            now = time.monotonic()
+            if self._lastDropLog == None or now - self._lastDropLog >= DROP_LOG_INTERVAL:
+                logging.error("Queue store is too far behind, dropped its %d oldest changes.", self._droppedSinceLog)
+                self._lastDropLog = now
+                self._droppedSinceLog = 0
+
+        if len(self.pending) >= self.batchSize:
+            if self._task == None or self._task.done():
+                self._task = asyncio.ensure_future(self.flush())
+        elif self._task == None or self._task.done():
+            self._sleeping = True
+            self._task = asyncio.ensure_future(self._flushLater())
+
+    #Whoever schedules this sets _sleeping first, so close() also cancels a delayed flush that hasn't started running yet
+    async def _flushLater(self):
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self._sleeping = False
+        await self.flush()
+
+    #Writes every queued change now
+    async def flush(self):
+        async with self._lock:
+            if len(self.pending) == 0:
+                return
+
+            batch = self.pending
+            self.pending = []
+            startTime = time.monotonic()
+            try:
+                await asyncio.get_running_loop().run_in_executor(self._executor, self.store.applyRecords, batch)
+                self.written += len(batch)
+            except sqlite3.OperationalError:
+                #locked or busy, the transaction was rolled back so the whole batch goes back on the front of the queue in order
+                self.failures += 1
+                logging.exception("Failed to write %d changes to the queue store, requeueing.", len(batch))
+                self.pending = batch + self.pending
+                if len(self.pending) > self.maxPending:
+                    self.dropped += len(self.pending) - self.maxPending
+                    self.pending = self.pending[-self.maxPending:]
+            except Exception:
+                #anything else would fail the same way again
+                self.failures += 1
+                self.dropped += len(batch)
+                logging.exception("Failed to write %d changes to the queue store, dropping them.", len(batch))
+            self.lastFlushLatency = time.monotonic() - startTime
+
+        if len(self.pending) > 0 and (self._task == None or self._task.done() or self._task is asyncio.current_task()):
+            self._sleeping = True
+            self._task = asyncio.ensure_future(self._flushLater())
+
+    #Runs <function>(*<args>) on the store's thread once every change queued before the call has been written
+    #Parameters: <function : function> usually a method of <store> <args> its arguments
+    #Returns: what <function> returned
+    async def run(self, function, *args):
+        await self.flush()
+        return await asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+
+    #Cancels the delayed flush, writes whatever is still queued and closes the store, called on shutdown.
+    #A flush that is already writing is waited on for up to <timeout> seconds, cancelling it would lose the batch it took from pending.
+    #Parameters: <timeout : float>
+    async def close(self, timeout=10.0):
+        if self._task != None and not self._task.done():
+            if self._sleeping:
+                self._task.cancel()
+            else:
+                try:
+                    await asyncio.wait_for(asyncio.shield(self._task), timeout)
+                except asyncio.TimeoutError:
+                    logging.error("Queue store flush still running after %s seconds on shutdown.", timeout)
+        self._task = None
+
+        await self.flush()
+        if self._task != None:
+            self._task.cancel()
+        self._executor.submit(self.store.close).result()
+        self._executor.shutdown()
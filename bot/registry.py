@@ -0,0 +1,108 @@
+"""
+Animal Crossing New Horizons Island Queue Discord Bot
+Author: Marshall Jankovsky
+github.com/marshalltj/island-queue-bot
+
+Version: 2.0.0
+
+registry.py contains a class Registry that indexes every Server and Island the bot knows about so lookups don't have to scan every guild.
+"""
+
+from visitorQueue import QueueTotals
+
+#Class that keeps dict indexes over all Servers and their Islands.
+#Members: <servers : {int : Server}> <islands : {str : Island}> <islandsByOwner : {int : {int : Island}}> <totals : QueueTotals>
+#servers is keyed by guild id, islands by island ID and islandsByOwner by owner id then guild id (an owner can have one island per guild).
+#totals counts the admitted and waiting Visitors over every registered island.
+class Registry:
+    def __init__(self):
+        self.servers = {}
+        self.islands = {}
+        self.islandsByOwner = {}
+        self.totals = QueueTotals()
+
+    def __len__(self):
+        return len(self.servers)
+
+    def __iter__(self):
+        return iter(self.servers.values())
+
+    #Adds a <server> to the registry along with any islands it already holds
+    #Parameters: <server : Server>
+    def addServer(self, server):
+        self.servers[server.guild.id] = server
+        for island in server.islands.values():
+            self._indexIsland(island)
+
+    #Removes the Server for <guild> and all of its islands from the registry
+    #Parameters: <guild : discord.Guild>
+    #Returns: the removed Server or None if not found
+    def removeServer(self, guild):
+        server = self.servers.pop(guild.id, None)
+        if server != None:
+            for island in server.islands.values():
+                self._unindexIsland(island)
+        return server
+
+    #Parameters: <guild : discord.Guild>
+    #Returns: the Server or None if not found
+    def getServer(self, guild):
+        if guild == None:
+            return None
+        return self.servers.get(guild.id)
+
+    #Adds an <island> to its Server and to the indexes
+    #Parameters: <island : Island>
+    def addIsland(self, island):
+        server = self.servers[island.guild.id]
+        server.islands[island.islandId] = island
+        island.server = server
+        server.touch()
+        self._indexIsland(island)
+
+    #Removes an <island> from its Server and from the indexes
+    #Parameters: <island : Island>
+    #Returns: True if the island was removed, False if it wasn't registered
+    def removeIsland(self, island):
+        if self.islands.get(island.islandId) is not island:
+            return False
+
+        server = self.servers.get(island.guild.id)
+        if server != None:
+            server.islands.pop(island.islandId, None)
+            server.touch()
+        self._unindexIsland(island)
+        return True
+
+    #Parameters: <islandId : str>
+    #Returns: the Island or None if not found
+    def getIslandById(self, islandId):
+        return self.islands.get(islandId)
+
+    #Parameters: <owner : discord.User>
+    #Returns: the first Island <owner> created in any guild or None if not found
+    def getIslandByOwner(self, owner):
+        owned = self.islandsByOwner.get(owner.id)
+        if owned:
+            return next(iter(owned.values()))
+
+    #Parameters: <owner : discord.User> <guild : discord.Guild>
+    #Returns: the Island <owner> created in <guild> or None if not found
+    def getIslandByOwnerInGuild(self, owner, guild):
+        owned = self.islandsByOwner.get(owner.id)
+        if owned:
+            return owned.get(guild.id)
+
+    def _indexIsland(self, island):
+        self.islands[island.islandId] = island
+        island.visitors.attach(self.totals)
+        self.islandsByOwner.setdefault(island.owner.id, {})[island.guild.id] = island
+
+    def _unindexIsland(self, island):
+        self.islands.pop(island.islandId, None)
+        island.visitors.attach(None)
+        owned = self.islandsByOwner.get(island.owner.id)
+        if owned != None:
+            owned.pop(island.guild.id, None)
+            if len(owned) == 0:
+                del self.islandsByOwner[island.owner.id]
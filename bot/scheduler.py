@@ -0,0 +1,143 @@
+"""
+Animal Crossing New Horizons Island Queue Discord Bot
+Author: Marshall Jankovsky
+github.com/marshalltj/island-queue-bot
+
+Version: 2.0.0
+
+scheduler.py contains a class ExpiryScheduler that runs a callback when a deadline passes, used to time out Visitors and close old Islands.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+
+from metrics import METRICS
+
+#Class that keeps a min-heap of deadlines (time.monotonic() seconds) and awaits each entry's callback once its deadline passes.
+#Entries are identified by a hashable key. Rescheduling or cancelling a key leaves the old heap entry behind, which is skipped when popped.
+#Members: <entries : {key : (float, int, callback, tuple)}>
+class ExpiryScheduler:
+    def __init__(self):
+        self.entries = {}
+        self._heap = []
+        self._counter = itertools.count()
+        self._wakeup = None
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    #Schedules <callback>(*<args>) to be awaited at <deadline>, replacing any existing entry for <key>
+    #Parameters: <key : hashable> <deadline : float> <callback : coroutine function> <args>
+    def schedule(self, key, deadline, callback, *args):
+        seq = next(self._counter)
+        self.entries[key] = (deadline, seq, callback, args)
+        heapq.heappush(self._heap, (deadline, seq, key))
+
+        #wake the runner if this is now the earliest deadline
+        if self._wakeup != None and self._heap[0][1] == seq:
+            self._wakeup.set()
+
+    #Parameters: <key : hashable>
+    #Returns: True if an entry was cancelled
+    def cancel(self, key):
+        return self.entries.pop(key, None) != None
+
+    #Parameters: <key : hashable>
+    #Returns: the deadline for <key> or None if it isn't scheduled
+    def getDeadline(self, key):
+        entry = self.entries.get(key)
+        if entry != None:
+            return entry[0]
+
+    #Pops every entry whose deadline has passed
+    #Parameters: <now : float>
+    #Returns: a list of (key, callback, args) in deadline order
+    def popDue(self, now):
+        due = []
+        while len(self._heap) > 0 and self._heap[0][0] <= now:
+            deadline, seq, key = heapq.heappop(self._heap)
+            entry = self.entries.get(key)
+            if entry != None and entry[1] == seq: #skip entries that were rescheduled or cancelled
+                del self.entries[key]
+                due.append((key, entry[2], entry[3]))
+        return due
+
+    #Returns: seconds until the next live deadline or None if nothing is scheduled
+    def timeUntilNext(self, now):
+        while len(self._heap) > 0:
+            deadline, seq, key = self._heap[0]
+            entry = self.entries.get(key)
+            if entry != None and entry[1] == seq:
+                return max(0, deadline - now)
+            heapq.heappop(self._heap)
+
+    #Runs forever, calling runDue() each time deadlines pass
+    #Parameters: <groupOf : function> <concurrency : int>
+    async def run(self, groupOf=None, concurrency=10):
+        self._wakeup = asyncio.Event()
+
+        while True:
+            timeout = self.timeUntilNext(time.monotonic())
+            self._wakeup.clear()
+
+            if timeout == None or timeout > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                    continue #an earlier deadline was scheduled, recompute the wait
+                except asyncio.TimeoutError:
+                    pass
+
+            await self.runDue(groupOf, concurrency)
+
+    #Runs every entry whose deadline has passed. The entries are split into groups by <groupOf>(key, args) and every group gets its own pass,
+    #with at most <concurrency> passes running at once, so one slow group can't hold up the others. A pass awaits its callbacks in order.
+    #A callback may return an awaitable (e.g. the messages about what it changed), those are started once the whole pass is done.
+    #Parameters: <groupOf : function> <concurrency : int>
+    #Returns: the number of entries run
+    async def runDue(self, groupOf=None, concurrency=10):
+        groups = {}
+        for key, callback, args in self.popDue(time.monotonic()):
+            group = groupOf(key, args) if groupOf != None else None
+            groups.setdefault(group, []).append((key, callback, args))
+        if len(groups) == 0:
+            return 0
+
+        startTime = time.monotonic()
+        passes = asyncio.Semaphore(concurrency)
+        await asyncio.gather(*[self._runPass(group, due, passes) for group, due in groups.items()])
+
+        count = sum(len(due) for due in groups.values())
+        elapsed = time.monotonic() - startTime
+        METRICS.observe("expiry_cycle_seconds", elapsed)
+        METRICS.inc("expiry_deadlines_total", amount=count)
+        logging.info("Expiry cycle ran %d deadlines over %d groups in %.3f seconds.", count, len(groups), elapsed, extra={"latency": elapsed})
+        return count
+
+    async def _runPass(self, group, due, passes):
+        async with passes:
+            startTime = time.monotonic()
+            followUps = []
+            for key, callback, args in due:
+                try:
+                    followUp = await callback(*args)
+                except Exception:
+                    logging.exception("Expiry callback for %s failed.", key)
+                    continue
+                if followUp != None:
+                    followUps.append(followUp)
+            logging.info("Expiry pass for %s ran %d deadlines in %.3f seconds.", group, len(due), time.monotonic() - startTime, extra={"guild": group})
+
+        for followUp in followUps:
+            asyncio.ensure_future(followUp).add_done_callback(_logFailure)
+
+#Logs the exception a finished follow-up task raised, if any
+#Parameters: <task : asyncio.Future>
+def _logFailure(task):
+    if not task.cancelled() and task.exception() != None:
+        logging.error("Expiry follow-up failed.", exc_info=task.exception())
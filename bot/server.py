@@ -9,61 +9,43 @@ server.py holds information about a discord guild and its associated island queu
 """
 
 #Class that contains information about a discord guild (server)
-#Members: <guild : discord.Guild> <islands : [Island]> <turnipChannel : int> <generalChannel : int> <timeout : int>
+#Members: <guild : discord.Guild> <islands : {str : Island}> <turnipChannel : int> <generalChannel : int> <timeout : int> <liveBoard : bool> <version : int> <pageCache : tuple>
 class Server:
-	def __init__(self, guild, db):
+	#<row> is the guild's (TurnipChannel, GeneralChannel, Timeout, LiveBoard) row read from the DB so information is preserved if the bot crashes/restarts
+	def __init__(self, guild, row=None):
 		self.guild = guild
-		self.islands = []
+		self.islands = {} #keyed by island ID, kept in creation order
+		self.version = 0 #bumped whenever an island is added, removed or changed
+		self.pageCache = None #rendered listing pages, see listing.py
 
-		cursor = db.cursor()
-		#Read the information about the server from the DB in case bot crashes/restarts to preserve information
-		sql = f"SELECT TurnipChannel, GeneralChannel, Timeout FROM Servers WHERE ID = {guild.id}"
+		if row == None:
+			row = (None, None, None, None)
 
-		cursor.execute(sql)
-		result = cursor.fetchone()
-
-		self.turnipChannel = result[0]
-		self.generalChannel = result[1]
-		self.timeout = result[2]
+		self.turnipChannel = row[0]
+		self.generalChannel = row[1]
+		self.timeout = row[2]
 
 		if self.timeout == None:
 			self.timeout = 30
 
-		cursor.close()
-		db.close()
-
-	def setTurnipChannel(self, channelId, db):
-		cursor = db.cursor()
-
-		sql = f"UPDATE Servers SET TurnipChannel = {channelId} WHERE ID = {self.guild.id}"
+		self.liveBoard = bool(row[3]) #post a live-updating queue board for each island opened in this server
 
-		cursor.execute(sql)
+	def touch(self):
+		self.version += 1
 
-		db.commit()
-		cursor.close()
-		db.close()
+	#The setters update the Server straight away and queue the DB write on <writer> (a ConfigWriter)
+	def setTurnipChannel(self, channelId, writer):
 		self.turnipChannel = channelId
+		writer.write(self.guild.id, "TurnipChannel", channelId)
 
-	def setGeneralChannel(self, channelId, db):
-		cursor = db.cursor()
-
-		sql = f"UPDATE Servers SET GeneralChannel = {channelId} WHERE ID = {self.guild.id}"
-
-		cursor.execute(sql)
-
-		db.commit()
-		cursor.close()
-		db.close()
+	def setGeneralChannel(self, channelId, writer):
 		self.generalChannel = channelId
+		writer.write(self.guild.id, "GeneralChannel", channelId)
 
-	def setTimeout(self, time, db):
-		cursor = db.cursor()
-
-		sql = f"UPDATE Servers SET Timeout = {time} WHERE ID = {self.guild.id}"
-
-		cursor.execute(sql)
-
-		db.commit()
-		cursor.close()
-		db.close()
+	def setTimeout(self, time, writer):
 		self.timeout = time
+		writer.write(self.guild.id, "Timeout", time)
+
+	def setLiveBoard(self, enabled, writer):
+		self.liveBoard = enabled
+		writer.write(self.guild.id, "LiveBoard", enabled)
@@ -0,0 +1,54 @@
+"""
+Animal Crossing New Horizons Island Queue Discord Bot
+Author: Marshall Jankovsky
+github.com/marshalltj/island-queue-bot
+
+Version: 2.0.0
+
+users.py contains a class UserDirectory that turns the user ids stored in queues back into names and discord.Users when they're needed.
+"""
+
+import collections
+import logging
+
+import discord
+
+#Class that resolves user ids lazily. Names come from the client's user cache, falling back to a bounded cache of names seen
+#when users ran commands, so queues only have to hold ids.
+#Members: <client : discord.Client> <capacity : int> <names : OrderedDict(int : str)>
+class UserDirectory:
+    def __init__(self, capacity=100000, client=None):
+        self.client = client
+        self.capacity = capacity
+        self.names = collections.OrderedDict() #user id -> name, least recently seen first
+
+    #Records the name of a <user> who just ran a command
+    #Parameters: <user : discord.User>
+    def remember(self, user):
+        self.names[user.id] = user.name
+        self.names.move_to_end(user.id)
+        while len(self.names) > self.capacity:
+            self.names.popitem(last=False)
+
+    #Parameters: <userId : int>
+    #Returns: the user's name, or a placeholder if they haven't been seen in a while
+    def name(self, userId):
+        user = self.client.get_user(userId) if self.client != None else None
+        if user != None:
+            return user.name
+        name = self.names.get(userId)
+        if name != None:
+            return name
+        return f"User {userId}"
+
+    #Looks up a user by id, asking discord if they aren't cached
+    #Parameters: <userId : int>
+    #Returns: the discord.User or None if they couldn't be found
+    async def resolve(self, userId):
+        user = self.client.get_user(userId)
+        if user == None:
+            try:
+                user = await self.client.fetch_user(userId)
+            except discord.HTTPException:
+                logging.error("Could not find user %s.", userId, extra={"user": userId})
+        return user
@@ -5,24 +5,38 @@ github.com/marshalltj/island-queue-bot
 
 Version: 2.0.0
 
-visitor.py contains a class Visitor that connects a discord.User to a datetime object of when they join a queue for an Island
+visitor.py contains a class Visitor that connects a user id to a timestamp of when they join a queue for an Island
 """
 
-import datetime
+import time
 
-#Class that connects a discord.User to a timestamp
-#Members: <user : discord.User> <trips : int> <timestamp : datetime.datetime> 
+UNKNOWN_TRIPS = 0 #trips value for a visitor who didn't say how many trips they need
+
+#Class that connects a user id to a timestamp. There is one per queued user so it only holds plain numbers in __slots__,
+#names are looked up when a queue is rendered, see users.py.
+#Members: <userId : int> <trips : int> <timestamp : float (time.monotonic())>
 class Visitor:
-	def __init__(self, user, trips):
-		self.user = user
-		if trips == 0:
-			self.trips = "?"
-		else:
-			self.trips = trips
-		self.timestamp = datetime.datetime.now()
+	__slots__ = ("userId", "trips", "timestamp")
+
+	#Parameters: <userId : int> <trips : int> <timestamp : float> defaults to now
+	def __init__(self, userId, trips, timestamp=None):
+		self.userId = userId
+		self.trips = trips
+		self.timestamp = time.monotonic() if timestamp == None else timestamp
+
+	#Returns: the number of trips for display, "?" if unknown
+	def formatTrips(self):
+		if self.trips == UNKNOWN_TRIPS:
+			return "?"
+		return str(self.trips)
 
 	def getTimeSpent(self):
-		return divmod((datetime.datetime.now() - self.timestamp).seconds, 60)[0]
+		return int((time.monotonic() - self.timestamp) // 60)
 
 	def setTimestamp(self):
-		self.timestamp = datetime.datetime.now()
+		self.timestamp = time.monotonic()
+
+	#Parameters: <timeout : int> minutes a Visitor is allowed on an island
+	#Returns: the time.monotonic() deadline for this Visitor to leave the island
+	def getDeadline(self, timeout):
+		return self.timestamp + timeout * 60
@@ -0,0 +1,215 @@
+"""
+Animal Crossing New Horizons Island Queue Discord Bot
+Author: Marshall Jankovsky
+github.com/marshalltj/island-queue-bot
+
+Version: 2.0.0
+
+visitorQueue.py contains a class VisitorQueue that holds the Visitors for an Island split into an admitted tier (users allowed on the island) and a waiting tier.
+"""
+
+#Class that keeps running totals of admitted and waiting Visitors over several VisitorQueues so they can be read in O(1)
+#Members: <admitted : int> <waiting : int>
+class QueueTotals:
+    def __init__(self):
+        self.admitted = 0
+        self.waiting = 0
+
+#Class that holds an Island's Visitors in queue order.
+#The first <capacity> Visitors are kept in a small admitted list. Everyone else is kept in a waiting tier backed by a Fenwick tree over
+#append-order slots so a user's rank can be found in O(log n) and membership by user id is O(1).
+#Members: <capacity : int> <admitted : [Visitor]> <members : {int : Visitor}> <totals : QueueTotals>
+class VisitorQueue:
+    def __init__(self, capacity=0):
+        self.capacity = capacity
+        self.admitted = []
+        self.members = {}
+        self.totals = None #set by attach()
+
+        self._slots = []    #waiting Visitors in append order, None where a Visitor has left
+        self._tree = []     #1-based Fenwick tree over _slots, 1 for a live slot and 0 for a dead one
+        self._slotOf = {}   #user id -> index into _slots for waiting Visitors
+        self._head = 0      #index of the first slot that may still be live
+
+    def __len__(self):
+        return len(self.members)
+
+    def __contains__(self, userId):
+        return userId in self.members
+
+    def __iter__(self):
+        yield from self.admitted
+        yield from self.waiting()
+
+    def __getitem__(self, idx):
+        if idx < 0:
+            idx += len(self)
+        if idx < 0 or idx >= len(self):
+            raise IndexError("queue position out of range")
+        if idx < len(self.admitted):
+            return self.admitted[idx]
+        return self._slots[self._findKth(idx - len(self.admitted))]
+
+    #Parameters: <userId : int>
+    #Returns: the Visitor for <userId> or None if they aren't in the queue
+    def get(self, userId):
+        return self.members.get(userId)
+
+    #Iterates over the waiting tier in order, optionally stopping after <count> Visitors
+    #Parameters: <count : int>
+    def waiting(self, count=None):
+        for i in range(self._head, len(self._slots)):
+            if count != None and count <= 0:
+                return
+            visitor = self._slots[i]
+            if visitor != None:
+                yield visitor
+                if count != None:
+                    count -= 1
+
+    def numWaiting(self):
+        return len(self._slotOf)
+
+    #Starts counting this queue in <totals>, or stops counting it if <totals> is None
+    #Parameters: <totals : QueueTotals>
+    def attach(self, totals):
+        self._count(-len(self.admitted), -self.numWaiting())
+        self.totals = totals
+        self._count(len(self.admitted), self.numWaiting())
+
+    def _count(self, admitted, waiting):
+        if self.totals != None:
+            self.totals.admitted += admitted
+            self.totals.waiting += waiting
+
+    #Adds <visitor> to the back of the queue. The visitor is only admitted straight away if nobody is waiting ahead of them.
+    #Parameters: <visitor : Visitor>
+    #Returns: the 0-indexed position of the visitor
+    def append(self, visitor):
+        userId = visitor.userId
+        self.members[userId] = visitor
+
+        if len(self.admitted) < self.capacity and len(self._slotOf) == 0:
+            self.admitted.append(visitor)
+            self._count(1, 0)
+            return len(self.admitted) - 1
+
+        self._appendWaiting(visitor)
+        self._count(0, 1)
+        return len(self.members) - 1
+
+    #Parameters: <userId : int>
+    #Returns: the 0-indexed position of <userId> in the queue or -1 if not found
+    def position(self, userId):
+        if userId not in self.members:
+            return -1
+
+        slot = self._slotOf.get(userId)
+        if slot == None:
+            return self.admitted.index(self.members[userId])
+        return len(self.admitted) + self._prefix(slot + 1) - 1
+
+    #Removes <userId> from the queue. Call promote() afterwards to fill any admitted slot that was freed.
+    #Parameters: <userId : int>
+    #Returns: the 0-indexed position the user was removed from or -1 if not found
+    def remove(self, userId):
+        position = self.position(userId)
+        if position == -1:
+            return -1
+
+        self.members.pop(userId)
+        if position < len(self.admitted):
+            self.admitted.pop(position)
+            self._count(-1, 0)
+        else:
+            self._removeSlot(self._slotOf.pop(userId))
+            self._count(0, -1)
+        return position
+
+    #Removes the Visitor at <idx>. Call promote() afterwards to fill any admitted slot that was freed.
+    #Parameters: <idx : int>
+    #Returns: the removed Visitor
+    def pop(self, idx):
+        visitor = self[idx]
+        self.remove(visitor.userId)
+        return visitor
+
+    #Moves Visitors from the front of the waiting tier into the admitted tier until it is full
+    #Returns: a list of the newly admitted Visitors
+    def promote(self):
+        promoted = []
+        while len(self.admitted) < self.capacity and len(self._slotOf) > 0:
+            while self._slots[self._head] == None:
+                self._head += 1
+
+            visitor = self._slots[self._head]
+            del self._slotOf[visitor.userId]
+            self._removeSlot(self._head)
+            self.admitted.append(visitor)
+            promoted.append(visitor)
+        self._count(len(promoted), -len(promoted))
+        return promoted
+
+    #Changes how many Visitors are admitted at once
+    #Parameters: <capacity : int>
+    #Returns: a tuple of (newly admitted Visitors, Visitors moved back to the front of the waiting tier)
+    def setCapacity(self, capacity):
+        self.capacity = capacity
+        demoted = []
+
+        if len(self.admitted) > capacity:
+            demoted = self.admitted[capacity:]
+            del self.admitted[capacity:]
+            self._rebuild(demoted + list(self.waiting()))
+            self._count(-len(demoted), len(demoted))
+
+        return self.promote(), demoted
+
+    #---Fenwick tree helpers---#
+
+    def _appendWaiting(self, visitor):
+        self._slots.append(visitor)
+        self._slotOf[visitor.userId] = len(self._slots) - 1
+
+        #the new node covers (i - lowbit(i), i], so it is the new value plus every live slot already in that range
+        i = len(self._slots)
+        self._tree.append(1 + self._prefix(i - 1) - self._prefix(i - (i & -i)))
+
+    def _removeSlot(self, slot):
+        self._slots[slot] = None
+        i = slot + 1
+        while i <= len(self._tree):
+            self._tree[i - 1] -= 1
+            i += i & -i
+
+        #compact once the dead slots outnumber the live ones so the tree stays proportional to the queue
+        if len(self._slots) > 64 and len(self._slotOf) * 2 < len(self._slots):
+            self._rebuild(list(self.waiting()))
+
+    def _prefix(self, i):
+        total = 0
+        while i > 0:
+            total += self._tree[i - 1]
+            i -= i & -i
+        return total
+
+    #Returns: the slot index of the <k>th (0-indexed) live Visitor in the waiting tier
+    def _findKth(self, k):
+        pos = 0
+        step = 1 << len(self._tree).bit_length()
+        remaining = k + 1
+        while step > 0:
+            nxt = pos + step
+            if nxt <= len(self._tree) and self._tree[nxt - 1] < remaining:
+                pos = nxt
+                remaining -= self._tree[nxt - 1]
+            step >>= 1
+        return pos
+
+    def _rebuild(self, visitors):
+        self._slots = []
+        self._tree = []
+        self._slotOf = {}
+        self._head = 0
+        for visitor in visitors:
+            self._appendWaiting(visitor)
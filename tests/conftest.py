@@ -0,0 +1,20 @@
+"""
+Animal Crossing New Horizons Island Queue Discord Bot
+Author: Marshall Jankovsky
+github.com/marshalltj/island-queue-bot
+
+Version: 2.0.0
+
+tests contains unit tests for the bot's modules that don't need a Discord connection or a database. Run them from the repository root with python -m pytest
+Tests that drive the command handlers import bot.py, so they are skipped when discord.py and the other requirements aren't installed.
+"""
+
+import os
+import sys
+
+#the bot's modules import each other by their flat names, so put the bot directory on the path, and the repository root for bench
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BOT_DIR = os.path.join(REPO_DIR, "bot")
+for directory in (REPO_DIR, BOT_DIR):
+    if directory not in sys.path:
+        sys.path.insert(0, directory)
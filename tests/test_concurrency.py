@@ -0,0 +1,32 @@
+"""
+Animal Crossing New Horizons Island Queue Discord Bot
+Author: Marshall Jankovsky
+github.com/marshalltj/island-queue-bot
+
+Version: 2.0.0
+
+test_concurrency.py runs the join, leave, dodo, remove, update and close handlers concurrently over many islands with visitor
+timeouts expiring underneath them, using bench/lockStress.py, and checks no handler raised and every queue is still consistent.
+"""
+
+import asyncio
+import random
+
+import pytest
+
+for requirement in ("discord", "aiomysql", "dotenv", "numpy"):
+    pytest.importorskip(requirement)
+
+from bench import fakes, lockStress
+
+def testConcurrentCommandsKeepQueuesConsistent(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path) #loadBot moves into the scratch directory, this moves back afterwards
+    monkeypatch.setattr(fakes.LATENCY, "high", 0.005) #random Discord latency so handlers interleave
+    random.seed(16)
+
+    bot = fakes.loadBot(str(tmp_path))
+    errors, problems, sessions, elapsed = asyncio.run(lockStress.stress(bot, 20, 30))
+
+    assert errors == []
+    assert problems == []
+    assert sessions == 20 * 31
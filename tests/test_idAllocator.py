@@ -0,0 +1,84 @@
+"""
+Animal Crossing New Horizons Island Queue Discord Bot
+Author: Marshall Jankovsky
+github.com/marshalltj/island-queue-bot
+
+Version: 2.0.0
+
+test_idAllocator.py contains unit tests for IdAllocator.
+"""
+
+import random
+
+import pytest
+
+from idAllocator import IdAllocator, IdPoolExhausted
+
+def testAllocatesEveryIdInRangeOnce():
+    allocator = IdAllocator(width=2, start=10, stop=40)
+    ids = [allocator.allocate() for i in range(30)]
+    assert sorted(ids) == [f"{n:02}" for n in range(10, 40)]
+    with pytest.raises(IdPoolExhausted):
+        allocator.allocate()
+
+def testPrefixAndWidth():
+    allocator = IdAllocator(width=4, prefix="A", start=5, stop=6)
+    assert allocator.allocate() == "A0005"
+    assert allocator.owns("A0005")
+    assert not allocator.owns("0005")
+    assert not allocator.owns("A0006")
+    assert not allocator.owns("A005")
+
+def testInvalidRange():
+    with pytest.raises(ValueError):
+        IdAllocator(width=2, start=50, stop=50)
+    with pytest.raises(ValueError):
+        IdAllocator(width=2, start=0, stop=101)
+
+def testReleasedIdsAreOnlyReusedOnceFreshIdsRunOut():
+    allocator = IdAllocator(width=1, start=0, stop=10)
+    first = allocator.allocate()
+    allocator.release(first)
+    ids = [allocator.allocate() for i in range(9)]
+    assert first not in ids
+    assert allocator.allocate() == first
+
+def testReserve():
+    allocator = IdAllocator(width=1, start=0, stop=10)
+    assert allocator.reserve("3")
+    assert not allocator.reserve("3")
+    assert not allocator.reserve("x")
+    ids = [allocator.allocate() for i in range(9)]
+    assert "3" not in ids
+    with pytest.raises(IdPoolExhausted):
+        allocator.allocate()
+
+def testReleasingReservedIdBeforeTheWalkReachesItIsNotHandedOutTwice():
+    for seed in range(50):
+        random.seed(seed)
+        allocator = IdAllocator(width=1, start=0, stop=10)
+        allocator.reserve("8")
+        allocator.release("8")
+
+        ids = [allocator.allocate() for i in range(10)]
+        assert sorted(ids) == [str(n) for n in range(10)]
+        with pytest.raises(IdPoolExhausted):
+            allocator.allocate()
+
+def testNeverHandsOutAnIdInUse():
+    random.seed(1)
+    allocator = IdAllocator(width=2, start=0, stop=40)
+    for islandId in random.sample([f"{n:02}" for n in range(40)], 10):
+        allocator.reserve(islandId)
+
+    inUse = set(allocator.inUse)
+    for step in range(2000):
+        if len(inUse) > 0 and (random.random() < 0.45 or len(inUse) == 40):
+            islandId = random.choice(sorted(inUse))
+            allocator.release(islandId)
+            inUse.remove(islandId)
+        else:
+            islandId = allocator.allocate()
+            assert islandId not in inUse
+            inUse.add(islandId)
+        assert allocator.inUse == inUse
@@ -0,0 +1,91 @@
+"""
+Animal Crossing New Horizons Island Queue Discord Bot
+Author: Marshall Jankovsky
+github.com/marshalltj/island-queue-bot
+
+Version: 2.0.0
+
+test_island.py contains unit tests for the queue operations Island builds on its VisitorQueue: positions, removal and promotion.
+"""
+
+import random
+
+from island import Island
+
+#Parameters: <queueSize : int> <userIds : [int]> joined in order
+#Returns: an open Island with <userIds> in its queue
+def makeIsland(queueSize, userIds):
+    island = Island(None, 100, "0001", None)
+    island.setQueueSize(queueSize)
+    for userId in userIds:
+        island.addVisitor(userId, 1)
+    return island
+
+#Parameters: <island : Island>
+#Returns: a tuple of (every user id in queue order, the admitted user ids)
+def userIds(island):
+    return [visitor.userId for visitor in island.visitors], [visitor.userId for visitor in island.visitors.admitted]
+
+def testAddVisitorReturnsPosition():
+    island = makeIsland(2, [])
+    assert [island.addVisitor(userId, 1) for userId in (1, 2, 3)] == [0, 1, 2]
+    assert island.getNumVisitors() == 3
+    assert userIds(island) == ([1, 2, 3], [1, 2])
+    assert island.getUserPositionInQueue(3) == 2
+    assert island.getUserPositionInQueue(4) == -1
+
+def testRemovingAnAdmittedUserPromotesTheNextOne():
+    island = makeIsland(2, [1, 2, 3, 4])
+    position, promoted = island.removeUser(1)
+    assert position == 0
+    assert [visitor.userId for visitor in promoted] == [3]
+    assert userIds(island) == ([2, 3, 4], [2, 3])
+
+def testRemovingAWaitingUserPromotesNobody():
+    island = makeIsland(2, [1, 2, 3, 4])
+    assert island.removeUser(4) == (3, [])
+    assert island.removeUser(4) == (-1, [])
+    assert userIds(island) == ([1, 2, 3], [1, 2])
+
+def testPopVisitor():
+    island = makeIsland(1, [1, 2, 3])
+    visitor, promoted = island.popVisitor(0)
+    assert visitor.userId == 1
+    assert [visitor.userId for visitor in promoted] == [2]
+
+    visitor, promoted = island.popVisitor(-1)
+    assert visitor.userId == 3
+    assert promoted == []
+    assert userIds(island) == ([2], [2])
+
+def testSetQueueSize():
+    island = makeIsland(1, [1, 2, 3, 4])
+    promoted, demoted = island.setQueueSize(3)
+    assert [visitor.userId for visitor in promoted] == [2, 3]
+    assert demoted == []
+
+    promoted, demoted = island.setQueueSize(2)
+    assert promoted == []
+    assert [visitor.userId for visitor in demoted] == [3]
+    assert userIds(island) == ([1, 2, 3, 4], [1, 2])
+
+def testMatchesAListUnderRandomCommands():
+    random.seed(2)
+    island = makeIsland(3, [])
+    expected = []
+
+    for step in range(2000):
+        if len(expected) == 0 or random.random() < 0.5:
+            userId = step + 1
+            assert island.addVisitor(userId, 1) == len(expected)
+            expected.append(userId)
+        elif random.random() < 0.5:
+            userId = random.choice(expected)
+            position, promoted = island.removeUser(userId)
+            assert position == expected.index(userId)
+            expected.remove(userId)
+        else:
+            position = random.randrange(len(expected))
+            assert island.popVisitor(position)[0].userId == expected.pop(position)
+
+        assert userIds(island) == (expected, expected[:3])
@@ -0,0 +1,155 @@
+"""
+Animal Crossing New Horizons Island Queue Discord Bot
+Author: Marshall Jankovsky
+github.com/marshalltj/island-queue-bot
+
+Version: 2.0.0
+
+test_queueStore.py contains unit tests that run the same queue changes against every QueueStore backend and BackgroundStore.
+"""
+
+import asyncio
+import os
+import random
+
+import pytest
+
+from queueStore import BackgroundStore, MemoryQueueStore, SqliteQueueStore
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        store = MemoryQueueStore()
+    else:
+        store = SqliteQueueStore(os.path.join(tmp_path, "queues.db"))
+    yield store
+    store.close()
+
+#Parameters: <store : QueueStore> <islandId : str> <queueSize : int>
+def openIsland(store, islandId, queueSize):
+    store.createIsland(islandId, 10, 20, 500, 1000.0)
+    store.openIsland(islandId, "ABCDE", queueSize)
+
+def testPositionsMatchAList(store):
+    random.seed(15)
+    openIsland(store, "0001", 3)
+    expected = []
+
+    for step in range(300):
+        if len(expected) > 0 and random.random() < 0.4:
+            userId = random.choice(expected)
+            assert store.dequeue("0001", userId) == expected.index(userId)
+            expected.remove(userId)
+        else:
+            userId = step + 1
+            assert store.enqueue("0001", userId, 1, float(step)) == len(expected)
+            expected.append(userId)
+
+    assert store.numVisitors("0001") == len(expected)
+    assert [userId for userId, timestamp in store.admitted("0001")] == expected[:3]
+    for position, userId in enumerate(expected):
+        assert store.position("0001", userId) == position
+
+def testMissingIslandsAndUsers(store):
+    assert store.enqueue("0404", 1, 1, 0.0) == -1
+    assert store.dequeue("0404", 1) == -1
+    assert store.admitted("0404") == []
+    assert not store.hasIsland("0404")
+
+    openIsland(store, "0001", 2)
+    assert store.enqueue("0001", 1, 1, 0.0) == 0
+    assert store.enqueue("0001", 1, 1, 5.0) == 0 #joining twice keeps the first place
+    assert store.position("0001", 2) == -1
+    assert store.dequeue("0001", 2) == -1
+
+    store.closeIsland("0001")
+    assert not store.hasIsland("0001")
+    assert store.numVisitors("0001") == 0
+
+def testAdmitUpdatesTimestamp(store):
+    openIsland(store, "0001", 1)
+    store.enqueue("0001", 1, 1, 10.0)
+    store.enqueue("0001", 2, 1, 11.0)
+    store.admit("0001", 1, 50.0)
+    assert store.admitted("0001") == [(1, 50.0)]
+
+    store.dequeue("0001", 1)
+    store.admit("0001", 2, 60.0)
+    assert store.admitted("0001") == [(2, 60.0)]
+
+def testApplyRecordsFollowsTheJournal(store):
+    store.applyRecords([
+        ("create", "0001", {"guild": 10, "owner": 20, "price": 500, "at": 1000.0}),
+        ("open", "0001", {"code": "ABCDE", "size": 2}),
+        ("join", "0001", {"user": 1, "trips": 1, "at": 1001.0}),
+        ("join", "0001", {"user": 2, "trips": 2, "at": 1002.0}),
+        ("join", "0001", {"user": 3, "trips": 3, "at": 1003.0}),
+        ("leave", "0001", {"user": 1}),
+        ("admit", "0001", {"user": 3, "at": 1004.0}),
+        ("update", "0001", {"code": "FGHIJ", "price": 600}),
+        ("create", "0002", {"guild": 10, "owner": 21, "price": 100, "at": 1000.0}),
+        ("close", "0002", {})
+    ])
+
+    assert store.islands() == {"0001": {
+        "guild": 10, "owner": 20, "price": 600, "code": "FGHIJ", "queueSize": 2, "created": 1000.0,
+        "visitors": {"2": [2, 1002.0], "3": [3, 1004.0]}
+    }}
+
+def testLoadStateReplacesOwnedIslands(store):
+    openIsland(store, "0001", 2)
+    openIsland(store, "0002", 2) #closed while the bot was down, not in the state
+    openIsland(store, "5001", 2) #another process's island
+    store.enqueue("0001", 9, 1, 0.0)
+
+    state = {"0001": {
+        "guild": 10, "owner": 20, "price": 500, "code": "ABCDE", "queueSize": 1, "created": 1000.0,
+        "visitors": {"3": [1, 1001.0], "1": [2, 1002.0]}
+    }}
+    store.loadState(state, lambda islandId: islandId < "5000")
+
+    assert set(store.islands()) == {"0001", "5001"}
+    assert store.islands(lambda islandId: islandId < "5000") == state
+    assert [userId for userId, timestamp in store.admitted("0001")] == [3]
+
+def testSqliteStoreIsShared(tmp_path):
+    path = os.path.join(tmp_path, "queues.db")
+    first = SqliteQueueStore(path)
+    second = SqliteQueueStore(path)
+
+    openIsland(first, "0001", 2)
+    first.enqueue("0001", 1, 1, 0.0)
+    assert second.position("0001", 1) == 0
+    assert second.enqueue("0001", 2, 1, 0.0) == 1
+    assert first.numVisitors("0001") == 2
+
+    first.close()
+    second.close()
+
+def testBackgroundStoreReadsSeeQueuedChanges(store):
+    async def run():
+        background = BackgroundStore(store, delay=60)
+        background.record("create", "0001", {"guild": 10, "owner": 20, "price": 500, "at": 1000.0})
+        background.record("open", "0001", {"code": "ABCDE", "size": 2})
+        background.record("join", "0001", {"user": 1, "trips": 1, "at": 1001.0})
+        assert len(background.pending) == 3
+
+        assert await background.run(store.position, "0001", 1) == 0
+        assert len(background.pending) == 0 and background.written == 3
+
+        background.record("leave", "0001", {"user": 1})
+        await background.close()
+        return background
+
+    assert asyncio.run(run()).written == 4
+
+def testBackgroundStoreLogsDroppedChangesOnce(caplog):
+    async def run():
+        background = BackgroundStore(MemoryQueueStore(), delay=60, batchSize=1000, maxPending=10)
+        for userId in range(50):
+            background.record("join", "0001", {"user": userId, "trips": 1, "at": 0.0})
+        assert background.dropped == 40 and len(background.pending) == 10
+        await background.close()
+
+    asyncio.run(run())
+    assert len([record for record in caplog.records if "too far behind" in record.getMessage()]) == 1
@@ -0,0 +1,115 @@
+"""
+Animal Crossing New Horizons Island Queue Discord Bot
+Author: Marshall Jankovsky
+github.com/marshalltj/island-queue-bot
+
+Version: 2.0.0
+
+test_visitorQueue.py contains unit tests for VisitorQueue, checked against a plain list of user ids.
+"""
+
+import random
+
+import pytest
+
+from visitor import Visitor
+from visitorQueue import VisitorQueue, QueueTotals
+
+#Parameters: <queue : VisitorQueue> <expected : [int]> user ids in queue order <capacity : int>
+def checkMatches(queue, expected, capacity):
+    assert len(queue) == len(expected)
+    assert [visitor.userId for visitor in queue] == expected
+    assert [visitor.userId for visitor in queue.admitted] == expected[:capacity]
+    assert queue.numWaiting() == max(0, len(expected) - capacity)
+    for position, userId in enumerate(expected):
+        assert queue.position(userId) == position
+        assert queue[position].userId == userId
+
+def testAppendAdmitsUpToCapacity():
+    queue = VisitorQueue(2)
+    assert [queue.append(Visitor(userId, 1)) for userId in (1, 2, 3, 4)] == [0, 1, 2, 3]
+    checkMatches(queue, [1, 2, 3, 4], 2)
+    assert queue.position(5) == -1
+    assert 3 in queue and 5 not in queue
+    assert queue.get(5) == None
+
+def testRemoveAndPromote():
+    queue = VisitorQueue(2)
+    for userId in range(1, 6):
+        queue.append(Visitor(userId, 1))
+
+    assert queue.remove(1) == 0
+    assert [visitor.userId for visitor in queue.promote()] == [3]
+    checkMatches(queue, [2, 3, 4, 5], 2)
+
+    assert queue.remove(4) == 2
+    assert queue.promote() == []
+    assert queue.remove(4) == -1
+    assert queue.pop(-1).userId == 5
+    checkMatches(queue, [2, 3], 2)
+
+def testIndexOutOfRange():
+    queue = VisitorQueue(1)
+    queue.append(Visitor(1, 1))
+    with pytest.raises(IndexError):
+        queue[1]
+    with pytest.raises(IndexError):
+        queue[-2]
+
+def testSetCapacity():
+    queue = VisitorQueue(1)
+    for userId in range(1, 6):
+        queue.append(Visitor(userId, 1))
+
+    promoted, demoted = queue.setCapacity(3)
+    assert [visitor.userId for visitor in promoted] == [2, 3]
+    assert demoted == []
+    checkMatches(queue, [1, 2, 3, 4, 5], 3)
+
+    promoted, demoted = queue.setCapacity(1)
+    assert promoted == []
+    assert [visitor.userId for visitor in demoted] == [2, 3]
+    checkMatches(queue, [1, 2, 3, 4, 5], 1)
+
+def testTotalsFollowEveryChange():
+    totals = QueueTotals()
+    queue = VisitorQueue(2)
+    queue.attach(totals)
+    for userId in range(1, 6):
+        queue.append(Visitor(userId, 1))
+    assert (totals.admitted, totals.waiting) == (2, 3)
+
+    queue.remove(1)
+    queue.promote()
+    queue.setCapacity(1)
+    assert (totals.admitted, totals.waiting) == (1, 3)
+
+    queue.attach(None)
+    assert (totals.admitted, totals.waiting) == (0, 0)
+
+def testMatchesAListUnderRandomChanges():
+    random.seed(2)
+    capacity = 3
+    queue = VisitorQueue(capacity)
+    expected = []
+    nextUser = 0
+
+    #enough removals to make the waiting tier compact itself several times
+    for step in range(5000):
+        roll = random.random()
+        if roll < 0.5 or len(expected) == 0:
+            nextUser += 1
+            assert queue.append(Visitor(nextUser, 1)) == len(expected)
+            expected.append(nextUser)
+        elif roll < 0.95:
+            userId = random.choice(expected)
+            assert queue.remove(userId) == expected.index(userId)
+            expected.remove(userId)
+            queue.promote()
+        else:
+            capacity = random.randint(1, 5)
+            queue.setCapacity(capacity)
+
+        if step % 50 == 0:
+            checkMatches(queue, expected, capacity)
+    checkMatches(queue, expected, capacity)